@@ -0,0 +1,46 @@
+"""add mattin outbox
+
+Revision ID: 3b7d2f9a6c14
+Revises: e948d52c837e
+Create Date: 2026-10-18 09:12:40.118372
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d2f9a6c14'
+down_revision: Union[str, Sequence[str], None] = 'e948d52c837e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('mattin_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('incident_id', sa.String(), nullable=False),
+    sa.Column('app_id', sa.Integer(), nullable=False),
+    sa.Column('silo_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['incident_id'], ['incidents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_mattin_outbox_id'), 'mattin_outbox', ['id'], unique=False)
+    op.create_index('ix_mattin_outbox_status_next_attempt', 'mattin_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_mattin_outbox_status_next_attempt', table_name='mattin_outbox')
+    op.drop_index(op.f('ix_mattin_outbox_id'), table_name='mattin_outbox')
+    op.drop_table('mattin_outbox')
@@ -0,0 +1,57 @@
+"""add sat query indexes
+
+Revision ID: 5f2d8a6b1e93
+Revises: c5a9e3f1d208
+Create Date: 2026-10-18 12:41:05.927310
+
+Indexes are built with CREATE INDEX CONCURRENTLY so the migration can run
+against a live database without blocking writes. CONCURRENTLY cannot run inside
+a transaction, hence the autocommit block. If a build is interrupted Postgres
+leaves an INVALID index behind: drop it and run the upgrade again.
+
+See benchmark_indexes.py for query plans before and after on synthetic data.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2d8a6b1e93'
+down_revision: Union[str, Sequence[str], None] = 'c5a9e3f1d208'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    # (name, table, columns, partial predicate)
+    ('ix_incidents_created_at_id', 'incidents', ['created_at', 'id'], None),
+    ('ix_incidents_machine_id_created_at', 'incidents', ['machine_id', 'created_at', 'id'], None),
+    ('ix_incidents_status_created_at', 'incidents', ['status', 'created_at', 'id'], None),
+    ('ix_incidents_active_priority', 'incidents', ['priority', 'created_at'], "status IN ('open', 'in_progress')"),
+    ('ix_incidents_closed_at', 'incidents', ['closed_at'], 'closed_at IS NOT NULL'),
+    ('ix_incident_logs_incident_id_date', 'incident_logs', ['incident_id', 'date'], None),
+    ('ix_machines_available_type_model', 'machines', ['type', 'model'], 'available'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True
+            )
+        for table in {table for _, table, _, _ in INDEXES}:
+            op.execute(f'ANALYZE {table}')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
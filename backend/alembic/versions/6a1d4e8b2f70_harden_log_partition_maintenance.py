@@ -0,0 +1,115 @@
+"""harden log partition maintenance
+
+Revision ID: 6a1d4e8b2f70
+Revises: f2c8d5e1a937
+Create Date: 2026-10-18 19:12:44.381205
+
+incident_logs_ensure_partitions takes an advisory lock, so app processes
+starting together wait for each other instead of racing on CREATE TABLE. A
+month whose rows already landed in the default partition no longer makes it
+fail: the rows are moved into the new partition before it is attached.
+
+The log search-vector trigger can be switched off for a transaction
+(sat.skip_log_search_vector = on). Log archival uses it to rebuild each
+incident's vector once instead of once per deleted log, and partition creation
+to move rows without touching the vectors at all.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a1d4e8b2f70'
+down_revision: Union[str, Sequence[str], None] = 'f2c8d5e1a937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOG_SEARCH_VECTOR_TRIGGER = """
+    CREATE OR REPLACE FUNCTION incident_logs_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        {skip}
+        IF TG_OP = 'INSERT' THEN
+            -- Appending is enough for new logs, no need to re-read the others
+            UPDATE incidents
+            SET search_vector = coalesce(search_vector, ''::tsvector) || setweight(to_tsvector('spanish', NEW.text), 'C')
+            WHERE id = NEW.incident_id;
+            RETURN NULL;
+        END IF;
+        UPDATE incidents
+        SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+        WHERE id = OLD.incident_id OR (TG_OP = 'UPDATE' AND id = NEW.incident_id);
+        RETURN NULL;
+    END
+    $$
+"""
+SKIP = """IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+            RETURN NULL;
+        END IF;"""
+
+ENSURE_PARTITIONS = """
+    CREATE OR REPLACE FUNCTION incident_logs_ensure_partitions(p_from date, p_to date)
+    RETURNS integer LANGUAGE plpgsql AS $$
+    DECLARE
+        part_start date := date_trunc('month', p_from)::date;
+        part_end date;
+        created integer := 0;
+        part_name text;
+    BEGIN
+        {body}
+        RETURN created;
+    END
+    $$
+"""
+ENSURE_PARTITIONS_BODY = """
+        PERFORM pg_advisory_xact_lock(hashtext('incident_logs_ensure_partitions'));
+        WHILE part_start <= p_to LOOP
+            part_end := (part_start + interval '1 month')::date;
+            part_name := 'incident_logs_' || to_char(part_start, '"y"YYYY"m"MM');
+            IF to_regclass(part_name) IS NULL THEN
+                -- Writers wait until the partition is attached: a log landing in the default
+                -- partition for this month would make the attach fail
+                LOCK TABLE incident_logs_default IN ACCESS EXCLUSIVE MODE;
+                EXECUTE format('CREATE TABLE %I (LIKE incident_logs INCLUDING DEFAULTS)', part_name);
+                -- Same logs, new partition: the search vectors stay as they are
+                PERFORM set_config('sat.skip_log_search_vector', 'on', true);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM incident_logs_default WHERE date >= %L AND date < %L RETURNING *) '
+                    'INSERT INTO %I SELECT * FROM moved',
+                    part_start, part_end, part_name
+                );
+                PERFORM set_config('sat.skip_log_search_vector', '', true);
+                EXECUTE format(
+                    'ALTER TABLE incident_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    part_name, part_start, part_end
+                );
+                created := created + 1;
+            END IF;
+            part_start := part_end;
+        END LOOP;
+"""
+ENSURE_PARTITIONS_BODY_OLD = """
+        WHILE part_start <= p_to LOOP
+            part_name := 'incident_logs_' || to_char(part_start, '"y"YYYY"m"MM');
+            IF to_regclass(part_name) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF incident_logs FOR VALUES FROM (%L) TO (%L)',
+                    part_name, part_start, (part_start + interval '1 month')::date
+                );
+                created := created + 1;
+            END IF;
+            part_start := (part_start + interval '1 month')::date;
+        END LOOP;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(LOG_SEARCH_VECTOR_TRIGGER.format(skip=SKIP))
+    op.execute(ENSURE_PARTITIONS.format(body=ENSURE_PARTITIONS_BODY))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(ENSURE_PARTITIONS.format(body=ENSURE_PARTITIONS_BODY_OLD))
+    op.execute(LOG_SEARCH_VECTOR_TRIGGER.format(skip=""))
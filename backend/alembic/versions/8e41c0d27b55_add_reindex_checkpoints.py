@@ -0,0 +1,53 @@
+"""add reindex checkpoints
+
+Revision ID: 8e41c0d27b55
+Revises: 3b7d2f9a6c14
+Create Date: 2026-10-18 10:03:17.551204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e41c0d27b55'
+down_revision: Union[str, Sequence[str], None] = '3b7d2f9a6c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reindex_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('app_id', sa.Integer(), nullable=False),
+    sa.Column('incident_silo_id', sa.String(), nullable=True),
+    sa.Column('docs_silo_id', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('done', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reindex_runs_id'), 'reindex_runs', ['id'], unique=False)
+    op.create_table('reindex_items',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('item_key', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['reindex_runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('run_id', 'item_key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reindex_items')
+    op.drop_index(op.f('ix_reindex_runs_id'), table_name='reindex_runs')
+    op.drop_table('reindex_runs')
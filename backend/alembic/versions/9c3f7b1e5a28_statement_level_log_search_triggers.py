@@ -0,0 +1,126 @@
+"""statement level log search triggers
+
+Revision ID: 9c3f7b1e5a28
+Revises: 6a1d4e8b2f70
+Create Date: 2026-10-18 19:41:06.527913
+
+The incident_logs search-vector trigger ran once per row, and every update or
+delete rebuilt the incident's vector from all of its logs: a statement
+touching N logs of one incident did N full rebuilds. It is replaced by
+statement-level triggers reading transition tables. Inserts append the new
+logs' text to each incident's vector in one UPDATE; updates and deletes
+rebuild each affected incident once per statement. Updates that change
+neither text nor incident_id (author, date) leave the vectors alone.
+
+Statement triggers on incident_logs do not fire for writes made directly to
+a partition, which only incident_logs_ensure_partitions does when it moves
+rows out of the default partition. sat.skip_log_search_vector still turns the
+triggers off for a transaction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c3f7b1e5a28'
+down_revision: Union[str, Sequence[str], None] = '6a1d4e8b2f70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS incident_logs_search_vector_sync ON incident_logs")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_search_vector_trigger()")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            -- Appending is enough for new logs, no need to re-read the others
+            UPDATE incidents i
+            SET search_vector = coalesce(i.search_vector, ''::tsvector) || n.vector
+            FROM (
+                SELECT incident_id, setweight(to_tsvector('spanish', string_agg(text, ' ' ORDER BY date, id)), 'C') AS vector
+                FROM new_logs GROUP BY incident_id
+            ) n
+            WHERE i.id = n.incident_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_rebuild() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                UPDATE incidents
+                SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+                WHERE id IN (SELECT incident_id FROM old_logs);
+                RETURN NULL;
+            END IF;
+            UPDATE incidents
+            SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+            WHERE id IN (
+                SELECT unnest(ARRAY[o.incident_id, n.incident_id])
+                FROM old_logs o JOIN new_logs n ON n.id = o.id
+                WHERE n.text IS DISTINCT FROM o.text OR n.incident_id IS DISTINCT FROM o.incident_id
+            );
+            RETURN NULL;
+        END
+        $$
+    """)
+    # Transition tables rule out column lists and several events per trigger
+    op.execute("""
+        CREATE TRIGGER incident_logs_search_vector_insert
+        AFTER INSERT ON incident_logs REFERENCING NEW TABLE AS new_logs
+        FOR EACH STATEMENT EXECUTE FUNCTION incident_logs_search_vector_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER incident_logs_search_vector_update
+        AFTER UPDATE ON incident_logs REFERENCING OLD TABLE AS old_logs NEW TABLE AS new_logs
+        FOR EACH STATEMENT EXECUTE FUNCTION incident_logs_search_vector_rebuild()
+    """)
+    op.execute("""
+        CREATE TRIGGER incident_logs_search_vector_delete
+        AFTER DELETE ON incident_logs REFERENCING OLD TABLE AS old_logs
+        FOR EACH STATEMENT EXECUTE FUNCTION incident_logs_search_vector_rebuild()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS incident_logs_search_vector_{event} ON incident_logs")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_search_vector_insert()")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_search_vector_rebuild()")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                UPDATE incidents
+                SET search_vector = coalesce(search_vector, ''::tsvector) || setweight(to_tsvector('spanish', NEW.text), 'C')
+                WHERE id = NEW.incident_id;
+                RETURN NULL;
+            END IF;
+            UPDATE incidents
+            SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+            WHERE id = OLD.incident_id OR (TG_OP = 'UPDATE' AND id = NEW.incident_id);
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER incident_logs_search_vector_sync
+        AFTER INSERT OR UPDATE OF text, incident_id OR DELETE ON incident_logs
+        FOR EACH ROW EXECUTE FUNCTION incident_logs_search_vector_trigger()
+    """)
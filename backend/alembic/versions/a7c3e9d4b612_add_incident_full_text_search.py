@@ -0,0 +1,98 @@
+"""add incident full text search
+
+Revision ID: a7c3e9d4b612
+Revises: 5f2d8a6b1e93
+Create Date: 2026-10-18 13:55:21.604118
+
+incidents.search_vector covers title (weight A), description (B) and the text
+of every log (C). A generated column cannot aggregate incident_logs, so
+triggers keep it current: incident inserts/updates rebuild it, log inserts
+append to it, and log updates/deletes rebuild it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d4b612'
+down_revision: Union[str, Sequence[str], None] = '5f2d8a6b1e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('incidents', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_search_vector(p_title text, p_description text, p_logs text)
+        RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+            SELECT setweight(to_tsvector('spanish', coalesce(p_title, '')), 'A')
+                || setweight(to_tsvector('spanish', coalesce(p_description, '')), 'B')
+                || setweight(to_tsvector('spanish', coalesce(p_logs, '')), 'C')
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_text(p_incident_id varchar)
+        RETURNS text LANGUAGE sql STABLE AS $$
+            SELECT string_agg(text, ' ' ORDER BY date) FROM incident_logs WHERE incident_id = p_incident_id
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incidents_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.search_vector := incident_search_vector(NEW.title, NEW.description, incident_logs_text(NEW.id));
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                -- Appending is enough for new logs, no need to re-read the others
+                UPDATE incidents
+                SET search_vector = coalesce(search_vector, ''::tsvector) || setweight(to_tsvector('spanish', NEW.text), 'C')
+                WHERE id = NEW.incident_id;
+                RETURN NULL;
+            END IF;
+            UPDATE incidents
+            SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+            WHERE id = OLD.incident_id OR (TG_OP = 'UPDATE' AND id = NEW.incident_id);
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE TRIGGER incidents_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, description ON incidents
+        FOR EACH ROW EXECUTE FUNCTION incidents_search_vector_trigger()
+    """)
+    op.execute("""
+        CREATE TRIGGER incident_logs_search_vector_sync
+        AFTER INSERT OR UPDATE OF text, incident_id OR DELETE ON incident_logs
+        FOR EACH ROW EXECUTE FUNCTION incident_logs_search_vector_trigger()
+    """)
+    op.execute("UPDATE incidents SET search_vector = incident_search_vector(title, description, incident_logs_text(id))")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_incidents_search_vector', 'incidents', ['search_vector'], unique=False,
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_incidents_search_vector', table_name='incidents', postgresql_concurrently=True, if_exists=True)
+    op.execute("DROP TRIGGER IF EXISTS incident_logs_search_vector_sync ON incident_logs")
+    op.execute("DROP TRIGGER IF EXISTS incidents_search_vector_update ON incidents")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_search_vector_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS incidents_search_vector_trigger()")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_text(varchar)")
+    op.execute("DROP FUNCTION IF EXISTS incident_search_vector(text, text, text)")
+    op.drop_column('incidents', 'search_vector')
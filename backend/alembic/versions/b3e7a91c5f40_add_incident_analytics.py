@@ -0,0 +1,71 @@
+"""add incident analytics
+
+Revision ID: b3e7a91c5f40
+Revises: d81f4b7a2c59
+Create Date: 2026-10-18 17:24:09.581340
+
+Counter tables behind /api/sat/analytics. The application keeps them current
+on every incident write; this migration only backfills them from history.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7a91c5f40'
+down_revision: Union[str, Sequence[str], None] = 'd81f4b7a2c59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sat_incident_stats',
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.Date(), nullable=False),
+    sa.Column('machine_id', sa.String(), nullable=False),
+    sa.Column('opened', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('resolved', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('repair_seconds', sa.Float(), server_default='0', nullable=False),
+    sa.Column('logs', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'machine_id')
+    )
+    op.create_table('sat_incident_backlog',
+    sa.Column('priority', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('priority', 'status')
+    )
+
+    op.execute("""
+        INSERT INTO sat_incident_stats (granularity, bucket_start, machine_id, opened, resolved, repair_seconds, logs)
+        SELECT g.granularity,
+               CASE WHEN g.granularity = 'all' THEN DATE '1970-01-01'
+                    ELSE date_trunc(g.granularity, e.at AT TIME ZONE 'UTC')::date END,
+               e.machine_id, sum(e.opened), sum(e.resolved), sum(e.repair_seconds), sum(e.logs)
+        FROM (
+            SELECT created_at AS at, coalesce(machine_id, '') AS machine_id, 1 AS opened, 0 AS resolved, 0.0 AS repair_seconds, 0 AS logs
+            FROM incidents WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT closed_at, coalesce(machine_id, ''), 0, 1, greatest(0, extract(epoch FROM closed_at - created_at)), 0
+            FROM incidents WHERE status IN ('resolved', 'closed') AND closed_at IS NOT NULL AND created_at IS NOT NULL
+            UNION ALL
+            SELECT coalesce(l.date, now()), coalesce(i.machine_id, ''), 0, 0, 0.0, 1
+            FROM incident_logs l JOIN incidents i ON i.id = l.incident_id
+        ) e
+        CROSS JOIN (VALUES ('day'), ('week'), ('month'), ('all')) AS g (granularity)
+        GROUP BY 1, 2, 3
+    """)
+    op.execute("""
+        INSERT INTO sat_incident_backlog (priority, status, count)
+        SELECT coalesce(priority, 'medium'), status, count(*) FROM incidents
+        WHERE status IN ('open', 'in_progress') GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sat_incident_backlog')
+    op.drop_table('sat_incident_stats')
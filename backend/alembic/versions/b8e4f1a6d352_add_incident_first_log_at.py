@@ -0,0 +1,124 @@
+"""add incident first_log_at
+
+Revision ID: b8e4f1a6d352
+Revises: e5b2c8f4a619
+Create Date: 2026-10-18 21:14:52.603718
+
+incidents.first_log_at is the date of the incident's earliest log, or earlier.
+Incident.logs and the other per-incident log reads are bounded by it, so
+Postgres skips log partitions older than the incident's first log. It is kept
+by the incident_logs triggers rather than by the app, so logs written with any
+date, by any writer, stay inside the bound: inserts and updates lower it,
+deletes leave it alone (it only has to be a lower bound). Unlike the search
+vector, it is kept while sat.skip_log_search_vector is on.
+
+The column is filled from the logs still in the table; incidents without logs
+keep NULL until their first one.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4f1a6d352'
+down_revision: Union[str, Sequence[str], None] = 'e5b2c8f4a619'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+REBUILD_TRIGGER_BODY = """
+            IF TG_OP = 'DELETE' THEN
+                UPDATE incidents
+                SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+                WHERE id IN (SELECT incident_id FROM old_logs);
+                RETURN NULL;
+            END IF;
+            UPDATE incidents
+            SET search_vector = incident_search_vector(title, description, incident_logs_text(id))
+            WHERE id IN (
+                SELECT unnest(ARRAY[o.incident_id, n.incident_id])
+                FROM old_logs o JOIN new_logs n ON n.id = o.id
+                WHERE n.text IS DISTINCT FROM o.text OR n.incident_id IS DISTINCT FROM o.incident_id
+            );
+            RETURN NULL;
+        END
+        $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('incidents', sa.Column('first_log_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("""
+        UPDATE incidents i SET first_log_at = l.first_log
+        FROM (SELECT incident_id, min(date) AS first_log FROM incident_logs GROUP BY incident_id) l
+        WHERE l.incident_id = i.id
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                UPDATE incidents i SET first_log_at = n.first_log
+                FROM (SELECT incident_id, min(date) AS first_log FROM new_logs GROUP BY incident_id) n
+                WHERE i.id = n.incident_id AND (i.first_log_at IS NULL OR n.first_log < i.first_log_at);
+                RETURN NULL;
+            END IF;
+            -- Appending is enough for new logs, no need to re-read the others
+            UPDATE incidents i
+            SET search_vector = coalesce(i.search_vector, ''::tsvector) || n.vector,
+                first_log_at = least(i.first_log_at, n.first_log)
+            FROM (
+                SELECT incident_id, min(date) AS first_log,
+                       setweight(to_tsvector('spanish', string_agg(text, ' ' ORDER BY date, id)), 'C') AS vector
+                FROM new_logs GROUP BY incident_id
+            ) n
+            WHERE i.id = n.incident_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_rebuild() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            -- A log moved to an earlier date or to another incident may fall below the bound
+            IF TG_OP = 'UPDATE' THEN
+                UPDATE incidents i SET first_log_at = n.first_log
+                FROM (SELECT incident_id, min(date) AS first_log FROM new_logs GROUP BY incident_id) n
+                WHERE i.id = n.incident_id AND (i.first_log_at IS NULL OR n.first_log < i.first_log_at);
+            END IF;
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+    """ + REBUILD_TRIGGER_BODY)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+            -- Appending is enough for new logs, no need to re-read the others
+            UPDATE incidents i
+            SET search_vector = coalesce(i.search_vector, ''::tsvector) || n.vector
+            FROM (
+                SELECT incident_id, setweight(to_tsvector('spanish', string_agg(text, ' ' ORDER BY date, id)), 'C') AS vector
+                FROM new_logs GROUP BY incident_id
+            ) n
+            WHERE i.id = n.incident_id;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_search_vector_rebuild() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF current_setting('sat.skip_log_search_vector', true) = 'on' THEN
+                RETURN NULL;
+            END IF;
+    """ + REBUILD_TRIGGER_BODY)
+    op.drop_column('incidents', 'first_log_at')
@@ -0,0 +1,47 @@
+"""add document content hashes
+
+Revision ID: c5a9e3f1d208
+Revises: 8e41c0d27b55
+Create Date: 2026-10-18 11:24:40.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e3f1d208'
+down_revision: Union[str, Sequence[str], None] = '8e41c0d27b55'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('machine_documents',
+    sa.Column('machine_id', sa.String(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('mtime_ns', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('machine_id', 'filename')
+    )
+    op.create_table('mattin_indexed_documents',
+    sa.Column('app_id', sa.Integer(), nullable=False),
+    sa.Column('silo_id', sa.String(), nullable=False),
+    sa.Column('machine_id', sa.String(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('metadata_json', sa.Text(), nullable=False),
+    sa.Column('indexed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('app_id', 'silo_id', 'machine_id', 'filename')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('mattin_indexed_documents')
+    op.drop_table('machine_documents')
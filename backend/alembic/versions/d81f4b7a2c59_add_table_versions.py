@@ -0,0 +1,59 @@
+"""add table versions
+
+Revision ID: d81f4b7a2c59
+Revises: a7c3e9d4b612
+Create Date: 2026-10-18 16:58:40.113207
+
+One counter row per SAT table, bumped by a statement-level trigger on every
+write. List endpoints derive their ETags from these counters, so a conditional
+GET costs a primary-key lookup. The bump is part of the writing transaction,
+so a new version is never visible before the data it stands for.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f4b7a2c59'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9d4b612'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ['machines', 'incidents', 'incident_logs']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sat_table_versions',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute(
+        "INSERT INTO sat_table_versions (table_name) VALUES "
+        + ", ".join(f"('{table}')" for table in TABLES)
+    )
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sat_bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE sat_table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table in TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION sat_bump_table_version()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_bump_version ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS sat_bump_table_version()")
+    op.drop_table('sat_table_versions')
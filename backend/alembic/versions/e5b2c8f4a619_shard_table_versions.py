@@ -0,0 +1,68 @@
+"""shard table versions
+
+Revision ID: e5b2c8f4a619
+Revises: 9c3f7b1e5a28
+Create Date: 2026-10-18 20:06:31.142857
+
+With one counter row per table, every transaction writing incidents or logs
+updated the same row and held its lock until commit, so all writers of a
+table ran one after another. Each table now has SHARDS counter rows; the
+trigger bumps the one picked by the backend's pid, so concurrent connections
+mostly hit different rows. A table's version is the sum of its shards, which
+still grows on every write and is still bumped inside the writing
+transaction.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c8f4a619'
+down_revision: Union[str, Sequence[str], None] = '9c3f7b1e5a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARDS = 16
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sat_table_versions', sa.Column('shard', sa.SmallInteger(), server_default='0', nullable=False))
+    op.drop_constraint('sat_table_versions_pkey', 'sat_table_versions', type_='primary')
+    op.create_primary_key('sat_table_versions_pkey', 'sat_table_versions', ['table_name', 'shard'])
+    op.execute(f"""
+        INSERT INTO sat_table_versions (table_name, shard)
+        SELECT v.table_name, s.shard FROM sat_table_versions v, generate_series(1, {SHARDS - 1}) AS s (shard)
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION sat_bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE sat_table_versions SET version = version + 1
+            WHERE table_name = TG_TABLE_NAME AND shard = pg_backend_pid() % {SHARDS};
+            RETURN NULL;
+        END
+        $$
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sat_bump_table_version() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE sat_table_versions SET version = version + 1 WHERE table_name = TG_TABLE_NAME;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("""
+        UPDATE sat_table_versions v SET version = t.total
+        FROM (SELECT table_name, sum(version) AS total FROM sat_table_versions GROUP BY table_name) t
+        WHERE v.table_name = t.table_name AND v.shard = 0
+    """)
+    op.execute("DELETE FROM sat_table_versions WHERE shard <> 0")
+    op.drop_constraint('sat_table_versions_pkey', 'sat_table_versions', type_='primary')
+    op.create_primary_key('sat_table_versions_pkey', 'sat_table_versions', ['table_name'])
+    op.drop_column('sat_table_versions', 'shard')
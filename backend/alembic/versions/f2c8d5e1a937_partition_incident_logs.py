@@ -0,0 +1,151 @@
+"""partition incident logs
+
+Revision ID: f2c8d5e1a937
+Revises: b3e7a91c5f40
+Create Date: 2026-10-18 17:52:37.270614
+
+incident_logs becomes a table partitioned by month on `date`, plus a default
+partition. The primary key has to include the partition key, so it is now
+(id, date); ids still come from the same sequence. The rows are copied, so
+plan for a maintenance window on large tables.
+
+incidents gains the columns the log archival job (modules/log_archive.py)
+fills in when it moves the logs of long-closed incidents to files. Their text
+is kept in archived_log_text, so full-text search still finds them.
+
+Downgrade restores a plain table with the logs still in the database. Restore
+archived logs from uploads/log_archive first, or they are lost.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8d5e1a937'
+down_revision: Union[str, Sequence[str], None] = 'b3e7a91c5f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOG_TRIGGERS = """
+    CREATE TRIGGER incident_logs_search_vector_sync
+    AFTER INSERT OR UPDATE OF text, incident_id OR DELETE ON incident_logs
+    FOR EACH ROW EXECUTE FUNCTION incident_logs_search_vector_trigger();
+
+    CREATE TRIGGER incident_logs_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON incident_logs
+    FOR EACH STATEMENT EXECUTE FUNCTION sat_bump_table_version();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('incidents', sa.Column('logs_archived_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('incidents', sa.Column('archived_log_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('incidents', sa.Column('archived_log_text', sa.Text(), nullable=True))
+
+    op.execute("ALTER TABLE incident_logs RENAME TO incident_logs_unpartitioned")
+    op.execute("ALTER TABLE incident_logs_unpartitioned RENAME CONSTRAINT incident_logs_pkey TO incident_logs_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_incident_logs_id RENAME TO ix_incident_logs_unpartitioned_id")
+    op.execute("ALTER INDEX ix_incident_logs_incident_id_date RENAME TO ix_incident_logs_unpartitioned_incident_id_date")
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE incident_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE incident_logs (
+            id integer NOT NULL DEFAULT nextval('incident_logs_id_seq'),
+            incident_id varchar REFERENCES incidents (id),
+            author varchar NOT NULL,
+            text text NOT NULL,
+            date timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, date)
+        ) PARTITION BY RANGE (date)
+    """)
+    op.execute("CREATE TABLE incident_logs_default PARTITION OF incident_logs DEFAULT")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_ensure_partitions(p_from date, p_to date)
+        RETURNS integer LANGUAGE plpgsql AS $$
+        DECLARE
+            part_start date := date_trunc('month', p_from)::date;
+            created integer := 0;
+            part_name text;
+        BEGIN
+            WHILE part_start <= p_to LOOP
+                part_name := 'incident_logs_' || to_char(part_start, '"y"YYYY"m"MM');
+                IF to_regclass(part_name) IS NULL THEN
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF incident_logs FOR VALUES FROM (%L) TO (%L)',
+                        part_name, part_start, (part_start + interval '1 month')::date
+                    );
+                    created := created + 1;
+                END IF;
+                part_start := (part_start + interval '1 month')::date;
+            END LOOP;
+            RETURN created;
+        END
+        $$
+    """)
+    op.execute("""
+        SELECT incident_logs_ensure_partitions(
+            coalesce((SELECT min(date) FROM incident_logs_unpartitioned), now())::date,
+            (now() + interval '3 months')::date
+        )
+    """)
+
+    op.execute("""
+        INSERT INTO incident_logs (id, incident_id, author, text, date)
+        SELECT l.id, l.incident_id, l.author, l.text, coalesce(l.date, i.created_at, now())
+        FROM incident_logs_unpartitioned l LEFT JOIN incidents i ON i.id = l.incident_id
+    """)
+    op.execute("DROP TABLE incident_logs_unpartitioned")
+    op.execute("ALTER SEQUENCE incident_logs_id_seq OWNED BY incident_logs.id")
+
+    op.execute("CREATE INDEX ix_incident_logs_id ON incident_logs (id)")
+    op.execute("CREATE INDEX ix_incident_logs_incident_id_date ON incident_logs (incident_id, date)")
+
+    # Archived log text still counts for full-text search
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_text(p_incident_id varchar)
+        RETURNS text LANGUAGE sql STABLE AS $$
+            SELECT concat_ws(' ',
+                (SELECT archived_log_text FROM incidents WHERE id = p_incident_id),
+                (SELECT string_agg(text, ' ' ORDER BY date) FROM incident_logs WHERE incident_id = p_incident_id))
+        $$
+    """)
+    op.execute(LOG_TRIGGERS)
+    op.execute("ANALYZE incident_logs")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION incident_logs_text(p_incident_id varchar)
+        RETURNS text LANGUAGE sql STABLE AS $$
+            SELECT string_agg(text, ' ' ORDER BY date) FROM incident_logs WHERE incident_id = p_incident_id
+        $$
+    """)
+    op.execute("ALTER TABLE incident_logs RENAME TO incident_logs_partitioned")
+    op.execute("ALTER SEQUENCE incident_logs_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX ix_incident_logs_id")
+    op.execute("DROP INDEX ix_incident_logs_incident_id_date")
+    op.execute("""
+        CREATE TABLE incident_logs (
+            id integer PRIMARY KEY DEFAULT nextval('incident_logs_id_seq'),
+            incident_id varchar REFERENCES incidents (id),
+            author varchar NOT NULL,
+            text text NOT NULL,
+            date timestamptz DEFAULT now()
+        )
+    """)
+    op.execute("INSERT INTO incident_logs SELECT id, incident_id, author, text, date FROM incident_logs_partitioned")
+    op.execute("DROP TABLE incident_logs_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS incident_logs_ensure_partitions(date, date)")
+    op.execute("ALTER SEQUENCE incident_logs_id_seq OWNED BY incident_logs.id")
+    op.execute("CREATE INDEX ix_incident_logs_id ON incident_logs (id)")
+    op.execute("CREATE INDEX ix_incident_logs_incident_id_date ON incident_logs (incident_id, date)")
+    op.execute(LOG_TRIGGERS)
+
+    op.drop_column('incidents', 'archived_log_text')
+    op.drop_column('incidents', 'archived_log_count')
+    op.drop_column('incidents', 'logs_archived_at')
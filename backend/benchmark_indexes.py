@@ -0,0 +1,169 @@
+import re
+import time
+import argparse
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from database import engine
+import models
+
+# Query plans for the SAT hot paths, before and after the indexes of the
+# "add sat query indexes" migration, on a synthetic dataset built in a scratch
+# schema. The real tables are never touched.
+#
+#   python benchmark_indexes.py --incidents 1000000 --logs-per-incident 3
+
+SCHEMA = "bench_indexes"
+
+TABLES = {
+    "machines": ["id"],
+    "incidents": ["id"],
+    "incident_logs": ["id"],
+}
+
+QUERIES = {
+    "list page (keyset)": """
+        SELECT id, title, status, created_at FROM incidents
+        ORDER BY created_at DESC, id DESC LIMIT 51
+    """,
+    "list page, next cursor": """
+        SELECT id, title, status, created_at FROM incidents
+        WHERE (created_at, id) < (now() - interval '90 days', 'INC-5')
+        ORDER BY created_at DESC, id DESC LIMIT 51
+    """,
+    "list page by status": """
+        SELECT id, title, created_at FROM incidents WHERE status = 'open'
+        ORDER BY created_at DESC, id DESC LIMIT 51
+    """,
+    "incidents of a machine": """
+        SELECT id, title, created_at FROM incidents WHERE machine_id = 'M-42'
+        ORDER BY created_at DESC, id DESC LIMIT 51
+    """,
+    "logs for a page (selectinload)": """
+        SELECT * FROM incident_logs WHERE incident_id IN (
+            SELECT id FROM incidents ORDER BY created_at DESC, id DESC LIMIT 50
+        )
+    """,
+    "logs of one incident": """
+        SELECT * FROM incident_logs WHERE incident_id = 'INC-123456' ORDER BY date
+    """,
+    "open backlog by priority": """
+        SELECT priority, count(*) FROM incidents WHERE status IN ('open', 'in_progress') GROUP BY priority
+    """,
+    "closed in the last week": """
+        SELECT count(*) FROM incidents WHERE closed_at >= now() - interval '7 days'
+    """,
+    "available machines (get_machines)": """
+        SELECT * FROM machines WHERE available = true
+    """,
+}
+
+
+def _populate(conn, n_incidents: int, logs_per_incident: int, n_machines: int):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}"))
+    # Same columns and defaults as the real tables, with only the primary keys
+    # and the serial unique index the schema had before the migration
+    for table, pk in TABLES.items():
+        conn.execute(text(f"CREATE TABLE {table} (LIKE public.{table} INCLUDING DEFAULTS)"))
+        conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(pk)})"))
+    conn.execute(text("CREATE UNIQUE INDEX ON machines (serial)"))
+    # The copied default would draw ids from the real table's sequence
+    conn.execute(text("ALTER TABLE incident_logs ALTER COLUMN id DROP DEFAULT"))
+
+    conn.execute(text("""
+        INSERT INTO machines (id, type, brand, model, serial, location, available)
+        SELECT 'M-' || g,
+               (ARRAY['Lavadora','Frigorífico','Secadora','Horno','Lavavajillas'])[1 + g % 5],
+               (ARRAY['Fagor','Samsung','Bosch','Beko'])[1 + g % 4],
+               'MOD-' || (g % 50), 'SER-' || g, 'Cocina', g % 10 <> 0
+        FROM generate_series(1, :n) g
+    """), {"n": n_machines})
+    conn.execute(text("""
+        INSERT INTO incidents (id, machine_id, title, description, status, priority, reported_by, created_at, closed_at)
+        SELECT 'INC-' || g, 'M-' || (1 + (g * 7919) % :machines),
+               'Incidencia ' || g, 'Descripción de la avería ' || g,
+               CASE WHEN g % 100 < 3 THEN 'open' WHEN g % 100 < 10 THEN 'in_progress'
+                    WHEN g % 100 < 60 THEN 'resolved' ELSE 'closed' END,
+               (ARRAY['low','medium','high','critical'])[1 + g % 4],
+               'bench',
+               now() - (g * interval '1 minute') * (730.0 * 24 * 60 / :n),
+               CASE WHEN g % 100 >= 10 THEN now() - (g * interval '1 minute') * (730.0 * 24 * 60 / :n) + interval '2 days' END
+        FROM generate_series(1, :n) g
+    """), {"n": n_incidents, "machines": n_machines})
+    conn.execute(text("""
+        INSERT INTO incident_logs (id, incident_id, author, text, date)
+        SELECT row_number() OVER (), i.id, 'Técnico', 'Revisión ' || s, i.created_at + s * interval '3 hours'
+        FROM incidents i CROSS JOIN generate_series(1, :k) s
+    """), {"k": logs_per_incident})
+    conn.execute(text("ANALYZE"))
+
+
+def _create_indexes(conn):
+    # Built from the model metadata, so this measures exactly what the models declare
+    for table in (models.Machine.__table__, models.Incident.__table__, models.IncidentLog.__table__):
+        for index in table.indexes:
+            if len(index.columns) == 1 and list(index.columns)[0].index:
+                continue  # Column(index=True) indexes already existed before the migration
+            conn.execute(CreateIndex(index))
+    conn.execute(text("ANALYZE"))
+
+
+def _explain(conn, sql: str):
+    rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).scalars().all()
+    millis = float(re.search(r"Execution Time: ([\d.]+) ms", rows[-1]).group(1))
+    return millis, rows
+
+
+def _run_queries(conn, repeat: int):
+    results = {}
+    for name, sql in QUERIES.items():
+        _explain(conn, sql)  # warm the cache
+        best, plan = None, None
+        for _ in range(repeat):
+            millis, rows = _explain(conn, sql)
+            if best is None or millis < best:
+                best, plan = millis, rows
+        results[name] = (best, plan)
+    return results
+
+
+def main(args):
+    started = time.monotonic()
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        print(f"Building {args.incidents} incidents x {args.logs_per_incident} logs in schema {SCHEMA}...")
+        _populate(conn, args.incidents, args.logs_per_incident, args.machines)
+        print(f"Dataset ready in {time.monotonic() - started:.0f}s")
+
+        before = _run_queries(conn, args.repeat)
+        _create_indexes(conn)
+        after = _run_queries(conn, args.repeat)
+
+        print()
+        print(f"{'query':38} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+        for name in QUERIES:
+            b, a = before[name][0], after[name][0]
+            print(f"{name:38} {b:10.2f} {a:10.2f} {b / max(a, 1e-3):7.1f}x")
+
+        if args.plans:
+            for name in QUERIES:
+                print(f"\n=== {name} ===\n--- before ---")
+                print("\n".join(before[name][1]))
+                print("--- after ---")
+                print("\n".join(after[name][1]))
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SAT query plans with and without the query indexes")
+    parser.add_argument("--incidents", type=int, default=1_000_000)
+    parser.add_argument("--logs-per-incident", type=int, default=3)
+    parser.add_argument("--machines", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the fastest is reported")
+    parser.add_argument("--plans", action="store_true", help="Print the full EXPLAIN ANALYZE output")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    main(parser.parse_args())
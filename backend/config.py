@@ -12,3 +12,109 @@ API_KEY = os.getenv("API_KEY")
 # Base directories
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
+
+# Database connection pools (one for the sync engine, one for the async engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800")) # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0")) # 0 disables
+# PgBouncer transaction pooling: no prepared statements or session settings are reused
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+# Mattin HTTP client (shared connection pool)
+MATTIN_MAX_CONNECTIONS = int(os.getenv("MATTIN_MAX_CONNECTIONS", "100"))
+MATTIN_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MATTIN_MAX_KEEPALIVE_CONNECTIONS", "20"))
+MATTIN_KEEPALIVE_EXPIRY = float(os.getenv("MATTIN_KEEPALIVE_EXPIRY", "30"))
+MATTIN_HTTP2 = os.getenv("MATTIN_HTTP2", "false").lower() in ("1", "true", "yes")
+MATTIN_CONNECT_TIMEOUT = float(os.getenv("MATTIN_CONNECT_TIMEOUT", "5"))
+
+# Read timeouts (seconds) per endpoint profile
+MATTIN_TIMEOUTS = {
+    "default": float(os.getenv("MATTIN_TIMEOUT_DEFAULT", "30")),
+    "chat": float(os.getenv("MATTIN_TIMEOUT_CHAT", "60")),
+    "summary": float(os.getenv("MATTIN_TIMEOUT_SUMMARY", "90")),
+    "upload": float(os.getenv("MATTIN_TIMEOUT_UPLOAD", "120")),
+    "reset": float(os.getenv("MATTIN_TIMEOUT_RESET", "20")),
+    "find": float(os.getenv("MATTIN_TIMEOUT_FIND", "15")),
+    "index": float(os.getenv("MATTIN_TIMEOUT_INDEX", "60")),
+}
+
+# Outbound Mattin governor: per (app_id, endpoint class) concurrency, rate (req/s) and burst
+MATTIN_GOVERNOR = {
+    "chat": {
+        "concurrency": int(os.getenv("MATTIN_CONCURRENCY_CHAT", "16")),
+        "rate": float(os.getenv("MATTIN_RATE_CHAT", "10")),
+        "burst": int(os.getenv("MATTIN_BURST_CHAT", "20")),
+    },
+    "find": {
+        "concurrency": int(os.getenv("MATTIN_CONCURRENCY_FIND", "32")),
+        "rate": float(os.getenv("MATTIN_RATE_FIND", "50")),
+        "burst": int(os.getenv("MATTIN_BURST_FIND", "100")),
+    },
+    "index": {
+        "concurrency": int(os.getenv("MATTIN_CONCURRENCY_INDEX", "4")),
+        "rate": float(os.getenv("MATTIN_RATE_INDEX", "5")),
+        "burst": int(os.getenv("MATTIN_BURST_INDEX", "10")),
+    },
+}
+# Concurrency shared by all classes of one app, queued by priority across classes (0 disables)
+MATTIN_CONCURRENCY_APP = int(os.getenv("MATTIN_CONCURRENCY_APP", "24"))
+MATTIN_QUEUE_SIZE = int(os.getenv("MATTIN_QUEUE_SIZE", "100"))
+MATTIN_QUEUE_TIMEOUT = float(os.getenv("MATTIN_QUEUE_TIMEOUT", "10"))
+
+# Mattin resilience: circuit breakers, retries and hedged reads
+MATTIN_BREAKER_FAILURES = int(os.getenv("MATTIN_BREAKER_FAILURES", "5"))
+MATTIN_BREAKER_RESET_SECONDS = float(os.getenv("MATTIN_BREAKER_RESET_SECONDS", "30"))
+MATTIN_RETRY_ATTEMPTS = int(os.getenv("MATTIN_RETRY_ATTEMPTS", "3"))
+MATTIN_RETRY_BASE_DELAY = float(os.getenv("MATTIN_RETRY_BASE_DELAY", "0.2"))
+MATTIN_RETRY_MAX_DELAY = float(os.getenv("MATTIN_RETRY_MAX_DELAY", "2"))
+MATTIN_HEDGE_FIND = os.getenv("MATTIN_HEDGE_FIND", "false").lower() in ("1", "true", "yes")
+MATTIN_HEDGE_MIN_DELAY = float(os.getenv("MATTIN_HEDGE_MIN_DELAY", "0.05"))
+
+# In-process cache for Mattin docs/find results
+MATTIN_SEARCH_CACHE_TTL = float(os.getenv("MATTIN_SEARCH_CACHE_TTL", "300"))
+MATTIN_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("MATTIN_SEARCH_CACHE_MAX_ENTRIES", "10000"))
+MATTIN_SEARCH_CACHE_MAX_BYTES = int(os.getenv("MATTIN_SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Streaming upload relay (chat/OCR proxy)
+MATTIN_RELAY_MAX_BYTES = int(os.getenv("MATTIN_RELAY_MAX_BYTES", str(50 * 1024 * 1024)))
+MATTIN_RELAY_MAX_CONCURRENT = int(os.getenv("MATTIN_RELAY_MAX_CONCURRENT", "8"))
+
+# Asynchronous chat jobs
+CHAT_JOBS_CONCURRENCY = int(os.getenv("CHAT_JOBS_CONCURRENCY", "16"))
+CHAT_JOBS_MAX_PENDING = int(os.getenv("CHAT_JOBS_MAX_PENDING", "500"))
+CHAT_JOBS_TTL = float(os.getenv("CHAT_JOBS_TTL", "600"))
+
+# SAT module
+SAT_INSIGHTS_TIMEOUT = float(os.getenv("SAT_INSIGHTS_TIMEOUT", "8"))
+SAT_IMPORT_BATCH_SIZE = int(os.getenv("SAT_IMPORT_BATCH_SIZE", "500")) # rows per executemany and commit
+SAT_IMPORT_MAX_ERRORS = int(os.getenv("SAT_IMPORT_MAX_ERRORS", "1000")) # row errors listed in the report
+SAT_EXPORT_FETCH_SIZE = int(os.getenv("SAT_EXPORT_FETCH_SIZE", "2000")) # rows per server-side cursor fetch
+SAT_LOG_BATCH_MAX_SIZE = int(os.getenv("SAT_LOG_BATCH_MAX_SIZE", "500")) # logs per batch append request
+
+# Incident log archival: logs of incidents closed longer than this move to gzipped NDJSON under uploads
+SAT_LOG_ARCHIVE_AFTER_DAYS = int(os.getenv("SAT_LOG_ARCHIVE_AFTER_DAYS", "365"))
+SAT_LOG_ARCHIVE_INTERVAL = float(os.getenv("SAT_LOG_ARCHIVE_INTERVAL", "86400")) # seconds between runs, 0 disables
+SAT_LOG_ARCHIVE_BATCH_SIZE = int(os.getenv("SAT_LOG_ARCHIVE_BATCH_SIZE", "200")) # incidents per transaction
+SAT_LOG_PARTITIONS_AHEAD = int(os.getenv("SAT_LOG_PARTITIONS_AHEAD", "3")) # monthly partitions created in advance
+SAT_LOG_PARTITION_INTERVAL = float(os.getenv("SAT_LOG_PARTITION_INTERVAL", "21600")) # seconds between partition checks, 0 = startup only
+
+# Mattin indexing outbox worker
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "10"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "900"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+
+# Bulk reindex
+REINDEX_CONCURRENCY = int(os.getenv("REINDEX_CONCURRENCY", "4"))
+
+# Local BM25 similarity over incidents
+# mattin: Mattin only | fallback: local when Mattin fails or finds nothing
+# local: local only (no Mattin round trip) | hybrid: both, re-ranked together
+SIMILARITY_MODE = os.getenv("SIMILARITY_MODE", "fallback").lower()
+SIMILARITY_HYBRID_ALPHA = float(os.getenv("SIMILARITY_HYBRID_ALPHA", "0.6"))
@@ -1,9 +1,16 @@
 import os
-from sqlalchemy import create_engine
+import time
+import uuid
+from collections import deque
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 
+import config
+
 load_dotenv()
 
 DATABASE_HOST = os.getenv("DATABASE_HOST", "localhost")
@@ -14,9 +21,136 @@ DATABASE_NAME = os.getenv("DATABASE_NAME", "techday")
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+
+
+class PoolMetrics:
+    """Checkout wait times of one engine's pool; the live counters come from the pool itself."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent = deque(maxlen=1000)
+
+    def record(self, waited: float):
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.recent.append(waited)
+
+    def stats(self, pool) -> dict:
+        recent = sorted(self.recent)
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": config.DB_MAX_OVERFLOW,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_ms": {
+                "avg": round(1000 * self.wait_total / self.checkouts, 2) if self.checkouts else 0,
+                "p95": round(1000 * recent[int(len(recent) * 0.95)], 2) if recent else 0,
+                "max": round(1000 * self.wait_max, 2),
+            },
+        }
+
+
+class _TimedPool:
+    """Times how long each checkout waits for a free connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def _sync_connect_args() -> dict:
+    if config.DB_STATEMENT_TIMEOUT_MS and not config.DB_PGBOUNCER:
+        return {"options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _async_connect_args() -> dict:
+    args = {}
+    if config.DB_STATEMENT_TIMEOUT_MS and not config.DB_PGBOUNCER:
+        args["server_settings"] = {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}
+    if config.DB_PGBOUNCER:
+        # With transaction pooling consecutive transactions may land on different
+        # server connections, so nothing can be prepared once and reused by name
+        args["statement_cache_size"] = 0
+        args["prepared_statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    return args
+
+
+def _set_local_statement_timeout(conn):
+    # PgBouncer rejects startup options and does not keep session SETs, so the
+    # timeout is set per transaction instead
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(config.DB_STATEMENT_TIMEOUT_MS)}")
+
+
+# Sync engine: sync routes (run in the threadpool), background workers and scripts like seed_data.py
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, poolclass=TimedQueuePool, connect_args=_sync_connect_args(), **_pool_options()
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for `async def` routes, so DB round trips do not block the event loop.
+# Objects stay usable after commit; relationships must be eager-loaded (no lazy IO).
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=TimedAsyncQueuePool, connect_args=_async_connect_args(), **_pool_options()
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if config.DB_PGBOUNCER and config.DB_STATEMENT_TIMEOUT_MS:
+    event.listen(engine, "begin", _set_local_statement_timeout)
+    event.listen(async_engine.sync_engine, "begin", _set_local_statement_timeout)
+
+
+def pool_stats() -> dict:
+    return {
+        "pgbouncer": config.DB_PGBOUNCER,
+        "statement_timeout_ms": config.DB_STATEMENT_TIMEOUT_MS,
+        "sync": engine.pool.metrics.stats(engine.pool),
+        "async": async_engine.pool.metrics.stats(async_engine.pool),
+    }
+
+
 Base = declarative_base()
 
 def get_db():
@@ -25,3 +159,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,28 +1,60 @@
 import os
 import httpx
+import asyncio
+from contextlib import asynccontextmanager
 from typing import List, Optional
-from fastapi import FastAPI, Request, HTTPException, Depends, UploadFile, File, Query, Form
+from fastapi import FastAPI, Request, HTTPException, UploadFile, File, Query, Form
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import shutil
-import glob
-from sqlalchemy.orm import Session
+import tempfile
 
 import config
-from database import engine, Base, get_db
-import models
-import schemas
-from modules import swarm, audio, mcp, sat
+import database
+from database import async_engine
+from modules import swarm, audio, mcp, sat, outbox, reindex, similarity, jobs, catalog, analytics, log_archive
+from mattin import client as mattin_client, relay
+from mattin.cache import search_cache
 
 # Create tables (already managed by alembic, but good to have)
 # Base.metadata.create_all(bind=engine)
 
 # Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="LKS Tech Day BFF")
+API_KEY = config.API_KEY
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("="*50)
+    print(f"LOADING CONFIG FROM: {config.BASE_DIR}")
+    print(f"MATTIN_URL: {config.MATTIN_URL}")
+    if API_KEY:
+        print(f"API_KEY: LOADED (Length: {len(API_KEY)})")
+    else:
+        print("API_KEY: NOT FOUND!")
+    print("="*50)
+
+    await mattin_client.startup()
+    await catalog.warm()
+    outbox.start()
+    log_archive.start()
+    similarity_build = asyncio.create_task(similarity.rebuild())
+    yield
+    similarity_build.cancel()
+    await jobs.stop()
+    await reindex.stop()
+    await outbox.stop()
+    await log_archive.stop()
+    await mattin_client.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(title="LKS Tech Day BFF", lifespan=lifespan)
 
 
 # ... middleware ...
+# Oversized relay uploads get their 413 before Starlette spools them (inside CORS, so browsers can read it)
+app.add_middleware(relay.UploadLimit)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], # Simplified for debugging
@@ -41,20 +73,27 @@ app.include_router(swarm.router)
 app.include_router(audio.router)
 app.include_router(mcp.router)
 app.include_router(sat.router)
-
-MATTIN_URL = config.MATTIN_URL
-API_KEY = config.API_KEY
-
-@app.on_event("startup")
-async def startup_event():
-    print("="*50)
-    print(f"LOADING CONFIG FROM: {config.BASE_DIR}")
-    print(f"MATTIN_URL: {config.MATTIN_URL}")
-    if API_KEY:
-        print(f"API_KEY: LOADED (Length: {len(API_KEY)})")
-    else:
-        print("API_KEY: NOT FOUND!")
-    print("="*50)
+app.include_router(analytics.router)
+app.include_router(log_archive.router)
+app.include_router(outbox.router)
+app.include_router(reindex.router)
+app.include_router(jobs.router)
+
+@app.get("/api/db/status")
+def db_status():
+    """Live state of the database connection pools and the machine catalog cache."""
+    return {**database.pool_stats(), "machine_catalog": catalog.stats()}
+
+@app.get("/api/mattin/status")
+def mattin_status():
+    """Live state of the outbound Mattin traffic controls and the search cache."""
+    return {
+        **mattin_client.stats(),
+        "search_cache": search_cache.stats(),
+        "local_similarity": {"mode": config.SIMILARITY_MODE, **similarity.index.stats()},
+        "search_coalescing": sat.search_flights.stats(),
+        "upload_relay": relay.stats(),
+    }
 
 # Mattin AI Helpers moved to modules/sat.py or modules/swarm.py as needed
 # SAT Module Endpoints moved to modules/sat.py
@@ -62,106 +101,113 @@ async def startup_event():
 
 @app.post("/api/chat/{app_id}/{agent_id}/reset")
 async def reset_chat(app_id: int, agent_id: int):
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent_id}/reset"
-    headers = {"X-API-KEY": API_KEY}
+    url = f"/public/v1/app/{app_id}/chat/{agent_id}/reset"
+    
+    try:
+        response = await mattin_client.request("POST", url, profile="reset")
+        response.raise_for_status()
+        return response.json()
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _chat_call(app_id: int, agent_id: int, body: dict):
+    url = f"/public/v1/app/{app_id}/chat/{agent_id}/call"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(url, headers=headers)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            raise HTTPException(status_code=e.response.status_code, detail=str(e))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        # Mattin expects form-urlencoded (data=...) not JSON
+        response = await mattin_client.request("POST", url, profile="chat", data=body)
+        response.raise_for_status()
+        return response.json()
+    except httpx.ReadTimeout:
+        print("ERROR MATTIN CHAT: Timeout waiting for response")
+        raise HTTPException(status_code=504, detail="Timeout waiting for AI response")
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        print(f"ERROR MATTIN CHAT (HTTP): {str(e)} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        print(f"ERROR MATTIN CHAT: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/chat/{app_id}/{agent_id}/call")
-async def chat_call(app_id: int, agent_id: int, request: Request):
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent_id}/call"
-    headers = {
-        "X-API-KEY": API_KEY,
-    }
-    
+async def chat_call(app_id: int, agent_id: int, request: Request, job: bool = Query(False, description="Return a job id immediately instead of waiting")):
     body = await request.json()
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            # Mattin expects form-urlencoded (data=...) not JSON
-            response = await client.post(url, headers=headers, data=body)
-            response.raise_for_status()
-            return response.json()
-        except httpx.ReadTimeout:
-            print(f"ERROR MATTIN CHAT: Timeout waiting for response")
-            raise HTTPException(status_code=504, detail="Timeout waiting for AI response")
-        except httpx.HTTPStatusError as e:
-            print(f"ERROR MATTIN CHAT (HTTP): {str(e)} - {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=str(e))
-        except Exception as e:
-            print(f"ERROR MATTIN CHAT: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    if job:
+        chat_job = jobs.submit("chat", lambda: _chat_call(app_id, agent_id, body))
+        return JSONResponse(status_code=202, content=jobs.accepted(chat_job))
+    
+    return await _chat_call(app_id, agent_id, body)
 
-@app.post("/public/v1/app/{app_id}/chat/{agent_id}/call")
-async def proxy_mattin_chat_call(app_id: int, agent_id: int, files: List[UploadFile] = File(None), message: Optional[str] = Form(None)):
-    print(f"DEBUG: Proxying Chat Call. AppID: {app_id}, AgentID: {agent_id}")
+async def _relay_chat_call(app_id: int, agent_id: int, files: List[UploadFile], message: Optional[str]):
+    url = f"/public/v1/app/{app_id}/chat/{agent_id}/call"
     
-    upload_files = []
+    fields = {"message": message} if message else {}
     
-    if files:
-        for file in files:
-            content = await file.read()
-            upload_files.append((file.filename, content, file.content_type))
-            print(f"DEBUG: Received file: {file.filename} ({file.content_type}) - Size: {len(content)} bytes")
-    else:
-        print("DEBUG: No files received")
-        
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent_id}/call"
-    print(f"DEBUG: Forwarding to: {url}")
+    try:
+        if files:
+            # Uploads stay in their spools and are piped to Mattin chunk by chunk
+            content_type, body = relay.multipart_body(fields, [("files", f) for f in files])
+            headers = {
+                "Accept": "application/json",
+                "Content-Type": content_type
+            }
+            async with relay.slot():
+                response = await mattin_client.request("POST", url, profile="upload", headers=headers, content=body)
+        else:
+            # Message only: form-urlencoded, as Mattin has always received it
+            response = await mattin_client.request("POST", url, profile="upload", headers={"Accept": "application/json"}, data=fields)
+
+        print(f"DEBUG: Mattin Response Code: {response.status_code} ({len(response.content)} bytes)")
+
+        response.raise_for_status()
+        return response.json()
+    except httpx.ReadTimeout:
+        print("ERROR MATTIN PROXY: Timeout waiting for response")
+        raise HTTPException(status_code=504, detail="Timeout waiting for AI response")
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        print(f"ERROR MATTIN PROXY (HTTP): {str(e)} - {e.response.text[:200]}")
+        raise HTTPException(status_code=e.response.status_code, detail=f"Mattin Error: {e.response.text}")
+    except Exception as e:
+        print(f"ERROR MATTIN PROXY: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/public/v1/app/{app_id}/chat/{agent_id}/call")
+async def proxy_mattin_chat_call(
+    app_id: int,
+    agent_id: int,
+    files: List[UploadFile] = File(None),
+    message: Optional[str] = Form(None),
+    job: bool = Query(False, description="Return a job id immediately instead of waiting")
+):
+    files = files or []
+    total_bytes = relay.check_size(files)
+    print(f"DEBUG: Proxying Chat Call. AppID: {app_id}, AgentID: {agent_id}, "
+          f"files: {len(files)} ({total_bytes} bytes), message: {len(message or '')} chars")
     
-    headers = {
-        "X-API-KEY": API_KEY,
-        "Accept": "application/json"
-    }
+    if job:
+        # The request's spools are closed once we answer, so the job gets its own copies (disk-backed, not read into memory)
+        kept = []
+        for f in files:
+            spool = tempfile.TemporaryFile()
+            await f.seek(0)
+            await asyncio.to_thread(shutil.copyfileobj, f.file, spool)
+            kept.append(UploadFile(spool, size=f.size, filename=f.filename, headers=f.headers))
+        chat_job = jobs.submit(
+            "proxy_chat",
+            lambda: _relay_chat_call(app_id, agent_id, kept, message),
+            cleanup=[k.file.close for k in kept]
+        )
+        return JSONResponse(status_code=202, content=jobs.accepted(chat_job))
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        try:
-            req_data = {}
-            if message:
-                print(f"DEBUG: Message content: {message}")
-                req_data["message"] = message
-
-            if upload_files:
-                # Prepare files for httpx
-                # httpx expects 'files' arg as a dictionary or list of tuples.
-                # If the target API expects multiple values for 'files' key:
-                # files=[('files', (filename, content, type)), ...]
-                
-                httpx_files = []
-                for fname, fcontent, ftype in upload_files:
-                    httpx_files.append(("files", (fname, fcontent, ftype)))
-                
-                print("DEBUG: Sending multipart request to Mattin with files...")
-                response = await client.post(url, headers=headers, files=httpx_files, data=req_data)
-            else:
-                print("DEBUG: Sending form request to Mattin...")
-                response = await client.post(url, headers=headers, data=req_data)
-
-            print(f"DEBUG: Mattin Response Code: {response.status_code}")
-            print(f"DEBUG: Mattin Response Body: {response.text[:500]}...") # Log first 500 chars
-
-            if response.status_code != 200:
-                print(f"DEBUG: Mattin Error Response: {response.text}")
-
-            response.raise_for_status()
-            return response.json()
-        except httpx.ReadTimeout:
-            print(f"ERROR MATTIN PROXY: Timeout waiting for response")
-            raise HTTPException(status_code=504, detail="Timeout waiting for AI response")
-        except httpx.HTTPStatusError as e:
-            print(f"ERROR MATTIN PROXY (HTTP): {str(e)} - {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=f"Mattin Error: {e.response.text}")
-        except Exception as e:
-            print(f"ERROR MATTIN PROXY: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    return await _relay_chat_call(app_id, agent_id, files, message)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,107 @@
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+MISSING = object()
+
+
+def search_key(app_id, silo_id, query: str, filter_metadata: Optional[dict], k: int) -> Tuple:
+    """Cache key for a docs/find call; whitespace and case in the query do not matter."""
+    normalized = " ".join((query or "").lower().split())
+    filters = json.dumps(filter_metadata or {}, sort_keys=True, ensure_ascii=False)
+    return (str(app_id), str(silo_id), normalized, filters, int(k))
+
+
+class SearchCache:
+    """TTL + LRU cache bounded by entry count and approximate memory, invalidated per silo.
+
+    Each silo has a generation number bumped on every write to it. A lookup
+    started before a write cannot store its (now stale) result afterwards.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple, Tuple[Any, float, int]]" = OrderedDict()
+        self.by_silo: Dict[Tuple[str, str], set] = defaultdict(set)
+        self.generations: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, app_id, silo_id) -> int:
+        return self.generations[(str(app_id), str(silo_id))]
+
+    def get(self, key: Tuple):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        value, expires, _ = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Tuple, value: Any, generation: int):
+        silo = key[:2]
+        if self.generations[silo] != generation or self.ttl <= 0:
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (value, time.monotonic() + self.ttl, size)
+        self.by_silo[silo].add(key)
+        self.bytes += size
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_silo(self, app_id, silo_id):
+        silo = (str(app_id), str(silo_id))
+        self.generations[silo] += 1
+        for key in self.by_silo.pop(silo, set()):
+            self._remove(key)
+        self.invalidations += 1
+
+    def _remove(self, key: Tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+            keys = self.by_silo.get(key[:2])
+            if keys is not None:
+                keys.discard(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+search_cache = SearchCache(
+    ttl=config.MATTIN_SEARCH_CACHE_TTL,
+    max_entries=config.MATTIN_SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=config.MATTIN_SEARCH_CACHE_MAX_BYTES,
+)
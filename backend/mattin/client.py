@@ -0,0 +1,80 @@
+import httpx
+from typing import Optional
+
+import config
+from mattin import governor, resilience
+
+# Single AsyncClient shared by every module that talks to Mattin. It is created
+# in the app lifespan (see main.py) so connections are kept alive and reused
+# instead of paying a TCP+TLS handshake per request.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = config.MATTIN_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            print("WARNING: MATTIN_HTTP2 enabled but 'h2' is not installed, falling back to HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.MATTIN_MAX_CONNECTIONS,
+        max_keepalive_connections=config.MATTIN_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.MATTIN_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        base_url=config.MATTIN_URL,
+        headers={"X-API-KEY": config.API_KEY or ""},
+        limits=limits,
+        timeout=timeout("default"),
+        http2=http2,
+    )
+
+
+def timeout(profile: str = "default") -> httpx.Timeout:
+    """Timeout for an endpoint profile (chat, summary, upload, reset, find, index)."""
+    read = config.MATTIN_TIMEOUTS.get(profile, config.MATTIN_TIMEOUTS["default"])
+    return httpx.Timeout(read, connect=config.MATTIN_CONNECT_TIMEOUT)
+
+
+async def startup():
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def shutdown():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it lazily for scripts running outside the app."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def request(method: str, path: str, profile: str = "default", priority: int = governor.INTERACTIVE, **kwargs) -> httpx.Response:
+    """Sends a request to Mattin through the shared pool. `path` is relative to MATTIN_URL.
+
+    Every attempt is admitted by the governor first, so bursts queue (interactive
+    calls ahead of background ones) instead of flooding Mattin. The resilience
+    layer wraps the attempts with a circuit breaker, retries and hedging.
+    """
+    kwargs.setdefault("timeout", timeout(profile))
+
+    async def send() -> httpx.Response:
+        async with governor.slot(path, priority):
+            return await get_client().request(method, path, **kwargs)
+
+    return await resilience.call(method, path, send)
+
+
+def stats() -> dict:
+    return {"governor": governor.stats(), "endpoints": resilience.stats()}
@@ -0,0 +1,206 @@
+import re
+import time
+import heapq
+import asyncio
+import itertools
+from typing import Dict, Tuple, Optional
+from fastapi import HTTPException
+
+import config
+
+# Priorities for queued requests (lower is served first)
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_APP_RE = re.compile(r"/app/(\d+)/")
+_seq = itertools.count()
+
+
+class MattinBusy(HTTPException):
+    """Raised when the governor cannot admit a request (queue full or queue timeout)."""
+
+    def __init__(self, detail: str, retry_after: int = 1):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+
+
+def endpoint_class(path: str) -> str:
+    """Maps a Mattin path to its governor class: chat, find or index."""
+    if "/chat/" in path:
+        return "chat"
+    if path.endswith("/docs/find"):
+        return "find"
+    return "index"
+
+
+class _Gate:
+    """Concurrency semaphore + token bucket + bounded priority wait queue."""
+
+    def __init__(self, concurrency: int, rate: float, burst: int, queue_size: int):
+        self.limit = max(1, concurrency)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiters = []  # heap of [priority, seq, future]
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _drop_waiter(self, entry):
+        try:
+            self.waiters.remove(entry)
+            heapq.heapify(self.waiters)
+        except ValueError:
+            pass
+
+    def _make_room(self, priority: int) -> bool:
+        """Frees a queue slot for `priority` by evicting the newest lower-priority waiter."""
+        victims = [w for w in self.waiters if w[0] > priority and not w[2].done()]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda w: (w[0], w[1]))
+        self._drop_waiter(victim)
+        self.rejected += 1
+        victim[2].set_exception(MattinBusy("Mattin queue full, request preempted"))
+        return True
+
+    async def acquire(self, priority: int, queue_timeout: float):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+        else:
+            if len(self.waiters) >= self.queue_size and not self._make_room(priority):
+                self.rejected += 1
+                raise MattinBusy("Mattin queue full")
+
+            fut = asyncio.get_running_loop().create_future()
+            entry = [priority, next(_seq), fut]
+            heapq.heappush(self.waiters, entry)
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), queue_timeout)
+            except asyncio.TimeoutError:
+                if fut.done() and not fut.cancelled() and fut.exception() is None:
+                    # The slot was handed over just as we timed out
+                    self.release()
+                else:
+                    fut.cancel()
+                self._drop_waiter(entry)
+                self.timeouts += 1
+                raise MattinBusy("Timed out waiting for a Mattin slot")
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled() and fut.exception() is None:
+                    self.release()
+                else:
+                    fut.cancel()
+                self._drop_waiter(entry)
+                raise
+
+        try:
+            await self._take_token()
+        except BaseException:
+            self.release()
+            raise
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot directly to the best waiter so it cannot be stolen
+        while self.waiters:
+            _, _, fut = heapq.heappop(self.waiters)
+            if not fut.done():
+                fut.set_result(True)
+                return
+        self.active -= 1
+
+    async def _take_token(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "limit": self.limit,
+            "waiting": len(self.waiters),
+            "tokens": round(self.tokens, 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_timeouts": self.timeouts,
+        }
+
+
+_gates: Dict[Tuple[Optional[str], str], _Gate] = {}
+# One per app, shared by all its classes: interactive calls of any class are admitted
+# ahead of queued background ones when the app as a whole is saturated
+_app_gates: Dict[Optional[str], _Gate] = {}
+
+
+def traffic_key(path: str) -> Tuple[Optional[str], str]:
+    """(app_id, endpoint class) for a Mattin path."""
+    match = _APP_RE.search(path)
+    return (match.group(1) if match else None, endpoint_class(path))
+
+
+def _gate_for(path: str) -> _Gate:
+    key = traffic_key(path)
+    cls = key[1]
+    gate = _gates.get(key)
+    if gate is None:
+        limits = config.MATTIN_GOVERNOR[cls]
+        gate = _Gate(limits["concurrency"], limits["rate"], limits["burst"], config.MATTIN_QUEUE_SIZE)
+        _gates[key] = gate
+    return gate
+
+
+def _app_gate_for(path: str) -> Optional[_Gate]:
+    if config.MATTIN_CONCURRENCY_APP <= 0:
+        return None
+    app_id = traffic_key(path)[0]
+    gate = _app_gates.get(app_id)
+    if gate is None:
+        gate = _Gate(config.MATTIN_CONCURRENCY_APP, 0, 1, config.MATTIN_QUEUE_SIZE)
+        _app_gates[app_id] = gate
+    return gate
+
+
+class slot:
+    """Async context manager holding a governor slot for one outbound Mattin call.
+
+    The class gate is taken first (its own cap and rate), then the app's shared
+    gate, so a request never holds shared capacity while waiting on its class.
+    """
+
+    def __init__(self, path: str, priority: int = INTERACTIVE):
+        self.gate = _gate_for(path)
+        self.app_gate = _app_gate_for(path)
+        self.priority = priority
+
+    async def __aenter__(self):
+        deadline = time.monotonic() + config.MATTIN_QUEUE_TIMEOUT
+        await self.gate.acquire(self.priority, config.MATTIN_QUEUE_TIMEOUT)
+        if self.app_gate:
+            try:
+                await self.app_gate.acquire(self.priority, max(0, deadline - time.monotonic()))
+            except BaseException:
+                self.gate.release()
+                raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.app_gate:
+            self.app_gate.release()
+        self.gate.release()
+        return False
+
+
+def stats() -> dict:
+    gates = {f"{app_id or '-'}:{cls}": gate.stats() for (app_id, cls), gate in _gates.items()}
+    gates.update((f"{app_id or '-'}:shared", gate.stats()) for app_id, gate in _app_gates.items())
+    return gates
@@ -0,0 +1,145 @@
+import os
+import re
+import uuid
+import asyncio
+from typing import AsyncIterator, Dict, List, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+import config
+from mattin.governor import MattinBusy
+
+CHUNK_SIZE = 64 * 1024
+# Room for the message field and the multipart framing on top of MATTIN_RELAY_MAX_BYTES of files
+FORM_OVERHEAD = 1024 * 1024
+RELAY_PATH = re.compile(r"^/public/v1/app/\d+/chat/\d+/call$")
+
+_slots = asyncio.Semaphore(config.MATTIN_RELAY_MAX_CONCURRENT)
+_active = 0
+_rejected = 0
+_oversized = 0
+_relayed_bytes = 0
+
+
+def upload_size(file: UploadFile) -> int:
+    """Size of an already spooled upload, without reading it."""
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def check_size(files: List[UploadFile]) -> int:
+    total = sum(upload_size(f) for f in files)
+    if total > config.MATTIN_RELAY_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Uploads total {total} bytes, the limit is {config.MATTIN_RELAY_MAX_BYTES} bytes"
+        )
+    return total
+
+
+def _too_large(size: str) -> str:
+    return f"Request body of {size} bytes is over the {config.MATTIN_RELAY_MAX_BYTES} bytes upload limit"
+
+
+class UploadLimit:
+    """ASGI middleware rejecting relay uploads over the limit before they are spooled:
+    up front on Content-Length, or as soon as a body without one goes past it.
+    check_size still applies the exact limit to the files once they are parsed."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not RELAY_PATH.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        global _oversized
+        limit = config.MATTIN_RELAY_MAX_BYTES + FORM_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > limit:
+            _oversized += 1
+            response = JSONResponse(status_code=413, content={"detail": _too_large(length.decode())})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            global _oversized
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    _oversized += 1
+                    # Raised while the form is parsed, so FastAPI answers it like any HTTPException
+                    raise HTTPException(status_code=413, detail=_too_large(f"more than {limit}"))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\r", "").replace("\n", "")
+
+
+def multipart_body(fields: Dict[str, str], files: List[Tuple[str, UploadFile]]) -> Tuple[str, AsyncIterator[bytes]]:
+    """Content type and a lazy multipart/form-data body. File parts are read from the
+    upload spools in CHUNK_SIZE pieces as the connection drains, so at most one chunk
+    per relay is held in memory."""
+    boundary = uuid.uuid4().hex
+
+    async def body() -> AsyncIterator[bytes]:
+        global _relayed_bytes
+        for name, value in fields.items():
+            yield (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+            ).encode() + value.encode() + b"\r\n"
+        for name, upload in files:
+            await upload.seek(0)
+            yield (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"; '
+                f'filename="{_quote(upload.filename or "upload")}"\r\n'
+                f'Content-Type: {upload.content_type or "application/octet-stream"}\r\n\r\n'
+            ).encode()
+            while chunk := await upload.read(CHUNK_SIZE):
+                _relayed_bytes += len(chunk)
+                yield chunk
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode()
+
+    return f"multipart/form-data; boundary={boundary}", body()
+
+
+class slot:
+    """Bounds the number of concurrent upload relays; waits up to MATTIN_QUEUE_TIMEOUT."""
+
+    async def __aenter__(self):
+        global _active, _rejected
+        try:
+            await asyncio.wait_for(_slots.acquire(), config.MATTIN_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            _rejected += 1
+            raise MattinBusy("Too many uploads being relayed to Mattin, try again shortly",
+                             retry_after=max(1, int(config.MATTIN_QUEUE_TIMEOUT)))
+        _active += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        global _active
+        _active -= 1
+        _slots.release()
+        return False
+
+
+def stats() -> dict:
+    return {
+        "active": _active,
+        "limit": config.MATTIN_RELAY_MAX_CONCURRENT,
+        "rejected": _rejected,
+        "oversized": _oversized,
+        "relayed_bytes": _relayed_bytes,
+    }
@@ -0,0 +1,210 @@
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import httpx
+from fastapi import HTTPException
+
+import config
+from mattin.governor import traffic_key
+
+# Upstream answers that mean "Mattin is struggling" rather than "bad request"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class MattinUnavailable(HTTPException):
+    """Raised without calling Mattin while the endpoint's circuit breaker is open."""
+
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(max(1, retry_after))})
+
+
+class CircuitBreaker:
+    """Opens after N consecutive failures, lets one trial call through after the reset timeout."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def allow(self):
+        if self.state == OPEN:
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.short_circuited += 1
+                raise MattinUnavailable("Mattin circuit open, failing fast", int(remaining))
+            self.state = HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == HALF_OPEN:
+            if self.trial_in_flight:
+                self.short_circuited += 1
+                raise MattinUnavailable("Mattin circuit half-open, trial call in flight", 1)
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """The call was cancelled before it could prove anything either way."""
+        self.trial_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class _Endpoint:
+    def __init__(self):
+        self.breaker = CircuitBreaker(config.MATTIN_BREAKER_FAILURES, config.MATTIN_BREAKER_RESET_SECONDS)
+        self.latencies = deque(maxlen=200)
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 20:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(q * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "breaker": self.breaker.stats(),
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_endpoints: Dict[Tuple[Optional[str], str], _Endpoint] = {}
+
+
+def _endpoint_for(path: str) -> _Endpoint:
+    key = traffic_key(path)
+    ep = _endpoints.get(key)
+    if ep is None:
+        ep = _endpoints[key] = _Endpoint()
+    return ep
+
+
+def _is_idempotent(method: str, path: str) -> bool:
+    return method.upper() in ("GET", "DELETE", "PUT") or path.endswith("/docs/find") or path.endswith("/reset")
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: spreads retries from many callers instead of synchronising them
+    return random.uniform(0, min(config.MATTIN_RETRY_MAX_DELAY, config.MATTIN_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+async def _attempt(ep: _Endpoint, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    ep.breaker.allow()
+    ep.requests += 1
+    start = time.monotonic()
+    try:
+        response = await send()
+    except httpx.TransportError:
+        ep.failures += 1
+        ep.breaker.record_failure()
+        raise
+    except BaseException:
+        ep.breaker.release_trial()
+        raise
+
+    if response.status_code in RETRYABLE_STATUS:
+        ep.failures += 1
+        ep.breaker.record_failure()
+    else:
+        ep.breaker.record_success()
+        ep.latencies.append(time.monotonic() - start)
+    return response
+
+
+async def _hedged(ep: _Endpoint, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """Fires a duplicate request when the first one outlives the endpoint's p95."""
+    p95 = ep.percentile(0.95)
+    if p95 is None:
+        return await _attempt(ep, send)
+
+    tasks = [asyncio.ensure_future(_attempt(ep, send))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=max(p95, config.MATTIN_HEDGE_MIN_DELAY))
+        if done:
+            return tasks[0].result()
+
+        ep.hedges += 1
+        tasks.append(asyncio.ensure_future(_attempt(ep, send)))
+        pending = set(tasks)
+        last = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                last = task
+                if task.exception() is None and task.result().status_code not in RETRYABLE_STATUS:
+                    if task is tasks[1]:
+                        ep.hedge_wins += 1
+                    return task.result()
+        return last.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call(method: str, path: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """Runs `send` behind the endpoint's breaker, retrying idempotent calls with jittered backoff."""
+    ep = _endpoint_for(path)
+    attempts = max(1, config.MATTIN_RETRY_ATTEMPTS) if _is_idempotent(method, path) else 1
+    hedge = config.MATTIN_HEDGE_FIND and path.endswith("/docs/find")
+
+    for attempt in range(attempts):
+        if attempt:
+            ep.retries += 1
+            await asyncio.sleep(_backoff(attempt))
+        try:
+            response = await (_hedged(ep, send) if hedge else _attempt(ep, send))
+        except httpx.TransportError as e:
+            print(f"DEBUG: Mattin {method} {path} attempt {attempt + 1}/{attempts} failed: {e!r}")
+            if attempt == attempts - 1:
+                raise
+            continue
+        if response.status_code in RETRYABLE_STATUS and attempt < attempts - 1:
+            print(f"DEBUG: Mattin {method} {path} attempt {attempt + 1}/{attempts} got {response.status_code}")
+            continue
+        return response
+
+
+def stats() -> dict:
+    return {f"{app_id or '-'}:{cls}": ep.stats() for (app_id, cls), ep in _endpoints.items()}
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so they share one upstream future.
+
+    The shared task is shielded from each caller: a caller that is cancelled
+    simply stops waiting, and the task is only cancelled once nobody is left
+    waiting on it. Exceptions are re-raised to every caller of that flight.
+    """
+
+    def __init__(self):
+        self.calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self.calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self.calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up: stop the upstream call and let the next caller start afresh
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self.calls.get(key) is call:
+            del self.calls[key]
+
+    def _finished(self, key: Hashable, call: _Call):
+        self._forget(key, call)
+        if not call.task.cancelled():
+            call.task.exception()  # mark retrieved; callers already got it
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.calls), "leaders": self.leaders, "coalesced": self.followers}
@@ -0,0 +1,326 @@
+"""Local stand-in for the Mattin routes used by the BFF.
+
+Modes:
+  stub    in-memory fake: silos with lexical search, canned agent answers
+  record  forwards to a real Mattin and appends every exchange to a cassette
+  replay  answers from a cassette, deterministically, without any network
+
+Usage:
+  python -m mattin.stub --port 8100 --latency find=uniform:0.02,0.08 --error-rate chat=0.05
+  python -m mattin.stub --mode record --upstream https://aict-desa.lksnext.com --cassette mattin.jsonl
+  python -m mattin.stub --mode replay --cassette mattin.jsonl
+
+Then start the BFF with MATTIN_URL=http://localhost:8100.
+
+Latency specs: fixed:S | uniform:A,B | normal:MEAN,STD | lognormal:MU,SIGMA (seconds).
+--latency and --error-rate accept an optional chat=/find=/index= prefix and can be repeated.
+"""
+import re
+import json
+import uuid
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Optional
+import httpx
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, Response
+
+from mattin.governor import endpoint_class
+
+CLASSES = ("chat", "find", "index")
+API_PREFIX = "/public/v1/app/{app_id}"
+
+
+# --- LATENCY / ERROR INJECTION ---
+
+def parse_latency(spec: str):
+    """Returns a zero-arg sampler (seconds) for a latency spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _per_class(values: List[str], default):
+    """Expands ['find=0.1', '0.2'] into {'chat': '0.2', 'find': '0.1', 'index': '0.2'}."""
+    result = {cls: default for cls in CLASSES}
+    overrides = {}
+    for value in values or []:
+        cls, sep, rest = value.partition("=")
+        if sep and cls in CLASSES:
+            overrides[cls] = rest
+        else:
+            result = {c: value for c in CLASSES}
+    result.update(overrides)
+    return result
+
+
+class Faults:
+    def __init__(self, latency: Dict[str, str], error_rate: Dict[str, str], error_status: int, seed: Optional[int]):
+        self.rng = random.Random(seed)
+        self.latency = {cls: parse_latency(spec) for cls, spec in latency.items()}
+        self.error_rate = {cls: float(rate) for cls, rate in error_rate.items()}
+        self.error_status = error_status
+
+    async def apply(self, path: str) -> Optional[Response]:
+        cls = endpoint_class(path)
+        await asyncio.sleep(self.latency[cls](self.rng))
+        if self.rng.random() < self.error_rate[cls]:
+            return JSONResponse(status_code=self.error_status, content={"detail": "stub injected error"})
+        return None
+
+
+# --- IN-MEMORY SILOS ---
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> set:
+    return {t for t in _WORD_RE.findall((text or "").lower()) if len(t) > 2}
+
+
+class SiloStore:
+    def __init__(self):
+        self.silos: Dict[str, Dict[str, dict]] = defaultdict(dict)
+
+    def index(self, silo_id: str, content: str, metadata: dict) -> str:
+        doc_id = uuid.uuid4().hex
+        self.silos[silo_id][doc_id] = {"id": doc_id, "content": content, "metadata": metadata or {}}
+        return doc_id
+
+    def delete(self, silo_id: str, ids: List[str]) -> int:
+        docs = self.silos[silo_id]
+        return sum(1 for i in ids if docs.pop(i, None) is not None)
+
+    def delete_by_metadata(self, silo_id: str, filters: dict) -> int:
+        docs = self.silos[silo_id]
+        doomed = [i for i, d in docs.items() if all(d["metadata"].get(k) == v for k, v in (filters or {}).items())]
+        for i in doomed:
+            del docs[i]
+        return len(doomed)
+
+    def find(self, silo_id: str, query: str, k: int, filters: Optional[dict]) -> List[dict]:
+        q = _tokens(query)
+        scored = []
+        for doc in self.silos[silo_id].values():
+            if filters and not all(doc["metadata"].get(key) == val for key, val in filters.items()):
+                continue
+            terms = _tokens(doc["content"])
+            similarity = len(q & terms) / len(q | terms) if q and terms else 0.0
+            scored.append((similarity, doc))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        # Mattin reports a distance in metadata._score and a relevance in score
+        return [
+            {
+                "id": doc["id"],
+                "content": doc["content"],
+                "score": round(sim, 4),
+                "metadata": {**doc["metadata"], "_score": round(1 - sim, 4)},
+            }
+            for sim, doc in scored[:k]
+        ]
+
+
+# --- CANNED AGENT ANSWERS ---
+
+def _agent_answer(agent_id: int, message: str, has_files: bool, rng: random.Random) -> str:
+    if '"next"' in message:
+        agents = re.findall(r"^- ([^:\n]+):", message, re.MULTILINE)
+        turn = re.search(r"Turno actual: (\d+)", message)
+        if not agents or (turn and int(turn.group(1)) > 2 * len(agents)):
+            return json.dumps({"next": "fin"})
+        return json.dumps({"next": rng.choice(agents)})
+    if "transcription" in message:
+        return json.dumps({"transcription": "Transcripción simulada del audio.", "sentiment": "neutral"})
+    if has_files:
+        return f"[stub agent {agent_id}] Documento recibido y procesado."
+    return f"[stub agent {agent_id}] Respuesta simulada a: {message[:120]}"
+
+
+def _install_stub_routes(app: FastAPI, store: SiloStore, rng: random.Random):
+    silo = API_PREFIX + "/silos/silos/{silo_id}/docs"
+
+    @app.post(API_PREFIX + "/chat/{agent_id}/call")
+    async def chat_call(app_id: int, agent_id: int, message: Optional[str] = Form(None), files: List[UploadFile] = File(None)):
+        return {"response": _agent_answer(agent_id, message or "", bool(files), rng)}
+
+    @app.post(API_PREFIX + "/chat/{agent_id}/reset")
+    async def chat_reset(app_id: int, agent_id: int):
+        return {"status": "ok"}
+
+    @app.post(silo + "/find")
+    async def docs_find(app_id: int, silo_id: str, request: Request):
+        body = await request.json()
+        return {"docs": store.find(silo_id, body.get("query", ""), int(body.get("k", 4)), body.get("filter_metadata"))}
+
+    @app.post(silo + "/index")
+    async def docs_index(app_id: int, silo_id: str, request: Request):
+        body = await request.json()
+        return {"id": store.index(silo_id, body.get("content", ""), body.get("metadata"))}
+
+    @app.post(silo + "/index-file")
+    async def docs_index_file(app_id: int, silo_id: str, file: UploadFile = File(...), metadata: str = Form("{}")):
+        size = 0
+        while chunk := await file.read(1024 * 1024):
+            size += len(chunk)
+        meta = {**json.loads(metadata), "page": 1, "total_pages": 1}
+        doc_id = store.index(silo_id, f"{file.filename} ({size} bytes) {' '.join(map(str, meta.values()))}", meta)
+        return {"status": "ok", "ids": [doc_id]}
+
+    @app.delete(silo + "/delete")
+    async def docs_delete(app_id: int, silo_id: str, request: Request):
+        body = await request.json()
+        return {"deleted": store.delete(silo_id, body.get("ids", []))}
+
+    @app.delete(silo + "/delete-by-metadata")
+    async def docs_delete_by_metadata(app_id: int, silo_id: str, request: Request):
+        body = await request.json()
+        return {"deleted": store.delete_by_metadata(silo_id, body.get("filter_metadata"))}
+
+
+# --- RECORD / REPLAY ---
+
+async def request_key(request: Request, body: bytes) -> str:
+    """Stable key for an exchange; multipart boundaries and field order do not affect it."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        canonical = json.dumps(json.loads(body or b"null"), sort_keys=True)
+    elif content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        parts = []
+        for name, value in (await request.form()).multi_items():
+            if hasattr(value, "read"):
+                value = f"{value.filename}:{hashlib.sha256(await value.read()).hexdigest()}"
+            parts.append((name, value))
+        canonical = json.dumps(sorted(parts))
+    else:
+        canonical = body.decode("latin-1")
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{request.method} {request.url.path} {digest}"
+
+
+class Cassette:
+    """JSONL file of recorded exchanges; repeated keys replay in recording order, cycling."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, List[dict]] = defaultdict(list)
+        self.cursor: Dict[str, int] = defaultdict(int)
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]].append(entry)
+        return self
+
+    def append(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def next(self, key: str) -> Optional[dict]:
+        recorded = self.entries.get(key)
+        if not recorded:
+            return None
+        entry = recorded[self.cursor[key] % len(recorded)]
+        self.cursor[key] += 1
+        return entry
+
+
+def _install_record_route(app: FastAPI, cassette: Cassette, upstream: str):
+    client = httpx.AsyncClient(base_url=upstream, timeout=httpx.Timeout(180.0, connect=10.0))
+
+    @app.api_route("/{path:path}", methods=["GET", "POST", "DELETE", "PUT"])
+    async def record(path: str, request: Request):
+        body = await request.body()
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in ("host", "content-length")}
+        upstream_res = await client.request(request.method, request.url.path, params=request.query_params, headers=headers, content=body)
+        cassette.append({
+            "key": await request_key(request, body),
+            "status": upstream_res.status_code,
+            "content_type": upstream_res.headers.get("content-type", "application/json"),
+            "body": base64.b64encode(upstream_res.content).decode("ascii"),
+        })
+        return Response(upstream_res.content, status_code=upstream_res.status_code,
+                        media_type=upstream_res.headers.get("content-type"))
+
+
+def _install_replay_route(app: FastAPI, cassette: Cassette):
+    @app.api_route("/{path:path}", methods=["GET", "POST", "DELETE", "PUT"])
+    async def replay(path: str, request: Request):
+        key = await request_key(request, await request.body())
+        entry = cassette.next(key)
+        if entry is None:
+            return JSONResponse(status_code=404, content={"detail": f"No recording for {key}"})
+        return Response(base64.b64decode(entry["body"]), status_code=entry["status"], media_type=entry["content_type"])
+
+
+def create_app(mode: str = "stub", latency: Dict[str, str] = None, error_rate: Dict[str, str] = None,
+               error_status: int = 503, seed: Optional[int] = None, cassette: Optional[str] = None,
+               upstream: Optional[str] = None) -> FastAPI:
+    app = FastAPI(title=f"Mattin stub ({mode})")
+    faults = Faults(latency or _per_class([], "fixed:0"), error_rate or _per_class([], "0"), error_status, seed)
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        # Faults are only injected in stub/replay: in record mode we want real answers
+        if mode != "record":
+            injected = await faults.apply(request.url.path)
+            if injected is not None:
+                return injected
+        return await call_next(request)
+
+    if mode == "stub":
+        _install_stub_routes(app, SiloStore(), faults.rng)
+    elif mode == "record":
+        _install_record_route(app, Cassette(cassette), upstream)
+    elif mode == "replay":
+        _install_replay_route(app, Cassette(cassette).load())
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+    import config
+
+    parser = argparse.ArgumentParser(description="Local Mattin stand-in for offline load testing")
+    parser.add_argument("--mode", choices=["stub", "record", "replay"], default="stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", action="append", help="[class=]distribution:params, repeatable")
+    parser.add_argument("--error-rate", action="append", help="[class=]probability, repeatable")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cassette", default="mattin_cassette.jsonl")
+    parser.add_argument("--upstream", default=config.MATTIN_URL)
+    args = parser.parse_args()
+
+    if args.mode == "record" and args.upstream.rstrip("/").endswith(f":{args.port}"):
+        parser.error("--upstream points at this stub; pass the real Mattin URL")
+
+    uvicorn.run(
+        create_app(
+            mode=args.mode,
+            latency=_per_class(args.latency, "fixed:0"),
+            error_rate=_per_class(args.error_rate, "0"),
+            error_status=args.error_status,
+            seed=args.seed,
+            cassette=args.cassette,
+            upstream=args.upstream,
+        ),
+        host=args.host,
+        port=args.port,
+    )
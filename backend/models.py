@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Boolean, Date, DateTime, Float, ForeignKey, Text, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 from database import Base
 
 class Machine(Base):
@@ -16,6 +17,11 @@ class Machine(Base):
 
     incidents = relationship("Incident", back_populates="machine")
 
+    __table_args__ = (
+        # get_machines and the MCP catalog tools only ever read available machines
+        Index("ix_machines_available_type_model", "type", "model", postgresql_where=text("available")),
+    )
+
 class Incident(Base):
     __tablename__ = "incidents"
 
@@ -29,21 +35,146 @@ class Incident(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     closed_at = Column(DateTime(timezone=True), nullable=True)
     mattin_id = Column(String, nullable=True)
+    # Spanish full-text vector over title, description and log text, maintained by triggers
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+    # Logs of long-closed incidents are moved to uploads/log_archive by modules/log_archive.py
+    logs_archived_at = Column(DateTime(timezone=True), nullable=True)
+    archived_log_count = Column(Integer, nullable=False, server_default="0")
+    archived_log_text = deferred(Column(Text, nullable=True)) # kept for full-text and similarity search
+    # No log of the incident is older; kept by the incident_logs triggers, NULL until the first log
+    first_log_at = Column(DateTime(timezone=True), nullable=True)
 
     machine = relationship("Machine", back_populates="incidents")
-    logs = relationship("IncidentLog", back_populates="incident", cascade="all, delete-orphan")
+    # The first_log_at bound lets Postgres skip older log partitions
+    logs = relationship(
+        "IncidentLog", back_populates="incident", cascade="all, delete-orphan",
+        primaryjoin="and_(Incident.id == IncidentLog.incident_id, IncidentLog.date >= Incident.first_log_at)"
+    )
+
+    # Btree scans run backwards, so these also serve ORDER BY created_at DESC, id DESC (keyset pages)
+    __table_args__ = (
+        Index("ix_incidents_created_at_id", "created_at", "id"),
+        Index("ix_incidents_machine_id_created_at", "machine_id", "created_at", "id"),
+        Index("ix_incidents_status_created_at", "status", "created_at", "id"),
+        Index("ix_incidents_active_priority", "priority", "created_at",
+              postgresql_where=text("status IN ('open', 'in_progress')")),
+        Index("ix_incidents_closed_at", "closed_at", postgresql_where=text("closed_at IS NOT NULL")),
+        Index("ix_incidents_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    # created_at comes back with the INSERT (RETURNING), analytics buckets need it before commit
+    __mapper_args__ = {"eager_defaults": True}
 
 class IncidentLog(Base):
+    # Range-partitioned by month on `date`; the table's primary key is (id, date), ids are still unique
     __tablename__ = "incident_logs"
 
     id = Column(Integer, primary_key=True, index=True)
     incident_id = Column(String, ForeignKey("incidents.id"))
     author = Column(String, nullable=False)
     text = Column(Text, nullable=False)
-    date = Column(DateTime(timezone=True), server_default=func.now())
+    date = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     incident = relationship("Incident", back_populates="logs")
 
+    __table_args__ = (
+        Index("ix_incident_logs_incident_id_date", "incident_id", "date"),
+    )
+
+    __mapper_args__ = {"eager_defaults": True}
+
+class OutboxJob(Base):
+    __tablename__ = "mattin_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False) # index_incident
+    incident_id = Column(String, ForeignKey("incidents.id", ondelete="CASCADE"), nullable=False)
+    app_id = Column(Integer, nullable=False)
+    silo_id = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pending") # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_mattin_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+class ReindexRun(Base):
+    __tablename__ = "reindex_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    app_id = Column(Integer, nullable=False)
+    incident_silo_id = Column(String, nullable=True)
+    docs_silo_id = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="running") # running, completed, interrupted
+    total = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class ReindexItem(Base):
+    __tablename__ = "reindex_items"
+
+    run_id = Column(Integer, ForeignKey("reindex_runs.id", ondelete="CASCADE"), primary_key=True)
+    item_key = Column(String, primary_key=True) # incident:<id> or doc:<machine_id>/<filename>
+    status = Column(String, nullable=False) # done, failed
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class MachineDocument(Base):
+    __tablename__ = "machine_documents"
+
+    machine_id = Column(String, primary_key=True)
+    filename = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False) # hash is reused while size and mtime are unchanged
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class IndexedDocument(Base):
+    __tablename__ = "mattin_indexed_documents"
+
+    app_id = Column(Integer, primary_key=True)
+    silo_id = Column(String, primary_key=True)
+    machine_id = Column(String, primary_key=True)
+    filename = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    metadata_json = Column(Text, nullable=False) # metadata the document was indexed with
+    indexed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class TableVersion(Base):
+    # Several shard rows per table, so concurrent writers rarely bump the same row; the
+    # table's version is the sum of its shards
+    __tablename__ = "sat_table_versions"
+
+    table_name = Column(String, primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, server_default="0")
+    version = Column(BigInteger, nullable=False, server_default="0") # bumped by a trigger on every write to the table
+
+class IncidentStat(Base):
+    """Pre-aggregated incident activity per machine and time bucket, kept current by modules/analytics.py."""
+    __tablename__ = "sat_incident_stats"
+
+    granularity = Column(String, primary_key=True) # day, week, month, all
+    bucket_start = Column(Date, primary_key=True) # UTC; weeks start on Monday; 1970-01-01 for "all"
+    machine_id = Column(String, primary_key=True) # "" for incidents without a machine
+    opened = Column(Integer, nullable=False, server_default="0")
+    resolved = Column(Integer, nullable=False, server_default="0") # resolved/closed with a closed_at, bucketed by closed_at
+    repair_seconds = Column(Float, nullable=False, server_default="0") # sum of closed_at - created_at of those
+    logs = Column(Integer, nullable=False, server_default="0")
+
+class IncidentBacklog(Base):
+    __tablename__ = "sat_incident_backlog"
+
+    priority = Column(String, primary_key=True)
+    status = Column(String, primary_key=True) # open, in_progress
+    count = Column(Integer, nullable=False, server_default="0")
+
 # You can add other module's models here as needed, 
 # ensuring they are independent or properly related.
 
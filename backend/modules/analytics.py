@@ -0,0 +1,282 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Literal, Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database import get_db
+import models
+
+router = APIRouter(prefix="/api/sat/analytics", tags=["sat"])
+
+# SAT dashboards read pre-aggregated counters instead of scanning incidents:
+#
+#   sat_incident_stats    opened / resolved / repair time / logs per machine and
+#                         bucket, at day, week, month and all-time granularity
+#   sat_incident_backlog  open and in-progress incidents per priority
+#
+# Every write path describes the incident before and after the change; the
+# difference is applied as one upsert per table in the writer's transaction.
+
+GRANULARITIES = ("day", "week", "month", "all")
+ALL_TIME = date(1970, 1, 1)
+ACTIVE = ("open", "in_progress")
+DONE = ("resolved", "closed")
+
+DIMENSIONS = {
+    "machine": ["machine_id", "type", "brand", "model"],
+    "type": ["type"],
+    "brand": ["brand"],
+    "model": ["type", "brand", "model"],
+}
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def bucket_start(granularity: str, value) -> date:
+    day = _utc(value).date() if isinstance(value, datetime) else value
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return ALL_TIME
+
+
+def snapshot(incident) -> SimpleNamespace:
+    """The fields analytics depend on, captured before an incident is modified."""
+    return SimpleNamespace(
+        machine_id=incident.machine_id, status=incident.status, priority=incident.priority,
+        created_at=incident.created_at, closed_at=incident.closed_at
+    )
+
+
+class Delta:
+    """Counter changes collected for one transaction."""
+
+    def __init__(self):
+        self.stats: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0, 0.0, 0])
+        self.backlog: Dict[tuple, int] = defaultdict(int)
+
+    def _add(self, when, machine_id: Optional[str], column: int, amount: float):
+        for granularity in GRANULARITIES:
+            self.stats[(granularity, bucket_start(granularity, when), machine_id or "")][column] += amount
+
+    def incident(self, incident, sign: int = 1):
+        """Adds (sign=1) or withdraws (sign=-1) what an incident in this state contributes."""
+        if incident.created_at is not None:
+            self._add(incident.created_at, incident.machine_id, 0, sign)
+        if incident.status in DONE and incident.closed_at is not None and incident.created_at is not None:
+            repair = max(0.0, (_utc(incident.closed_at) - _utc(incident.created_at)).total_seconds())
+            self._add(incident.closed_at, incident.machine_id, 1, sign)
+            self._add(incident.closed_at, incident.machine_id, 2, sign * repair)
+        if incident.status in ACTIVE:
+            self.backlog[(incident.priority or "medium", incident.status)] += sign
+        return self
+
+    def change(self, before, after):
+        return self.incident(before, -1).incident(after)
+
+    def logs(self, machine_id: Optional[str], dates: Iterable[datetime], sign: int = 1):
+        for when in dates:
+            self._add(when or datetime.now(timezone.utc), machine_id, 3, sign)
+        return self
+
+    def statements(self) -> list:
+        # Sorted keys: concurrent writers lock the counter rows in the same order
+        stats = [
+            {"granularity": k[0], "bucket_start": k[1], "machine_id": k[2],
+             "opened": v[0], "resolved": v[1], "repair_seconds": v[2], "logs": v[3]}
+            for k, v in sorted(self.stats.items()) if any(v)
+        ]
+        backlog = [
+            {"priority": k[0], "status": k[1], "count": v}
+            for k, v in sorted(self.backlog.items()) if v
+        ]
+        result = []
+        if stats:
+            stmt = pg_insert(models.IncidentStat).values(stats)
+            result.append(stmt.on_conflict_do_update(
+                index_elements=["granularity", "bucket_start", "machine_id"],
+                set_={column: getattr(models.IncidentStat, column) + stmt.excluded[column]
+                      for column in ("opened", "resolved", "repair_seconds", "logs")}
+            ))
+        if backlog:
+            stmt = pg_insert(models.IncidentBacklog).values(backlog)
+            result.append(stmt.on_conflict_do_update(
+                index_elements=["priority", "status"],
+                set_={"count": models.IncidentBacklog.count + stmt.excluded["count"]}
+            ))
+        return result
+
+
+def apply(db: Session, delta: Delta):
+    """Writes the delta in the caller's transaction; call before commit."""
+    for stmt in delta.statements():
+        db.execute(stmt)
+
+
+async def apply_async(db, delta: Delta):
+    for stmt in delta.statements():
+        await db.execute(stmt)
+
+
+REBUILD_SQL = [
+    "DELETE FROM sat_incident_stats",
+    "DELETE FROM sat_incident_backlog",
+    """
+    INSERT INTO sat_incident_stats (granularity, bucket_start, machine_id, opened, resolved, repair_seconds, logs)
+    SELECT g.granularity,
+           CASE WHEN g.granularity = 'all' THEN DATE '1970-01-01'
+                ELSE date_trunc(g.granularity, e.at AT TIME ZONE 'UTC')::date END,
+           e.machine_id, sum(e.opened), sum(e.resolved), sum(e.repair_seconds), sum(e.logs)
+    FROM (
+        SELECT created_at AS at, coalesce(machine_id, '') AS machine_id, 1 AS opened, 0 AS resolved, 0.0 AS repair_seconds, 0 AS logs
+        FROM incidents WHERE created_at IS NOT NULL
+        UNION ALL
+        SELECT closed_at, coalesce(machine_id, ''), 0, 1, greatest(0, extract(epoch FROM closed_at - created_at)), 0
+        FROM incidents WHERE status IN ('resolved', 'closed') AND closed_at IS NOT NULL AND created_at IS NOT NULL
+        UNION ALL
+        SELECT coalesce(l.date, now()), coalesce(i.machine_id, ''), 0, 0, 0.0, 1
+        FROM incident_logs l JOIN incidents i ON i.id = l.incident_id
+    ) e
+    CROSS JOIN (VALUES ('day'), ('week'), ('month'), ('all')) AS g (granularity)
+    GROUP BY 1, 2, 3
+    """,
+    """
+    INSERT INTO sat_incident_backlog (priority, status, count)
+    SELECT coalesce(priority, 'medium'), status, count(*) FROM incidents
+    WHERE status IN ('open', 'in_progress') GROUP BY 1, 2
+    """,
+]
+
+
+def rebuild(db: Session):
+    """Recomputes every counter from incidents and logs (full scan). For data written
+    outside the API, e.g. seed_data.py. Logs already moved to cold storage
+    (log_archive) are not in the table and drop out of the log counts. The caller commits."""
+    for sql in REBUILD_SQL:
+        db.execute(text(sql))
+
+
+# --- ENDPOINTS ---
+
+def _window(granularity: str, date_from: Optional[date], date_to: Optional[date]):
+    if granularity == "all":
+        return ALL_TIME, ALL_TIME
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days={"day": 30, "week": 7 * 12, "month": 365}[granularity])
+    return bucket_start(granularity, date_from), date_to
+
+
+def _stats_query(db: Session, granularity: str, date_from, date_to, group_by: str, *measures):
+    stat = models.IncidentStat
+    machine = models.Machine
+    dims = [
+        stat.machine_id if dim == "machine_id" else getattr(machine, dim)
+        for dim in DIMENSIONS[group_by]
+    ]
+    return (
+        db.query(stat.bucket_start, *dims, *measures)
+        .outerjoin(machine, machine.id == stat.machine_id)
+        .filter(stat.granularity == granularity, stat.bucket_start >= date_from, stat.bucket_start <= date_to)
+        .group_by(stat.bucket_start, *dims)
+        .order_by(stat.bucket_start, *dims)
+        .all()
+    )
+
+
+@router.get("/mttr")
+def get_mttr(
+    granularity: Literal["day", "week", "month", "all"] = "month",
+    group_by: Literal["type", "brand", "model", "machine"] = "type",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Mean time to repair (closed_at - created_at) of incidents resolved in each bucket."""
+    start, end = _window(granularity, date_from, date_to)
+    stat = models.IncidentStat
+    rows = _stats_query(db, granularity, start, end, group_by,
+                        func.sum(stat.resolved).label("resolved"),
+                        func.sum(stat.repair_seconds).label("repair_seconds"))
+    dims = DIMENSIONS[group_by]
+    return {
+        "granularity": granularity,
+        "from": start,
+        "to": end,
+        "items": [
+            {
+                "bucket": row[0],
+                **dict(zip(dims, row[1:1 + len(dims)])),
+                "resolved": row.resolved,
+                "mttr_hours": round(row.repair_seconds / row.resolved / 3600, 2) if row.resolved else None,
+            }
+            for row in rows if row.resolved
+        ],
+    }
+
+
+@router.get("/incident-rates")
+def get_incident_rates(
+    granularity: Literal["day", "week", "month", "all"] = "month",
+    group_by: Literal["type", "brand", "model", "machine"] = "machine",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Incidents opened per bucket, and per machine of each group."""
+    start, end = _window(granularity, date_from, date_to)
+    stat = models.IncidentStat
+    rows = _stats_query(db, granularity, start, end, group_by,
+                        func.sum(stat.opened).label("opened"),
+                        func.sum(stat.logs).label("logs"))
+    dims = DIMENSIONS[group_by]
+    machine_counts = {}
+    if group_by != "machine":
+        columns = [getattr(models.Machine, dim) for dim in dims]
+        machine_counts = {
+            tuple(row[:-1]): row[-1]
+            for row in db.query(*columns, func.count(models.Machine.id)).group_by(*columns).all()
+        }
+    items = []
+    for row in rows:
+        if not (row.opened or row.logs):
+            continue  # counters netted back to zero, e.g. after a delete
+        key = tuple(row[1:1 + len(dims)])
+        machines = 1 if group_by == "machine" else machine_counts.get(key, 0)
+        items.append({
+            "bucket": row[0],
+            **dict(zip(dims, key)),
+            "incidents": row.opened,
+            "logs": row.logs,
+            "machines": machines,
+            "incidents_per_machine": round(row.opened / machines, 3) if machines else None,
+        })
+    return {"granularity": granularity, "from": start, "to": end, "items": items}
+
+
+@router.get("/backlog")
+def get_backlog(db: Session = Depends(get_db)):
+    """Open and in-progress incidents per priority, right now."""
+    by_priority: Dict[str, Dict[str, int]] = {}
+    for row in db.query(models.IncidentBacklog).filter(models.IncidentBacklog.count != 0).all():
+        by_priority.setdefault(row.priority, {status: 0 for status in ACTIVE})[row.status] = row.count
+    return {
+        "total": sum(sum(counts.values()) for counts in by_priority.values()),
+        "by_priority": by_priority,
+    }
+
+
+@router.post("/rebuild")
+def rebuild_analytics(db: Session = Depends(get_db)):
+    """Recomputes the counters from scratch, e.g. after editing incidents directly in the database."""
+    rebuild(db)
+    db.commit()
+    return {"status": "success"}
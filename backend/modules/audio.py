@@ -6,13 +6,11 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db, AsyncSessionLocal
 import models
 import schemas
-import config
-
-MATTIN_URL = config.MATTIN_URL
-API_KEY = config.API_KEY
+from mattin import client as mattin_client
 
 router = APIRouter(prefix="/api/audio", tags=["audio"])
 
@@ -20,7 +18,7 @@ UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads",
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/upload", response_model=schemas.Transcription)
-async def upload_audio(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_audio(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     # Create a unique filename using timestamp and uuid
     ext = os.path.splitext(file.filename)[1]
     if not ext:
@@ -35,19 +33,21 @@ async def upload_audio(file: UploadFile = File(...), db: Session = Depends(get_d
     
     db_transcription = models.Transcription(filename=unique_filename)
     db.add(db_transcription)
-    db.commit()
-    db.refresh(db_transcription)
+    await db.commit()
+    await db.refresh(db_transcription)
     
     return db_transcription
 
 @router.post("/transcribe/{transcription_id}", response_model=schemas.Transcription)
 async def transcribe_audio(
     transcription_id: int, 
-    db: Session = Depends(get_db),
     app_id: int = Query(..., description="Mattin Application ID"),
     agent_id: int = Query(..., description="Mattin Agent ID")
 ):
-    db_transcription = db.query(models.Transcription).filter(models.Transcription.id == transcription_id).first()
+    # Short sessions on either side of the Mattin call: no pooled connection or
+    # transaction is held while the upload and the transcription run
+    async with AsyncSessionLocal() as db:
+        db_transcription = await db.get(models.Transcription, transcription_id)
     if not db_transcription:
         raise HTTPException(status_code=404, detail="Transcription not found")
     
@@ -58,8 +58,7 @@ async def transcribe_audio(
     
     try:
         # Call Mattin AI agent endpoint with the file
-        url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent_id}/call"
-        headers = {"X-API-KEY": API_KEY}
+        url = f"/public/v1/app/{app_id}/chat/{agent_id}/call"
         
         # Prepare the multipart form data
         with open(file_path, "rb") as audio_file:
@@ -68,8 +67,7 @@ async def transcribe_audio(
                 "message": "Por favor, obtén el path ABSOLUTO de este archivo de audio. Después, transcribe el audio y analiza el sentimiento (positivo, negativo o neutral). Responde SOLO con un JSON en este formato: {\"transcription\": \"texto transcrito\", \"sentiment\": \"positivo/negativo/neutral\"}"
             }
             
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(url, headers=headers, files=files, data=data)
+            response = await mattin_client.request("POST", url, profile="upload", files=files, data=data)
         
         if response.status_code != 200:
             raise HTTPException(
@@ -90,26 +88,33 @@ async def transcribe_audio(
             json_match = re.search(r'\{[^}]*"transcription"[^}]*"sentiment"[^}]*\}', agent_message)
             if json_match:
                 parsed_data = json.loads(json_match.group())
-                db_transcription.content = parsed_data.get("transcription", agent_message)
+                content = parsed_data.get("transcription", agent_message)
                 sentiment = parsed_data.get("sentiment", "neutral").lower()
                 # Map Spanish to English if needed
                 sentiment_map = {"positivo": "positive", "negativo": "negative", "neutral": "neutral"}
-                db_transcription.sentiment = sentiment_map.get(sentiment, sentiment)
+                sentiment = sentiment_map.get(sentiment, sentiment)
             else:
                 # If no JSON found, use the full response as transcription
-                db_transcription.content = agent_message
-                db_transcription.sentiment = "neutral"
+                content = agent_message
+                sentiment = "neutral"
         except Exception as parse_error:
             print(f"Error parsing agent response: {parse_error}")
             # Fallback: use the raw response
-            db_transcription.content = agent_message
-            db_transcription.sentiment = "neutral"
+            content = agent_message
+            sentiment = "neutral"
         
-        db.commit()
-        db.refresh(db_transcription)
+        async with AsyncSessionLocal() as db:
+            db_transcription = await db.get(models.Transcription, transcription_id)
+            if not db_transcription:
+                raise HTTPException(status_code=404, detail="Transcription not found")
+            db_transcription.content = content
+            db_transcription.sentiment = sentiment
+            await db.commit()
         
         return db_transcription
         
+    except HTTPException:
+        raise
     except httpx.HTTPError as e:
         raise HTTPException(status_code=500, detail=f"Error calling Mattin AI: {str(e)}")
     except Exception as e:
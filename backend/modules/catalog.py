@@ -0,0 +1,124 @@
+import uuid
+import asyncio
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import func
+
+from database import SessionLocal
+import models
+import schemas
+
+# In-process read-through cache of the machine catalog. Machine writes bump the
+# version; the next read rebuilds the snapshot once and every later read is
+# served from memory. Each read also checks the machines counter in
+# sat_table_versions (one indexed read), so writes made by other workers,
+# instances or seed_data.py rebuild it too.
+
+
+class Snapshot:
+    """Immutable view of the catalog at one version, with the lookups precomputed."""
+
+    def __init__(self, version: int, db_version: Optional[int], machines: List[models.Machine]):
+        self.version = version
+        self.db_version = db_version
+        # get_machines: available machines, already serialized
+        self.available = [
+            schemas.Machine.model_validate(m).model_dump(mode="json") for m in machines if m.available
+        ]
+        # MCP tools: every machine, as they have always listed them
+        self.types = sorted({m.type for m in machines if m.type})
+        self.models_by_type: Dict[str, List[dict]] = {}
+        for m in machines:
+            self.models_by_type.setdefault(m.type, []).append({"id": m.id, "model": m.model, "type": m.type})
+
+    @property
+    def tag(self) -> tuple:
+        """What ETags are built on: the shared counter, the same in every process, when there is one."""
+        return ("db", self.db_version) if self.db_version is not None else (INSTANCE, self.version)
+
+
+# Versions restart at 0 with the process; this keeps ETags built on them unique
+INSTANCE = uuid.uuid4().hex
+
+_lock = threading.Lock()
+_version = 0
+_snapshot: Optional[Snapshot] = None
+_loads = 0
+_hits = 0
+
+
+def version() -> int:
+    return _version
+
+
+def bump():
+    """Call after committing any machine change."""
+    global _version, _snapshot
+    with _lock:
+        _version += 1
+        _snapshot = None
+
+
+def _db_version(db) -> Optional[int]:
+    """Sum of the machines counter shards; None before the counters exist."""
+    version = (
+        db.query(func.sum(models.TableVersion.version))
+        .filter(models.TableVersion.table_name == "machines")
+        .scalar()
+    )
+    return int(version) if version is not None else None
+
+
+def snapshot() -> Snapshot:
+    global _snapshot, _loads, _hits
+    db = SessionLocal()
+    try:
+        # Read before the machines: a write landing in between only makes the snapshot look older
+        db_version = _db_version(db)
+        current = _snapshot
+        if current is not None and current.version == _version and current.db_version == db_version:
+            _hits += 1
+            return current
+        loading = _version
+        fresh = Snapshot(loading, db_version, db.query(models.Machine).order_by(models.Machine.id).all())
+    finally:
+        db.close()
+    with _lock:
+        _loads += 1
+        # A write committed while loading makes this snapshot stale; serve it, don't keep it
+        if _version == loading:
+            _snapshot = fresh
+    return fresh
+
+
+def available_machines() -> List[dict]:
+    return snapshot().available
+
+
+def machine_types() -> List[str]:
+    return snapshot().types
+
+
+def machine_models(machine_type: str) -> List[dict]:
+    return snapshot().models_by_type.get(machine_type, [])
+
+
+async def warm():
+    try:
+        ready = await asyncio.to_thread(snapshot)
+        print(f"DEBUG: Machine catalog cached: version {ready.version}, {len(ready.available)} available machines")
+    except Exception as e:
+        print(f"ERROR WARMING MACHINE CATALOG: {str(e)}")
+
+
+def stats() -> dict:
+    current = _snapshot
+    return {
+        "version": _version,
+        "db_version": current.db_version if current else None,
+        "cached": current is not None,
+        "machines": len(current.available) if current else None,
+        "types": len(current.types) if current else None,
+        "hits": _hits,
+        "loads": _loads,
+    }
@@ -0,0 +1,193 @@
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+import config
+from mattin.governor import MattinBusy
+
+router = APIRouter(prefix="/api/chat/jobs", tags=["chat"])
+
+# Opt-in asynchronous mode for long chat calls: the POST returns a job id right
+# away and the Mattin call runs here, in a bounded pool, so no client connection
+# is held open while the agent thinks. Finished jobs are kept for CHAT_JOBS_TTL.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Event()
+        self.cleanup: List[Callable[[], None]] = []
+
+    def set_status(self, status: str):
+        self.status = status
+        if status in FINISHED:
+            self.finished_at = time.time()
+        # Wake every current waiter, then re-arm for the next transition
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def payload(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+_jobs: Dict[str, Job] = {}
+_pool = asyncio.Semaphore(config.CHAT_JOBS_CONCURRENCY)
+
+
+def _prune():
+    expired = time.time() - config.CHAT_JOBS_TTL
+    for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < expired]:
+        del _jobs[job_id]
+
+
+async def _run(job: Job, fn: Callable[[], Awaitable[Any]]):
+    try:
+        async with _pool:
+            job.set_status(RUNNING)
+            job.result = await fn()
+        job.set_status(SUCCEEDED)
+    except asyncio.CancelledError:
+        job.set_status(CANCELLED)
+    except HTTPException as e:
+        job.error = {"status_code": e.status_code, "detail": e.detail}
+        job.set_status(FAILED)
+    except Exception as e:
+        job.error = {"status_code": 500, "detail": str(e)}
+        job.set_status(FAILED)
+
+
+def _finished(job: Job):
+    # Also covers tasks cancelled before they ever started running
+    if job.status not in FINISHED:
+        job.set_status(CANCELLED)
+    for cleanup in job.cleanup:
+        cleanup()
+
+
+def submit(kind: str, fn: Callable[[], Awaitable[Any]], cleanup: Optional[List[Callable[[], None]]] = None) -> Job:
+    """Starts `fn` as a background job and returns it immediately."""
+    _prune()
+    pending = sum(1 for j in _jobs.values() if j.status not in FINISHED)
+    if pending >= config.CHAT_JOBS_MAX_PENDING:
+        for c in cleanup or []:
+            c()
+        raise MattinBusy("Too many chat jobs in progress, try again shortly", retry_after=5)
+    job = Job(kind)
+    job.cleanup = cleanup or []
+    _jobs[job.id] = job
+    job.task = asyncio.create_task(_run(job, fn))
+    job.task.add_done_callback(lambda task: _finished(job))
+    return job
+
+
+def accepted(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "poll_url": f"{router.prefix}/{job.id}",
+        "events_url": f"{router.prefix}/{job.id}/events",
+    }
+
+
+async def stop():
+    tasks = [j.task for j in _jobs.values() if j.task and not j.task.done()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _get(job_id: str) -> Job:
+    _prune()
+    job = _jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+# --- ENDPOINTS ---
+
+@router.get("")
+def list_jobs():
+    _prune()
+    counts: Dict[str, int] = {}
+    for job in _jobs.values():
+        counts[job.status] = counts.get(job.status, 0) + 1
+    return {"jobs": counts, "concurrency": config.CHAT_JOBS_CONCURRENCY, "ttl_seconds": config.CHAT_JOBS_TTL}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60, description="Long-poll: seconds to wait for the job to finish")):
+    job = _get(job_id)
+    deadline = time.monotonic() + wait
+    while job.status not in FINISHED:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            await asyncio.wait_for(job.changed.wait(), remaining)
+        except asyncio.TimeoutError:
+            break
+    return job.payload()
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: one `status` event per transition and a final `result` event."""
+    job = _get(job_id)
+
+    async def event_generator():
+        last = None
+        while True:
+            if job.status != last:
+                last = job.status
+                yield f"event: status\ndata: {json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+            if job.status in FINISHED:
+                yield f"event: result\ndata: {json.dumps(job.payload(), default=str)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            changed = job.changed
+            if job.status != last:
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), 15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str):
+    job = _get(job_id)
+    if job.status in FINISHED:
+        return job.payload()
+    job.task.cancel()
+    await asyncio.gather(job.task, return_exceptions=True)
+    return job.payload()
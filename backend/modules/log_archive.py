@@ -0,0 +1,292 @@
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy import delete, exists, func, text, update
+from sqlalchemy.orm import Session, undefer
+
+from database import SessionLocal, get_db
+import models
+import schemas
+import config
+
+router = APIRouter(prefix="/api/sat/log-archive", tags=["sat"])
+
+# Cold storage for incident logs. Once an incident has been resolved/closed for
+# SAT_LOG_ARCHIVE_AFTER_DAYS its logs move to a gzipped NDJSON file under
+# uploads/log_archive and leave incident_logs, so the monthly partitions only
+# hold recent activity. Archived logs are read back only when asked for
+# (all_logs); their text stays on the incident for full-text and similarity
+# search. The same job drops old partitions once archival has emptied them.
+# Upcoming partitions are created by a loop of their own, at startup and every
+# SAT_LOG_PARTITION_INTERVAL, so they exist even with archival turned off.
+
+ARCHIVE_DIR = os.path.join(config.UPLOADS_DIR, "log_archive")
+DONE = ("resolved", "closed")
+
+_task: Optional[asyncio.Task] = None
+_partition_task: Optional[asyncio.Task] = None
+_running = asyncio.Lock()
+_last_run: Optional[dict] = None
+
+
+def archive_path(incident_id: str) -> str:
+    shard = hashlib.sha1(incident_id.encode()).hexdigest()[:2]
+    return os.path.join(ARCHIVE_DIR, shard, f"{incident_id}.ndjson.gz")
+
+
+def read_archived(incident_id: str) -> List[schemas.IncidentLog]:
+    path = archive_path(incident_id)
+    if not os.path.exists(path):
+        return []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [schemas.IncidentLog.model_validate(json.loads(line)) for line in f if line.strip()]
+
+
+def _write_archive(incident_id: str, rows: List[dict]):
+    path = archive_path(incident_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def remove_archive(incident_id: str):
+    try:
+        os.remove(archive_path(incident_id))
+    except FileNotFoundError:
+        pass
+
+
+def all_logs(incident: models.Incident) -> list:
+    """Archived logs (read from disk) and the ones still in the table, by date.
+    Needs `incident.logs` loaded; only archived incidents touch the disk."""
+    logs = list(incident.logs)
+    if incident.logs_archived_at:
+        logs = read_archived(incident.id) + logs
+    return sorted(logs, key=lambda log: (log.date, log.id))
+
+
+async def all_logs_async(incident: models.Incident) -> list:
+    if not incident.logs_archived_at:
+        return list(incident.logs)
+    return await asyncio.to_thread(all_logs, incident)
+
+
+# --- JOB ---
+
+def _archive_batch(cutoff: datetime, limit: int) -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        still_has_logs = exists().where(models.IncidentLog.incident_id == models.Incident.id)
+        incidents = (
+            db.query(models.Incident)
+            .options(undefer(models.Incident.archived_log_text))
+            .filter(models.Incident.status.in_(DONE), models.Incident.closed_at < cutoff, still_has_logs)
+            .order_by(models.Incident.closed_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=models.Incident)
+            .all()
+        )
+        if not incidents:
+            return {"incidents": 0, "logs": 0}
+
+        ids = [incident.id for incident in incidents]
+        # No log is older than its incident's first_log_at, so older partitions are skipped
+        since = min(incident.first_log_at for incident in incidents)
+        by_incident = defaultdict(list)
+        for log in (
+            db.query(models.IncidentLog)
+            .filter(models.IncidentLog.incident_id.in_(ids), models.IncidentLog.date >= since)
+            .order_by(models.IncidentLog.incident_id, models.IncidentLog.date, models.IncidentLog.id)
+        ):
+            by_incident[log.incident_id].append(log)
+
+        now = datetime.now(timezone.utc)
+        moved = []
+        for incident in incidents:
+            logs = by_incident.get(incident.id)
+            if not logs:
+                continue
+            rows = {}
+            # Earlier archive first (incident reopened and closed again). Keyed by id, so
+            # rows left in the file by a run that failed to commit are not duplicated.
+            if incident.logs_archived_at:
+                rows.update((log.id, log.model_dump(mode="json")) for log in read_archived(incident.id))
+            rows.update((log.id, schemas.IncidentLog.model_validate(log).model_dump(mode="json")) for log in logs)
+            _write_archive(incident.id, list(rows.values()))
+
+            log_text = " ".join(log.text for log in logs)
+            incident.archived_log_text = f"{incident.archived_log_text} {log_text}" if incident.archived_log_text else log_text
+            incident.archived_log_count = len(rows)
+            incident.logs_archived_at = now
+            moved.extend(log.id for log in logs)
+
+        db.flush()
+        # The log trigger would rebuild an incident's search vector once per deleted log;
+        # it is switched off for this transaction and each vector is rebuilt once instead,
+        # from archived_log_text (flushed above) and the logs left in the table
+        db.execute(text("SELECT set_config('sat.skip_log_search_vector', 'on', true)"))
+        db.execute(
+            delete(models.IncidentLog)
+            .where(models.IncidentLog.incident_id.in_(ids), models.IncidentLog.date >= since, models.IncidentLog.id.in_(moved))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(text("SELECT set_config('sat.skip_log_search_vector', '', true)"))
+        db.execute(
+            update(models.Incident)
+            .where(models.Incident.id.in_(ids))
+            .values(search_vector=func.incident_search_vector(
+                models.Incident.title, models.Incident.description, func.incident_logs_text(models.Incident.id)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return {"incidents": len(incidents), "logs": len(moved)}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def ensure_partitions() -> int:
+    """Creates this month's partition and the next SAT_LOG_PARTITIONS_AHEAD ones.
+    Returns how many were missing."""
+    db = SessionLocal()
+    try:
+        today = datetime.now(timezone.utc).date()
+        created = db.execute(
+            text("SELECT incident_logs_ensure_partitions(:start, :end)"),
+            {"start": today, "end": today + timedelta(days=31 * config.SAT_LOG_PARTITIONS_AHEAD)}
+        ).scalar()
+        db.commit()
+        return created
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _drop_partitions(cutoff: datetime) -> Dict[str, list]:
+    """Drops the old partitions that archival emptied."""
+    db = SessionLocal()
+    try:
+        partitions = db.execute(text("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'incident_logs'::regclass AND c.relname ~ '^incident_logs_y[0-9]{4}m[0-9]{2}$'
+            ORDER BY c.relname
+        """)).scalars().all()
+        dropped = []
+        for name in partitions:
+            year, month = int(name[-7:-3]), int(name[-2:])
+            month_end = date(year + month // 12, month % 12 + 1, 1)
+            if month_end > cutoff.date():
+                break
+            # Logs of incidents still open (or closed recently) keep their partition alive
+            if db.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')).scalar():
+                continue
+            db.execute(text(f'ALTER TABLE incident_logs DETACH PARTITION "{name}"'))
+            db.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+        db.commit()
+        return {"partitions": len(partitions) - len(dropped), "dropped_partitions": dropped}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def run_once() -> dict:
+    started = datetime.now(timezone.utc)
+    cutoff = started - timedelta(days=config.SAT_LOG_ARCHIVE_AFTER_DAYS)
+    report = {"started_at": started, "cutoff": cutoff, "incidents": 0, "logs": 0}
+    while True:
+        batch = _archive_batch(cutoff, config.SAT_LOG_ARCHIVE_BATCH_SIZE)
+        if not batch["incidents"]:
+            break
+        report["incidents"] += batch["incidents"]
+        report["logs"] += batch["logs"]
+    report.update(_drop_partitions(cutoff))
+    report["finished_at"] = datetime.now(timezone.utc)
+    return report
+
+
+async def run() -> dict:
+    global _last_run
+    async with _running:
+        _last_run = await asyncio.to_thread(run_once)
+        print(f"DEBUG: Log archival: {_last_run['incidents']} incidents, {_last_run['logs']} logs archived")
+        return _last_run
+
+
+async def _loop():
+    while True:
+        try:
+            await run()
+        except Exception as e:
+            print(f"ERROR LOG ARCHIVAL: {str(e)}")
+        await asyncio.sleep(config.SAT_LOG_ARCHIVE_INTERVAL)
+
+
+async def _partition_loop():
+    while True:
+        try:
+            created = await asyncio.to_thread(ensure_partitions)
+            if created:
+                print(f"DEBUG: Log partitions: {created} created")
+        except Exception as e:
+            print(f"ERROR LOG PARTITIONS: {str(e)}")
+        if config.SAT_LOG_PARTITION_INTERVAL <= 0:
+            return
+        await asyncio.sleep(config.SAT_LOG_PARTITION_INTERVAL)
+
+
+def start():
+    global _task, _partition_task
+    _partition_task = asyncio.create_task(_partition_loop())
+    if config.SAT_LOG_ARCHIVE_INTERVAL > 0:
+        _task = asyncio.create_task(_loop())
+
+
+async def stop():
+    tasks = [task for task in (_task, _partition_task) if task]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# --- ENDPOINTS ---
+
+@router.get("")
+def get_log_archive_status(db: Session = Depends(get_db)):
+    archived = (
+        db.query(func.count(models.Incident.id), func.coalesce(func.sum(models.Incident.archived_log_count), 0))
+        .filter(models.Incident.logs_archived_at.isnot(None))
+        .one()
+    )
+    return {
+        "archived_incidents": archived[0],
+        "archived_logs": archived[1],
+        "after_days": config.SAT_LOG_ARCHIVE_AFTER_DAYS,
+        "interval_seconds": config.SAT_LOG_ARCHIVE_INTERVAL,
+        "partition_interval_seconds": config.SAT_LOG_PARTITION_INTERVAL,
+        "running": _running.locked(),
+        "last_run": _last_run,
+    }
+
+
+@router.post("/run")
+async def run_log_archival():
+    """Runs archival and partition maintenance now instead of waiting for the next interval."""
+    created = await asyncio.to_thread(ensure_partitions)
+    return {**await run(), "created_partitions": created}
@@ -6,9 +6,10 @@ from typing import Dict, Any, Optional
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
+from database import SessionLocal
 import models
 import uuid
+from modules import analytics, catalog, similarity
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -18,18 +19,23 @@ router = APIRouter(prefix="/api/mcp/sat", tags=["mcp"])
 
 # --- TOOLS IMPLEMENTATION ---
 
-def get_machine_types(db: Session = next(get_db())):
+def get_machine_types():
     """Returns a list of available machine types."""
-    results = db.query(models.Machine.type).distinct().all()
-    return [r[0] for r in results if r[0]]
+    return catalog.machine_types()
 
-def get_machine_models(machine_type: str, db: Session = next(get_db())):
+def get_machine_models(machine_type: str):
     """Returns available models for a specific machine type."""
-    results = db.query(models.Machine).filter(models.Machine.type == machine_type).all()
-    return [{"id": m.id, "model": m.model, "type": m.type} for m in results]
+    return catalog.machine_models(machine_type)
 
-def create_incident_tool(machine_id: str, title: Optional[str], description: str, reported_by: Optional[str] = None, db: Session = next(get_db())):
-    """Creates a new incident in the database."""
+def create_incident_tool(machine_id: str, title: Optional[str], description: str, reported_by: Optional[str] = None):
+    """Creates a new incident in the database. Blocking: the MCP handler runs it in a thread."""
+    db = SessionLocal()
+    try:
+        return _create_incident(db, machine_id, title, description, reported_by)
+    finally:
+        db.close()
+
+def _create_incident(db: Session, machine_id: str, title: Optional[str], description: str, reported_by: Optional[str]):
     # Verify machine exists
     machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
     if not machine:
@@ -56,9 +62,12 @@ def create_incident_tool(machine_id: str, title: Optional[str], description: str
             text="Incidencia creada automáticamente por agente IA."
         )
         db.add(log)
+        db.flush()
+        analytics.apply(db, analytics.Delta().incident(new_incident).logs(machine_id, [log.date]))
         
         db.commit()
         db.refresh(new_incident)
+        similarity.index_incident(new_incident)
         return {"success": True, "incident_id": incident_id, "status": "created"}
     except Exception as e:
         db.rollback()
@@ -238,20 +247,20 @@ async def handle_messages(request: Request, session_id: str = None):
         is_error = False
         
         try:
-            # We need a new DB session for this tool call
-            db = next(get_db())
-            
+            # Catalog tools are served from the catalog cache; its version check is a
+            # sync DB read, so they run in a thread as well
             if tool_name == "get_machine_types":
-                result = get_machine_types(db)
+                result = await asyncio.to_thread(get_machine_types)
             elif tool_name == "get_machine_models":
                 type_arg = tool_args.get("type")
-                result = get_machine_models(type_arg, db)
+                result = await asyncio.to_thread(get_machine_models, type_arg)
             elif tool_name == "create_incident":
                 m_id = tool_args.get("machine_id")
                 title = tool_args.get("title")
                 desc = tool_args.get("description")
                 reported_by = tool_args.get("reported_by")
-                result = create_incident_tool(m_id, title, desc, reported_by, db)
+                # Sync session, analytics and similarity updates: kept off the event loop
+                result = await asyncio.to_thread(create_incident_tool, m_id, title, desc, reported_by)
             else:
                 is_error = True
                 result = f"Unknown tool: {tool_name}"
@@ -0,0 +1,244 @@
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, AsyncSessionLocal
+import models
+import config
+
+router = APIRouter(prefix="/api/sat/outbox", tags=["sat"])
+
+INDEX_INCIDENT = "index_incident"
+
+_wake = asyncio.Event()
+_workers: List[asyncio.Task] = []
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+# --- PRODUCER ---
+
+def enqueue_incident_index(db: AsyncSession, incident_id: str, app_id: Optional[int], silo_id: Optional[str]):
+    """Adds an indexing job to the caller's session so it commits together with the status change."""
+    if not app_id or not silo_id:
+        print("DEBUG: Missing appId or siloId for Mattin indexing")
+        return None
+    job = models.OutboxJob(
+        kind=INDEX_INCIDENT,
+        incident_id=incident_id,
+        app_id=app_id,
+        silo_id=silo_id,
+        status="pending",
+        attempts=0
+    )
+    db.add(job)
+    return job
+
+
+def wake():
+    """Call after committing new jobs so an idle worker picks them up immediately.
+    Safe from sync routes too: asyncio.Event is not thread-safe, so calls from a
+    threadpool thread are handed to the workers' loop."""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if _loop is None or running is _loop:
+        _wake.set()
+    elif not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wake.set)
+
+
+# --- WORKER ---
+
+async def _claim_batch(limit: int) -> List[int]:
+    """Marks up to `limit` due jobs as processing. SKIP LOCKED lets several workers
+    (or app instances) drain the table without handing out the same job twice.
+    Jobs stuck in processing longer than the lease are assumed orphaned and retried."""
+    async with AsyncSessionLocal() as db:
+        now = datetime.now(timezone.utc)
+        lease_expired = now - timedelta(seconds=config.OUTBOX_LEASE_SECONDS)
+        jobs = (await db.scalars(
+            select(models.OutboxJob)
+            .where(or_(
+                (models.OutboxJob.status == "pending") & (models.OutboxJob.next_attempt_at <= now),
+                (models.OutboxJob.status == "processing") & (models.OutboxJob.updated_at < lease_expired),
+            ))
+            .order_by(models.OutboxJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).all()
+        for job in jobs:
+            job.status = "processing"
+            job.attempts += 1
+            job.updated_at = now
+        await db.commit()
+        return [job.id for job in jobs]
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(config.OUTBOX_BACKOFF_MAX, config.OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)))
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+async def _process(job_id: int):
+    # Imported here: modules.sat enqueues jobs, so a top-level import would be circular
+    from modules.sat import index_with_mattin, unindex_from_mattin
+
+    try:
+        # Short sessions on either side of the Mattin calls: no connection or
+        # transaction is held while waiting on the network
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.OutboxJob, job_id)
+            if not job:
+                return
+            incident = (await db.scalars(
+                select(models.Incident)
+                .options(selectinload(models.Incident.logs), joinedload(models.Incident.machine))
+                .where(models.Incident.id == job.incident_id)
+            )).first()
+            if not incident:
+                job.status = "done"
+                job.last_error = "Incident no longer exists"
+                await db.commit()
+                return
+
+        previous_id = incident.mattin_id
+        m_id = await index_with_mattin(job.app_id, job.silo_id, incident)
+        if m_id and previous_id and previous_id != m_id:
+            # Re-resolved incident: drop the stale document so searches do not return it twice
+            await unindex_from_mattin(job.app_id, job.silo_id, previous_id)
+
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.OutboxJob, job_id)
+            if not job:
+                return
+            if m_id:
+                await db.execute(
+                    update(models.Incident).where(models.Incident.id == job.incident_id).values(mattin_id=m_id)
+                )
+                job.status = "done"
+                job.last_error = None
+            elif job.attempts >= config.OUTBOX_MAX_ATTEMPTS:
+                job.status = "failed"
+                job.last_error = "Mattin did not return a document id"
+            else:
+                job.status = "pending"
+                job.last_error = "Mattin did not return a document id"
+                job.next_attempt_at = datetime.now(timezone.utc) + _backoff(job.attempts)
+            await db.commit()
+    except Exception as e:
+        print(f"ERROR OUTBOX JOB {job_id}: {str(e)}")
+
+
+async def _worker(n: int):
+    while True:
+        try:
+            job_ids = await _claim_batch(config.OUTBOX_BATCH_SIZE)
+        except Exception as e:
+            print(f"ERROR OUTBOX WORKER {n}: {str(e)}")
+            job_ids = []
+
+        if job_ids:
+            await asyncio.gather(*(_process(job_id) for job_id in job_ids))
+            continue
+
+        try:
+            await asyncio.wait_for(_wake.wait(), config.OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+def start():
+    global _loop
+    _loop = asyncio.get_running_loop()
+    for n in range(config.OUTBOX_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+
+
+async def stop():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+# --- STATUS ENDPOINTS ---
+
+@router.get("")
+def get_outbox_status(db: Session = Depends(get_db)):
+    counts = dict(
+        db.query(models.OutboxJob.status, func.count(models.OutboxJob.id))
+        .group_by(models.OutboxJob.status)
+        .all()
+    )
+    oldest_pending = (
+        db.query(func.min(models.OutboxJob.created_at))
+        .filter(models.OutboxJob.status.in_(["pending", "processing"]))
+        .scalar()
+    )
+    failed = (
+        db.query(models.OutboxJob)
+        .filter(models.OutboxJob.status == "failed")
+        .order_by(models.OutboxJob.updated_at.desc())
+        .limit(20)
+        .all()
+    )
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "failed": counts.get("failed", 0),
+        "done": counts.get("done", 0),
+        "oldest_pending_at": oldest_pending,
+        "recent_failures": [
+            {
+                "id": job.id,
+                "incident_id": job.incident_id,
+                "attempts": job.attempts,
+                "last_error": job.last_error,
+                "updated_at": job.updated_at
+            }
+            for job in failed
+        ]
+    }
+
+
+@router.get("/incidents/{incident_id}")
+def get_incident_jobs(incident_id: str, db: Session = Depends(get_db)):
+    jobs = (
+        db.query(models.OutboxJob)
+        .filter(models.OutboxJob.incident_id == incident_id)
+        .order_by(models.OutboxJob.id.desc())
+        .all()
+    )
+    return [
+        {
+            "id": job.id,
+            "status": job.status,
+            "attempts": job.attempts,
+            "last_error": job.last_error,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at
+        }
+        for job in jobs
+    ]
+
+
+@router.post("/{job_id}/retry")
+def retry_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.query(models.OutboxJob).filter(models.OutboxJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "failed":
+        raise HTTPException(status_code=400, detail=f"Job is {job.status}, only failed jobs can be retried")
+    job.status = "pending"
+    job.attempts = 0
+    job.next_attempt_at = func.now()
+    db.commit()
+    wake()
+    return {"status": "success", "message": f"Job {job_id} requeued"}
@@ -0,0 +1,270 @@
+import os
+import glob
+import time
+import asyncio
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, get_async_db, AsyncSessionLocal
+import models
+import config
+from modules.sat import DOCS_DIR, index_with_mattin, unindex_from_mattin, index_machine_doc_if_changed
+
+router = APIRouter(prefix="/api/sat/admin/reindex", tags=["sat"])
+
+# Live (in-process) progress per run; the durable counters live in reindex_runs
+_progress: Dict[int, dict] = {}
+_tasks: Dict[int, asyncio.Task] = {}
+
+
+# --- ITEMS ---
+
+async def _incident_keys(db: AsyncSession) -> List[str]:
+    ids = (await db.scalars(
+        select(models.Incident.id).where(models.Incident.status == "resolved").order_by(models.Incident.id)
+    )).all()
+    return [f"incident:{incident_id}" for incident_id in ids]
+
+
+def _doc_keys() -> List[str]:
+    keys = []
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "*", "*.pdf"))):
+        machine_id = os.path.basename(os.path.dirname(path))
+        keys.append(f"doc:{machine_id}/{os.path.basename(path)}")
+    return keys
+
+
+async def _index_item(run: models.ReindexRun, key: str) -> Optional[str]:
+    """Indexes one item. Returns the new Mattin id for incidents, which the
+    checkpoint stores; no session is held while Mattin is called."""
+    kind, _, ref = key.partition(":")
+    if kind == "incident":
+        async with AsyncSessionLocal() as db:
+            incident = (await db.scalars(
+                select(models.Incident)
+                .options(selectinload(models.Incident.logs), joinedload(models.Incident.machine))
+                .where(models.Incident.id == ref)
+            )).first()
+        if not incident:
+            raise LookupError("Incident no longer exists")
+        previous_id = incident.mattin_id
+        m_id = await index_with_mattin(run.app_id, run.incident_silo_id, incident)
+        if not m_id:
+            raise RuntimeError("Mattin did not return a document id")
+        if previous_id and previous_id != m_id:
+            await unindex_from_mattin(run.app_id, run.incident_silo_id, previous_id)
+        return m_id
+
+    machine_id, _, filename = ref.partition("/")
+    async with AsyncSessionLocal() as doc_db:
+        machine = await doc_db.get(models.Machine, machine_id)
+        if not machine:
+            raise LookupError(f"Machine {machine_id} not found")
+        # Forced upload, but the hash is recorded so later syncs can skip this document
+        await index_machine_doc_if_changed(doc_db, run.app_id, run.docs_silo_id, machine, filename, force=True)
+    return None
+
+
+async def _checkpoint(run_id: int, key: str, error: Optional[str], mattin_id: Optional[str] = None):
+    """Records the item outcome, in one transaction with the incident's new mattin_id."""
+    async with AsyncSessionLocal() as db:
+        if mattin_id:
+            incident_id = key.partition(":")[2]
+            await db.execute(update(models.Incident).where(models.Incident.id == incident_id).values(mattin_id=mattin_id))
+        await db.merge(models.ReindexItem(run_id=run_id, item_key=key, status="failed" if error else "done", error=error))
+        counter = models.ReindexRun.failed if error else models.ReindexRun.done
+        await db.execute(
+            update(models.ReindexRun).where(models.ReindexRun.id == run_id).values({counter: counter + 1})
+        )
+        await db.commit()
+
+
+# --- RUNS ---
+
+async def create_run(db: AsyncSession, app_id: int, incident_silo_id: Optional[str], docs_silo_id: Optional[str]) -> models.ReindexRun:
+    if not incident_silo_id and not docs_silo_id:
+        raise ValueError("At least one of incident_silo_id or docs_silo_id is required")
+    run = models.ReindexRun(
+        app_id=app_id,
+        incident_silo_id=incident_silo_id,
+        docs_silo_id=docs_silo_id,
+        status="running",
+        total=0,
+        done=0,
+        failed=0
+    )
+    db.add(run)
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+async def find_resumable(db: AsyncSession, app_id: int, incident_silo_id: Optional[str], docs_silo_id: Optional[str]) -> Optional[models.ReindexRun]:
+    """Latest unfinished run for the same target, e.g. after a crash."""
+    return (await db.scalars(
+        select(models.ReindexRun)
+        .where(
+            models.ReindexRun.app_id == app_id,
+            models.ReindexRun.incident_silo_id == incident_silo_id if incident_silo_id else models.ReindexRun.incident_silo_id.is_(None),
+            models.ReindexRun.docs_silo_id == docs_silo_id if docs_silo_id else models.ReindexRun.docs_silo_id.is_(None),
+            models.ReindexRun.status != "completed"
+        )
+        .order_by(models.ReindexRun.id.desc())
+    )).first()
+
+
+def _report(run_id: int, total: int, done: int, failed: int, processed: int, started: float) -> dict:
+    elapsed = max(time.monotonic() - started, 1e-6)
+    rate = processed / elapsed
+    remaining = total - done - failed
+    progress = {
+        "processed_this_session": processed,
+        "items_per_second": round(rate, 2),
+        "eta_seconds": round(remaining / rate) if rate > 0 else None,
+    }
+    _progress[run_id] = progress
+    print(f"REINDEX run {run_id}: {done}/{total} done, {failed} failed, "
+          f"{progress['items_per_second']} items/s, ETA {progress['eta_seconds']}s")
+    return progress
+
+
+async def run_reindex(run_id: int, concurrency: Optional[int] = None):
+    """Indexes every pending item of the run. Items already checkpointed as done are
+    skipped, so calling this again after a crash resumes where it stopped."""
+    concurrency = concurrency or config.REINDEX_CONCURRENCY
+
+    async with AsyncSessionLocal() as db:
+        run = await db.get(models.ReindexRun, run_id)
+        if not run:
+            raise LookupError(f"Reindex run {run_id} not found")
+        keys = []
+        if run.incident_silo_id:
+            keys += await _incident_keys(db)
+        if run.docs_silo_id:
+            keys += await asyncio.to_thread(_doc_keys)
+        done_keys = set((await db.scalars(
+            select(models.ReindexItem.item_key)
+            .where(models.ReindexItem.run_id == run_id, models.ReindexItem.status == "done")
+        )).all())
+        pending = [k for k in keys if k not in done_keys]
+
+        # Previously failed items are retried, so only successes carry over
+        run.total = len(keys)
+        run.done = len(keys) - len(pending)
+        run.failed = 0
+        run.status = "running"
+        run.finished_at = None
+        await db.commit()
+        await db.refresh(run)
+
+    print(f"REINDEX run {run_id}: {len(pending)} of {run.total} items pending, concurrency {concurrency}")
+    started = time.monotonic()
+    counts = {"done": run.done, "failed": 0, "processed": 0}
+    last_report = started
+    items = iter(pending)
+
+    async def worker():
+        nonlocal last_report
+        for key in items:
+            m_id = None
+            try:
+                m_id = await _index_item(run, key)
+                error = None
+            except Exception as e:
+                error = str(getattr(e, "detail", None) or e) or repr(e)
+                print(f"ERROR REINDEX {key}: {error}")
+            await _checkpoint(run_id, key, error, m_id)
+
+            counts["failed" if error else "done"] += 1
+            counts["processed"] += 1
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                _report(run_id, run.total, counts["done"], counts["failed"], counts["processed"], started)
+
+    final_status = "interrupted"
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        final_status = "completed"
+    finally:
+        _report(run_id, run.total, counts["done"], counts["failed"], counts["processed"], started)
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.ReindexRun).where(models.ReindexRun.id == run_id)
+                .values(status=final_status, finished_at=func.now())
+            )
+            await db.commit()
+
+
+async def stop():
+    for task in _tasks.values():
+        task.cancel()
+    await asyncio.gather(*_tasks.values(), return_exceptions=True)
+    _tasks.clear()
+
+
+# --- ADMIN ENDPOINTS ---
+
+def _run_payload(run: models.ReindexRun) -> dict:
+    return {
+        "id": run.id,
+        "app_id": run.app_id,
+        "incident_silo_id": run.incident_silo_id,
+        "docs_silo_id": run.docs_silo_id,
+        "status": run.status,
+        "total": run.total,
+        "done": run.done,
+        "failed": run.failed,
+        "started_at": run.started_at,
+        "updated_at": run.updated_at,
+        "finished_at": run.finished_at,
+        "active": run.id in _tasks,
+        "progress": _progress.get(run.id),
+    }
+
+
+@router.post("")
+async def start_reindex(
+    app_id: int = Query(...),
+    incident_silo_id: Optional[str] = Query(None),
+    docs_silo_id: Optional[str] = Query(None),
+    resume: bool = Query(True, description="Resume the latest unfinished run for the same target"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    run = await find_resumable(db, app_id, incident_silo_id, docs_silo_id) if resume else None
+    if run and run.id in _tasks:
+        raise HTTPException(status_code=409, detail=f"Reindex run {run.id} is already running")
+    if not run:
+        try:
+            run = await create_run(db, app_id, incident_silo_id, docs_silo_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    task = asyncio.create_task(run_reindex(run.id))
+    _tasks[run.id] = task
+    task.add_done_callback(lambda t, run_id=run.id: _tasks.pop(run_id, None))
+    return _run_payload(run)
+
+
+@router.get("")
+def list_reindex_runs(db: Session = Depends(get_db)):
+    runs = db.query(models.ReindexRun).order_by(models.ReindexRun.id.desc()).limit(20).all()
+    return [_run_payload(run) for run in runs]
+
+
+@router.get("/{run_id}")
+def get_reindex_run(run_id: int, db: Session = Depends(get_db)):
+    run = db.query(models.ReindexRun).filter(models.ReindexRun.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Reindex run not found")
+    payload = _run_payload(run)
+    payload["recent_failures"] = [
+        {"item": item.item_key, "error": item.error}
+        for item in db.query(models.ReindexItem)
+        .filter(models.ReindexItem.run_id == run_id, models.ReindexItem.status == "failed")
+        .limit(50)
+        .all()
+    ]
+    return payload
@@ -1,23 +1,34 @@
+import io
 import os
-import httpx
-import shutil
+import csv
+import asyncio
 import glob
 import json
 import uuid
-from typing import List, Optional
-from fastapi import APIRouter, Request, HTTPException, Depends, UploadFile, File, Query, Form
-from sqlalchemy.orm import Session
+import base64
+import hashlib
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Iterable, Iterator, List, Literal, Optional, Union
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, UploadFile, File, Query, Form
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, aliased, joinedload, selectinload, undefer
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_db, get_async_db, SessionLocal, AsyncSessionLocal
 import models
 import schemas
 import config
+from modules import analytics, catalog, log_archive, outbox, similarity
+from mattin import client as mattin_client, cache
+from mattin.governor import BACKGROUND
+from mattin.singleflight import SingleFlight
 
 router = APIRouter(prefix="/api/sat", tags=["sat"])
 
-MATTIN_URL = config.MATTIN_URL
-API_KEY = config.API_KEY
-
 # --- MATTIN AI HELPERS ---
 
 async def index_with_mattin(app_id: int, silo_id: str, incident: models.Incident):
@@ -25,11 +36,10 @@ async def index_with_mattin(app_id: int, silo_id: str, incident: models.Incident
         print("DEBUG: Missing appId or siloId for Mattin indexing")
         return None
         
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/index"
-    headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
+    url = f"/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/index"
     
-    # Combine content: description + all logs
-    logs_content = "\n".join([f"[{log.date}] {log.author}: {log.text}" for log in incident.logs])
+    # Combine content: description + all logs, archived ones included
+    logs_content = "\n".join([f"[{log.date}] {log.author}: {log.text}" for log in await log_archive.all_logs_async(incident)])
     content = f"INCIDENCIA: {incident.title}\nDESCRIPCIÓN: {incident.description}\n\nACTIVIDAD:\n{logs_content}"
     
     payload = {
@@ -42,113 +52,122 @@ async def index_with_mattin(app_id: int, silo_id: str, incident: models.Incident
         }
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Indexing incident {incident.id} to Mattin...")
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            res_data = response.json()
-            return res_data.get("id")
-        except Exception as e:
-            print(f"ERROR INDEXING TO MATTIN: {str(e)}")
-            return None
+    try:
+        print(f"DEBUG: Indexing incident {incident.id} to Mattin...")
+        response = await mattin_client.request("POST", url, profile="index", json=payload, priority=BACKGROUND)
+        response.raise_for_status()
+        res_data = response.json()
+        return res_data.get("id")
+    except Exception as e:
+        print(f"ERROR INDEXING TO MATTIN: {str(e)}")
+        return None
+    finally:
+        cache.search_cache.invalidate_silo(app_id, silo_id)
 
 async def unindex_from_mattin(app_id: int, silo_id: str, mattin_id: str):
     if not app_id or not silo_id or not mattin_id:
         return
         
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/delete"
-    headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
+    url = f"/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/delete"
     payload = {"ids": [mattin_id]}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Unindexing doc {mattin_id} from Mattin...")
-            response = await client.request("DELETE", url, headers=headers, json=payload)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"ERROR UNINDEXING FROM MATTIN: {str(e)}")
+    try:
+        print(f"DEBUG: Unindexing doc {mattin_id} from Mattin...")
+        response = await mattin_client.request("DELETE", url, profile="index", json=payload, priority=BACKGROUND)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"ERROR UNINDEXING FROM MATTIN: {str(e)}")
+    finally:
+        cache.search_cache.invalidate_silo(app_id, silo_id)
+
+search_flights = SingleFlight()
+
+async def _find_docs(app_id: int, silo_id: str, query: str, filters: dict, k: int):
+    """docs/find through the search cache. Concurrent identical misses share one
+    upstream call. Errors propagate and are never cached."""
+    key = cache.search_key(app_id, silo_id, query, filters, k)
+    cached = cache.search_cache.get(key)
+    if cached is not cache.MISSING:
+        return cached
+
+    async def fetch():
+        generation = cache.search_cache.generation(app_id, silo_id)
+        url = f"/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/find"
+        payload = {
+            "query": query,
+            "k": k
+        }
+        if filters:
+            payload["filter_metadata"] = filters
+
+        response = await mattin_client.request("POST", url, profile="find", json=payload)
+        response.raise_for_status()
+        docs = response.json().get("docs", [])
+        cache.search_cache.put(key, docs, generation)
+        return docs
+
+    return await search_flights.do(key, fetch)
 
 async def search_mattin_incidents(app_id: int, silo_id: str, query: str, machine_type: str = None, k: int = 4):
     if not app_id or not silo_id:
         return []
         
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/find"
-    headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
-    
-    payload = {
-        "query": query,
-        "k": k
-    }
-    
+    filters = {}
     if machine_type:
-        payload["filter_metadata"] = {
-             "tipo": machine_type
-        }
+        filters["tipo"] = machine_type
         
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Searching Mattin with query: {query[:50]}...")
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("docs", [])
-        except Exception as e:
-            print(f"ERROR SEARCHING MATTIN INCIDENTS: {str(e)}")
-            return []
+    try:
+        print(f"DEBUG: Searching Mattin with query: {query[:50]}...")
+        return await _find_docs(app_id, silo_id, query, filters, k)
+    except HTTPException as e:
+        # Breaker open or governor saturated: degrade to no results without waiting
+        print(f"ERROR SEARCHING MATTIN INCIDENTS: skipped ({e.detail})")
+        return []
+    except Exception as e:
+        print(f"ERROR SEARCHING MATTIN INCIDENTS: {str(e)}")
+        return []
 
 async def search_mattin_docs(app_id: int, silo_id: str, query: str, machine_type: str = None, machine_model: str = None, k: int = 5):
     if not app_id or not silo_id:
         print("DEBUG: Missing app_id or silo_id for doc search")
         return []
         
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/find"
-    headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
-    
-    payload = {
-        "query": query,
-        "k": k
-    }
-    
     filters = {}
     if machine_type:
         filters["tipo"] = machine_type
     if machine_model:
         filters["modelo"] = machine_model
         
-    if filters:
-        payload["filter_metadata"] = filters
-        
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Searching Mattin Docs with query: {query[:50]}... Filters: {filters}")
-            response = await client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("docs", [])
-        except Exception as e:
-            print(f"ERROR SEARCHING MATTIN DOCS: {str(e)}")
-            return []
+    try:
+        print(f"DEBUG: Searching Mattin Docs with query: {query[:50]}... Filters: {filters}")
+        return await _find_docs(app_id, silo_id, query, filters, k)
+    except HTTPException as e:
+        # Breaker open or governor saturated: degrade to no results without waiting
+        print(f"ERROR SEARCHING MATTIN DOCS: skipped ({e.detail})")
+        return []
+    except Exception as e:
+        print(f"ERROR SEARCHING MATTIN DOCS: {str(e)}")
+        return []
 
 async def unindex_mattin_doc(app_id: int, silo_id: str, metadata: dict):
     if not app_id or not silo_id or not metadata:
         return
         
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/delete-by-metadata"
-    headers = {"X-API-KEY": API_KEY, "Content-Type": "application/json"}
+    url = f"/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/delete-by-metadata"
     
     payload = {
         "filter_metadata": metadata
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Unindexing from Mattin: {metadata}")
-            response = await client.request("DELETE", url, headers=headers, json=payload)
-            response.raise_for_status()
-            print("DEBUG: Unindexing success")
-        except Exception as e:
-            print(f"ERROR UNINDEXING DOC: {str(e)}")
+    try:
+        print(f"DEBUG: Unindexing from Mattin: {metadata}")
+        response = await mattin_client.request("DELETE", url, profile="index", json=payload, priority=BACKGROUND)
+        response.raise_for_status()
+        print("DEBUG: Unindexing success")
+    except Exception as e:
+        print(f"ERROR UNINDEXING DOC: {str(e)}")
+    finally:
+        cache.search_cache.invalidate_silo(app_id, silo_id)
 
 async def index_mattin_doc(app_id: int, silo_id: str, file_path: str, metadata: dict):
     if not app_id or not silo_id or not os.path.exists(file_path):
@@ -156,36 +175,143 @@ async def index_mattin_doc(app_id: int, silo_id: str, file_path: str, metadata:
         
     await unindex_mattin_doc(app_id, silo_id, metadata)
     
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/index-file"
-    headers = {"X-API-KEY": API_KEY}
+    url = f"/public/v1/app/{app_id}/silos/silos/{silo_id}/docs/index-file"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"DEBUG: Indexing to Mattin: {file_path} with meta {metadata}")
+    try:
+        print(f"DEBUG: Indexing to Mattin: {file_path} with meta {metadata}")
+        
+        with open(file_path, "rb") as f:
+            files = {
+                "file": (os.path.basename(file_path), f, "application/pdf")
+            }
+            data = {
+                "metadata": json.dumps(metadata)
+            }
             
-            with open(file_path, "rb") as f:
-                files = {
-                    "file": (os.path.basename(file_path), f, "application/pdf")
-                }
-                data = {
-                    "metadata": json.dumps(metadata)
-                }
-                
-                response = await client.post(url, headers=headers, files=files, data=data)
-                response.raise_for_status()
-                print("DEBUG: Indexing success")
-                
-        except Exception as e:
-            print(f"ERROR INDEXING DOC: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error indexing document: {str(e)}")
+            response = await mattin_client.request("POST", url, profile="upload", files=files, data=data, priority=BACKGROUND)
+            response.raise_for_status()
+            print("DEBUG: Indexing success")
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"ERROR INDEXING DOC: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error indexing document: {str(e)}")
+    finally:
+        cache.search_cache.invalidate_silo(app_id, silo_id)
 
-# --- SAT MODULE ENDPOINTS ---
+# --- DOCUMENT CHANGE DETECTION ---
+
+# Absolute, so manuals are found whatever the working directory (reindex uses it too)
+DOCS_DIR = os.path.join(config.UPLOADS_DIR, "electrodomesticos")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def machine_doc_dir(machine_id: str) -> str:
+    return os.path.join(DOCS_DIR, machine_id)
 
-UPLOADS_DIR = "uploads"
+def _doc_path(machine_id: str, filename: str) -> str:
+    return os.path.join(machine_doc_dir(machine_id), filename)
+
+def doc_metadata(machine: models.Machine, filename: str) -> dict:
+    return {
+        "tipo": machine.type,
+        "modelo": machine.model,
+        "nombre": filename
+    }
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def document_hash(db: AsyncSession, machine_id: str, filename: str) -> str:
+    """SHA-256 of a manual. The stored hash is reused while size and mtime match,
+    so unchanged files in a large library are not re-read on every sync."""
+    file_path = _doc_path(machine_id, filename)
+    st = os.stat(file_path)
+    row = await db.get(models.MachineDocument, (machine_id, filename))
+    if row and row.size == st.st_size and row.mtime_ns == st.st_mtime_ns:
+        return row.sha256
+    digest = await asyncio.to_thread(_file_sha256, file_path)
+    await db.merge(models.MachineDocument(
+        machine_id=machine_id, filename=filename, sha256=digest, size=st.st_size, mtime_ns=st.st_mtime_ns
+    ))
+    return digest
+
+async def index_machine_doc_if_changed(db: AsyncSession, app_id: int, silo_id: str, machine: models.Machine, filename: str, force: bool = False) -> bool:
+    """Uploads the manual unless this silo already holds the same content with the same
+    metadata. Returns whether an upload happened."""
+    metadata = doc_metadata(machine, filename)
+    metadata_json = json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    digest = await document_hash(db, machine.id, filename)
+    indexed = await db.get(models.IndexedDocument, (app_id, silo_id, machine.id, filename))
+
+    if not force and indexed and indexed.sha256 == digest and indexed.metadata_json == metadata_json:
+        await db.commit()
+        print(f"DEBUG: {machine.id}/{filename} unchanged in silo {silo_id}, skipping upload")
+        return False
+
+    # Ends the read transaction so no connection is held during the uploads
+    await db.commit()
+    if indexed and indexed.metadata_json != metadata_json:
+        # Machine type/model changed since the last upload: the old chunks carry the old metadata
+        await unindex_mattin_doc(app_id, silo_id, json.loads(indexed.metadata_json))
+    await index_mattin_doc(app_id, silo_id, _doc_path(machine.id, filename), metadata)
+    await db.merge(models.IndexedDocument(
+        app_id=app_id, silo_id=silo_id, machine_id=machine.id, filename=filename,
+        sha256=digest, metadata_json=metadata_json
+    ))
+    await db.commit()
+    return True
+
+async def _forget_indexed_doc(db: AsyncSession, machine_id: str, filename: str, app_id: Optional[int] = None, silo_id: Optional[str] = None):
+    stmt = delete(models.IndexedDocument).where(
+        models.IndexedDocument.machine_id == machine_id,
+        models.IndexedDocument.filename == filename
+    )
+    if app_id is not None:
+        stmt = stmt.where(models.IndexedDocument.app_id == app_id, models.IndexedDocument.silo_id == silo_id)
+    await db.execute(stmt)
+
+# --- CONDITIONAL GET ---
+# ETags come from version counters and directory stats, never from hashing the
+# body, so a matching If-None-Match is answered without running the list query.
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:32] + '"'
+
+def _not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """The 304 to return if the client already holds `etag`; otherwise tags `response`."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    presented = request.headers.get("if-none-match")
+    if presented and (presented.strip() == "*" or etag in {t.strip().removeprefix("W/") for t in presented.split(",")}):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def _table_versions(db: Session, *tables: str) -> Optional[list]:
+    rows = dict(
+        db.query(models.TableVersion.table_name, func.sum(models.TableVersion.version))
+        .filter(models.TableVersion.table_name.in_(tables))
+        .group_by(models.TableVersion.table_name)
+        .all()
+    )
+    versions = [rows.get(table) for table in tables]
+    # Without a counter there is nothing that would change the tag on writes
+    return None if None in versions else versions
+
+# --- SAT MODULE ENDPOINTS ---
 
 @router.get("/machines", response_model=List[schemas.Machine])
-def get_machines(db: Session = Depends(get_db)):
-    return db.query(models.Machine).filter(models.Machine.available == True).all()
+def get_machines(request: Request, response: Response):
+    # Served from the catalog cache; machine writes, here or in other processes, invalidate it
+    snapshot = catalog.snapshot()
+    not_modified = _not_modified(request, response, _etag("machines", *snapshot.tag))
+    if not_modified:
+        return not_modified
+    return snapshot.available
 
 @router.post("/machines", response_model=schemas.Machine)
 def create_machine(machine: schemas.MachineCreate, db: Session = Depends(get_db)):
@@ -196,6 +322,7 @@ def create_machine(machine: schemas.MachineCreate, db: Session = Depends(get_db)
     try:
         db.add(db_machine)
         db.commit()
+        catalog.bump()
         db.refresh(db_machine)
         return db_machine
     except Exception as e:
@@ -213,6 +340,7 @@ def update_machine(machine_id: str, machine: schemas.MachineUpdate, db: Session
         setattr(db_machine, key, value)
         
     db.commit()
+    catalog.bump()
     db.refresh(db_machine)
     return db_machine
 
@@ -224,28 +352,174 @@ def delete_machine(machine_id: str, db: Session = Depends(get_db)):
         
     db_machine.available = False
     db.commit()
+    catalog.bump()
     return {"status": "success", "message": "Machine marked as unavailable (deleted)"}
 
+# --- BULK MACHINE IMPORT ---
+
+MACHINE_FIELDS = ["id", "type", "brand", "model", "serial", "location", "available"]
+
+def _machine_records(stream, fmt: str) -> Iterator[Union[dict, Exception]]:
+    """One dict per record read from the upload spool, or the parse error for that record."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            # Empty cells fall back to the schema defaults; unknown columns are ignored
+            for record in csv.DictReader(text):
+                yield {k: v for k, v in record.items() if k and v not in ("", None)}
+            return
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+    finally:
+        text.detach()
+
+def _error_text(e: Exception) -> str:
+    if hasattr(e, "errors"):
+        return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    if isinstance(e, DBAPIError):
+        return str(e.orig).strip().splitlines()[0]
+    return str(e)
+
+def _import_error(report: schemas.MachineImportReport, row: int, machine_id: Optional[str], error: str):
+    report.failed += 1
+    if len(report.errors) < config.SAT_IMPORT_MAX_ERRORS:
+        report.errors.append(schemas.MachineImportError(row=row, id=machine_id, error=error))
+    else:
+        report.errors_truncated = True
+
+def _write_machines(db: Session, rows: List[dict], mode: str):
+    stmt = pg_insert(models.Machine)
+    if mode == "upsert":
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[models.Machine.id],
+            set_={field: stmt.excluded[field] for field in MACHINE_FIELDS if field != "id"}
+        )
+    db.execute(stmt, rows)
+
+def _flush_machines(db: Session, batch: List[tuple], mode: str, report: schemas.MachineImportReport):
+    """Writes (row, values) pairs with one executemany and commits. If the batch is
+    rejected it is replayed row by row under savepoints to find the offending rows."""
+    if not batch:
+        return
+    try:
+        _write_machines(db, [values for _, values in batch], mode)
+        db.commit()
+        report.imported += len(batch)
+        return
+    except DBAPIError:
+        db.rollback()
+    for row, values in batch:
+        try:
+            with db.begin_nested():
+                _write_machines(db, [values], mode)
+            report.imported += 1
+        except DBAPIError as e:
+            _import_error(report, row, values["id"], _error_text(e))
+    db.commit()
+
+@router.post("/machines/import", response_model=schemas.MachineImportReport)
+def import_machines(
+    file: UploadFile = File(...),
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="Defaults to the file extension"),
+    mode: Literal["insert", "upsert"] = Query("insert", description="upsert overwrites machines whose id already exists"),
+    batch_size: int = Query(config.SAT_IMPORT_BATCH_SIZE, ge=1, le=10000),
+    db: Session = Depends(get_db)
+):
+    """Bulk load of machines from NDJSON (one object per line) or CSV (header row
+    with the machine fields). The file is read as a stream and written in batches,
+    one transaction each: a bad row is reported and skipped, and batches already
+    written stay committed if a later one fails."""
+    fmt = format or {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(
+        os.path.splitext(file.filename or "")[1].lower()
+    )
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Pass format=ndjson or format=csv, or upload a .ndjson/.jsonl/.csv file")
+
+    report = schemas.MachineImportReport(format=fmt, mode=mode, received=0, imported=0, failed=0)
+    seen = set()
+    batch = []
+    records = _machine_records(file.file, fmt)
+    while True:
+        try:
+            record = next(records)
+        except StopIteration:
+            break
+        except (csv.Error, UnicodeDecodeError) as e:
+            # The rest of the file cannot be read reliably
+            _import_error(report, report.received + 1, None, f"Unreadable file from here on: {e}")
+            break
+        report.received += 1
+        row = report.received
+        machine_id = record.get("id") if isinstance(record, dict) else None
+        try:
+            if isinstance(record, Exception):
+                raise record
+            values = schemas.MachineCreate.model_validate(record).model_dump()
+            if not values["id"].strip():
+                raise ValueError("El ID del modelo no puede estar vacío.")
+        except Exception as e:
+            _import_error(report, row, machine_id, _error_text(e))
+            continue
+        if values["id"] in seen:
+            _import_error(report, row, values["id"], "Duplicate id, already present earlier in this file")
+            continue
+        seen.add(values["id"])
+        batch.append((row, values))
+        if len(batch) >= batch_size:
+            _flush_machines(db, batch, mode, report)
+            batch = []
+    _flush_machines(db, batch, mode, report)
+    # Database rejections are only known when their batch is flushed
+    report.errors.sort(key=lambda e: e.row)
+
+    if report.imported:
+        catalog.bump()
+    return report
+
 @router.post("/machines/{machine_id}/documents")
-async def upload_machine_document(machine_id: str, file: UploadFile = File(...)):
+async def upload_machine_document(machine_id: str, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
-    machine_dir = os.path.join(UPLOADS_DIR, "electrodomesticos", machine_id)
+    machine_dir = machine_doc_dir(machine_id)
     if not os.path.exists(machine_dir):
         os.makedirs(machine_dir)
 
     filename = os.path.basename(file.filename)
     file_path = os.path.join(machine_dir, filename)
 
+    # Hash while copying so the first index request does not have to re-read the file
+    digest = hashlib.sha256()
     with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        for chunk in iter(lambda: file.file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            buffer.write(chunk)
+
+    st = os.stat(file_path)
+    await db.merge(models.MachineDocument(
+        machine_id=machine_id, filename=filename, sha256=digest.hexdigest(), size=st.st_size, mtime_ns=st.st_mtime_ns
+    ))
+    await db.commit()
 
-    return {"filename": filename, "url": f"/uploads/electrodomesticos/{machine_id}/{filename}"}
+    return {"filename": filename, "url": f"/uploads/electrodomesticos/{machine_id}/{filename}", "sha256": digest.hexdigest()}
 
 @router.get("/machines/{machine_id}/documents")
-def get_machine_documents(machine_id: str):
-    machine_dir = os.path.join(UPLOADS_DIR, "electrodomesticos", machine_id)
+def get_machine_documents(machine_id: str, request: Request, response: Response):
+    machine_dir = machine_doc_dir(machine_id)
+    # The listing is just the file names: adding, removing or renaming a file changes the directory mtime
+    try:
+        st = os.stat(machine_dir)
+        etag = _etag("documents", machine_id, st.st_ino, st.st_mtime_ns)
+    except FileNotFoundError:
+        etag = _etag("documents", machine_id, None)
+    not_modified = _not_modified(request, response, etag)
+    if not_modified:
+        return not_modified
     if not os.path.exists(machine_dir):
         return []
 
@@ -265,62 +539,401 @@ async def index_machine_document(
     filename: str, 
     app_id: int = Query(...), 
     silo_id: str = Query(...),
-    db: Session = Depends(get_db)
+    force: bool = Query(False, description="Upload even if the content was already indexed"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+    machine = await db.get(models.Machine, machine_id)
     if not machine:
         raise HTTPException(status_code=404, detail="Machine not found")
         
-    machine_dir = os.path.join(UPLOADS_DIR, "electrodomesticos", machine_id)
-    file_path = os.path.join(machine_dir, filename)
+    file_path = _doc_path(machine_id, filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Document not found")
-        
-    metadata = {
-        "tipo": machine.type,
-        "modelo": machine.model,
-        "nombre": filename
-    }
     
-    await index_mattin_doc(app_id, silo_id, file_path, metadata)
+    if not await index_machine_doc_if_changed(db, app_id, silo_id, machine, filename, force):
+        return {"status": "success", "message": "Document unchanged, already indexed", "uploaded": False}
     
-    return {"status": "success", "message": "Document indexed"}
+    return {"status": "success", "message": "Document indexed", "uploaded": True}
 
 @router.delete("/machines/{machine_id}/documents/{filename}")
 async def delete_machine_document(
     machine_id: str, 
     filename: str,
     app_id: int = Query(None), 
-    silo_id: str = Query(None),
-    db: Session = Depends(get_db)
+    silo_id: str = Query(None)
 ):
-    machine_dir = os.path.join(UPLOADS_DIR, "electrodomesticos", machine_id)
+    machine_dir = machine_doc_dir(machine_id)
     file_path = os.path.join(machine_dir, filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Document not found")
         
+    # Short sessions on either side of the Mattin call, as in the outbox worker
+    unindexed = False
     if app_id and silo_id:
-        machine = db.query(models.Machine).filter(models.Machine.id == machine_id).first()
+        async with AsyncSessionLocal() as db:
+            machine = await db.get(models.Machine, machine_id)
         if machine:
-            metadata = {
-                "tipo": machine.type,
-                "modelo": machine.model,
-                "nombre": filename
-            }
-            await unindex_mattin_doc(app_id, silo_id, metadata)
+            await unindex_mattin_doc(app_id, silo_id, doc_metadata(machine, filename))
+            unindexed = True
     
     try:
         os.remove(file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
+    
+    async with AsyncSessionLocal() as db:
+        if unindexed:
+            await _forget_indexed_doc(db, machine_id, filename, app_id, silo_id)
+        # Entries for other silos stay until a sync notices the file is gone and unindexes it there
+        await db.execute(delete(models.MachineDocument).where(
+            models.MachineDocument.machine_id == machine_id,
+            models.MachineDocument.filename == filename
+        ))
+        await db.commit()
         
     return {"status": "success", "message": "Document deleted"}
 
-@router.get("/incidents", response_model=List[schemas.Incident])
-def get_incidents(db: Session = Depends(get_db)):
-    return db.query(models.Incident).order_by(models.Incident.created_at.desc()).all()
+@router.post("/documents/sync")
+async def sync_machine_documents(
+    app_id: int = Query(...),
+    silo_id: str = Query(...),
+    dry_run: bool = Query(False, description="Only report what would be uploaded or removed"),
+):
+    """Brings a docs silo in line with the manuals on disk: uploads new or changed
+    files (by SHA-256) and removes documents whose file was deleted."""
+    on_disk = {}
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "*", "*.pdf"))):
+        on_disk[(os.path.basename(os.path.dirname(path)), os.path.basename(path))] = path
+
+    async with AsyncSessionLocal() as db:
+        machines = {
+            m.id: m for m in (await db.scalars(
+                select(models.Machine).where(models.Machine.id.in_({machine_id for machine_id, _ in on_disk}))
+            )).all()
+        }
+        indexed = {
+            (row.machine_id, row.filename): json.loads(row.metadata_json)
+            for row in (await db.scalars(
+                select(models.IndexedDocument)
+                .where(models.IndexedDocument.app_id == app_id, models.IndexedDocument.silo_id == silo_id)
+            )).all()
+        }
+
+    report = {"dry_run": dry_run, "uploaded": [], "unchanged": 0, "removed": [], "failed": []}
+    semaphore = asyncio.Semaphore(config.REINDEX_CONCURRENCY)
+
+    async def sync_one(machine_id: str, filename: str):
+        name = f"{machine_id}/{filename}"
+        machine = machines.get(machine_id)
+        if not machine:
+            report["failed"].append({"document": name, "error": "Machine not found"})
+            return
+        async with semaphore, AsyncSessionLocal() as item_db:
+            try:
+                if dry_run:
+                    digest = await document_hash(item_db, machine_id, filename)
+                    await item_db.commit()
+                    row = await item_db.get(models.IndexedDocument, (app_id, silo_id, machine_id, filename))
+                    changed = not row or row.sha256 != digest or json.loads(row.metadata_json) != doc_metadata(machine, filename)
+                else:
+                    changed = await index_machine_doc_if_changed(item_db, app_id, silo_id, machine, filename)
+            except Exception as e:
+                await item_db.rollback()
+                report["failed"].append({"document": name, "error": str(getattr(e, "detail", None) or e)})
+                return
+        if changed:
+            report["uploaded"].append(name)
+        else:
+            report["unchanged"] += 1
+
+    async def remove_one(machine_id: str, filename: str, metadata: dict):
+        report["removed"].append(f"{machine_id}/{filename}")
+        if dry_run:
+            return
+        async with semaphore:
+            await unindex_mattin_doc(app_id, silo_id, metadata)
+        async with AsyncSessionLocal() as item_db:
+            await _forget_indexed_doc(item_db, machine_id, filename, app_id, silo_id)
+            await item_db.commit()
+
+    await asyncio.gather(
+        *(sync_one(machine_id, filename) for machine_id, filename in on_disk),
+        *(remove_one(machine_id, filename, metadata) for (machine_id, filename), metadata in indexed.items() if (machine_id, filename) not in on_disk)
+    )
+    print(f"DEBUG: Document sync for silo {silo_id}: {len(report['uploaded'])} uploaded, "
+          f"{report['unchanged']} unchanged, {len(report['removed'])} removed, {len(report['failed'])} failed")
+    return report
+
+def _encode_cursor(incident: models.Incident) -> str:
+    raw = json.dumps([incident.created_at.isoformat(), incident.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, incident_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), incident_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/incidents", response_model=Union[schemas.IncidentPage, List[schemas.Incident]])
+def get_incidents(
+    request: Request,
+    response: Response,
+    status: Optional[List[str]] = Query(None),
+    priority: Optional[List[str]] = Query(None),
+    machine_id: Optional[str] = None,
+    machine_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    closed_from: Optional[datetime] = None,
+    closed_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    legacy: bool = Query(False, description="Unpaged list of every incident, as returned before pagination"),
+    db: Session = Depends(get_db)
+):
+    """Newest first, paged by keyset on (created_at, id): pass `next_cursor` back as
+    `cursor` for the following page. Cost per page does not grow with history."""
+    # Read before the list query: a write landing in between only makes the tag older than the body
+    versions = _table_versions(db, "incidents", "incident_logs", "machines")
+    if versions:
+        etag = _etag("incidents", versions, sorted(request.query_params.multi_items()))
+        not_modified = _not_modified(request, response, etag)
+        if not_modified:
+            return not_modified
+    query = db.query(models.Incident)
+    if status:
+        query = query.filter(models.Incident.status.in_(status))
+    if priority:
+        query = query.filter(models.Incident.priority.in_(priority))
+    if machine_id:
+        query = query.filter(models.Incident.machine_id == machine_id)
+    if machine_type:
+        query = query.join(models.Machine, models.Machine.id == models.Incident.machine_id).filter(models.Machine.type == machine_type)
+    if created_from:
+        query = query.filter(models.Incident.created_at >= created_from)
+    if created_to:
+        query = query.filter(models.Incident.created_at < created_to)
+    if closed_from:
+        query = query.filter(models.Incident.closed_at >= closed_from)
+    if closed_to:
+        query = query.filter(models.Incident.closed_at < closed_to)
+
+    if legacy:
+        return query.options(selectinload(models.Incident.logs)).order_by(models.Incident.created_at.desc()).all()
+
+    if cursor:
+        query = query.filter(tuple_(models.Incident.created_at, models.Incident.id) < _decode_cursor(cursor))
+    page = (
+        query.order_by(models.Incident.created_at.desc(), models.Incident.id.desc())
+        .limit(limit + 1)
+        .subquery()
+    )
+    # Log stats are aggregated for this page only, in the same statement. Bounded by the
+    # page's first_log_at, so partitions older than its logs are pruned
+    log_stats = (
+        db.query(
+            models.IncidentLog.incident_id,
+            func.count(models.IncidentLog.id).label("log_count"),
+            func.max(models.IncidentLog.date).label("last_log_at")
+        )
+        .filter(
+            models.IncidentLog.incident_id.in_(select(page.c.id)),
+            models.IncidentLog.date >= select(func.min(page.c.first_log_at)).scalar_subquery()
+        )
+        .group_by(models.IncidentLog.incident_id)
+        .subquery()
+    )
+    incident = aliased(models.Incident, page)
+    rows = (
+        db.query(
+            incident,
+            func.coalesce(log_stats.c.log_count, 0) + page.c.archived_log_count,
+            func.coalesce(log_stats.c.last_log_at, page.c.closed_at, page.c.created_at)
+        )
+        .outerjoin(log_stats, log_stats.c.incident_id == page.c.id)
+        .order_by(page.c.created_at.desc(), page.c.id.desc())
+        .all()
+    )
+    items = [
+        schemas.IncidentSummary.model_validate(inc, from_attributes=True).model_copy(
+            update={"log_count": log_count, "last_activity_at": last_activity_at}
+        )
+        for inc, log_count, last_activity_at in rows[:limit]
+    ]
+    return {
+        "items": items,
+        "next_cursor": _encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None,
+        "limit": limit
+    }
+
+SEARCH_TITLE_HEADLINE = "StartSel=<mark>, StopSel=</mark>, HighlightAll=true"
+SEARCH_SNIPPET_HEADLINE = "StartSel=<mark>, StopSel=</mark>, MaxFragments=3, MaxWords=20, MinWords=5, FragmentDelimiter= … "
+
+@router.get("/incidents/search", response_model=schemas.IncidentSearchPage)
+def search_incidents(
+    q: str = Query(..., min_length=2, description="Web-search syntax: words, \"phrases\", OR, -excluded"),
+    status: Optional[List[str]] = Query(None),
+    machine_id: Optional[str] = None,
+    machine_type: Optional[str] = None,
+    offset: int = Query(0, ge=0, le=10000),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Spanish full-text search over title, description and log text, best matches
+    first. Highlights are only computed for the rows of the requested page."""
+    tsquery = func.websearch_to_tsquery("spanish", q)
+    rank = func.ts_rank_cd(models.Incident.search_vector, tsquery).label("rank")
+    query = db.query(models.Incident.id, rank).filter(models.Incident.search_vector.op("@@")(tsquery))
+    if status:
+        query = query.filter(models.Incident.status.in_(status))
+    if machine_id:
+        query = query.filter(models.Incident.machine_id == machine_id)
+    if machine_type:
+        query = query.join(models.Machine, models.Machine.id == models.Incident.machine_id).filter(models.Machine.type == machine_type)
+    page = query.order_by(rank.desc(), models.Incident.id).offset(offset).limit(limit + 1).subquery()
+
+    log_text = (
+        select(func.string_agg(models.IncidentLog.text, " "))
+        .where(models.IncidentLog.incident_id == models.Incident.id, models.IncidentLog.date >= models.Incident.first_log_at)
+        .scalar_subquery()
+    )
+    rows = (
+        db.query(
+            models.Incident,
+            page.c.rank,
+            func.ts_headline("spanish", func.coalesce(models.Incident.title, ""), tsquery, SEARCH_TITLE_HEADLINE),
+            # Same text as search_vector, archived logs included, so a hit always has a snippet
+            func.ts_headline(
+                "spanish",
+                func.concat_ws(" ", models.Incident.description, models.Incident.archived_log_text, log_text),
+                tsquery, SEARCH_SNIPPET_HEADLINE
+            )
+        )
+        .join(page, page.c.id == models.Incident.id)
+        .order_by(page.c.rank.desc(), models.Incident.id)
+        .all()
+    )
+    items = [
+        schemas.IncidentSearchHit.model_validate(inc, from_attributes=True).model_copy(
+            update={"rank": round(float(score), 6), "title_highlight": title, "snippet": snippet}
+        )
+        for inc, score, title, snippet in rows[:limit]
+    ]
+    return {"items": items, "offset": offset, "limit": limit, "has_more": len(rows) > limit}
+
+# --- INCIDENT EXPORT ---
+
+INCIDENT_EXPORT_COLUMNS = ["id", "machine_id", "title", "description", "status", "priority", "reported_by", "created_at", "closed_at", "mattin_id", "logs_archived_at"]
+LOG_EXPORT_COLUMNS = ["log_id", "log_author", "log_text", "log_date"]
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _with_archived_logs(rows: Iterable) -> Iterator:
+    """Puts each archived incident's logs from cold storage ahead of its table rows."""
+    current = None
+    for row in rows:
+        if row.id != current:
+            current = row.id
+            archived = log_archive.read_archived(row.id) if row.logs_archived_at else []
+            for log in archived:
+                yield SimpleNamespace(
+                    **{column: getattr(row, column) for column in INCIDENT_EXPORT_COLUMNS},
+                    log_id=log.id, log_author=log.author, log_text=log.text, log_date=log.date
+                )
+            if archived and row.log_id is None:
+                continue
+        yield row
+
+def _ndjson_incidents(rows: Iterable) -> Iterator[str]:
+    """Groups the incident/log join rows (ordered by incident) into one line per incident."""
+    current = None
+    for row in rows:
+        if current is None or current["id"] != row.id:
+            if current is not None:
+                yield json.dumps(current, ensure_ascii=False) + "\n"
+            current = {column: _export_value(getattr(row, column)) for column in INCIDENT_EXPORT_COLUMNS}
+            current["logs"] = []
+        if row.log_id is not None:
+            current["logs"].append({
+                "id": row.log_id, "incident_id": row.id, "author": row.log_author,
+                "text": row.log_text, "date": _export_value(row.log_date)
+            })
+    if current is not None:
+        yield json.dumps(current, ensure_ascii=False) + "\n"
+
+def _csv_incidents(rows: Iterable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(INCIDENT_EXPORT_COLUMNS + LOG_EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_export_value(getattr(row, column)) for column in INCIDENT_EXPORT_COLUMNS + LOG_EXPORT_COLUMNS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _chunked(pieces: Iterator[str]) -> Iterator[bytes]:
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode()
+
+@router.get("/incidents/export")
+def export_incidents(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    status: Optional[List[str]] = Query(None),
+    machine_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """Every matching incident with its logs (archived ones included), streamed. NDJSON lines have the shape
+    of schemas.Incident; CSV has one row per log, with the incident columns repeated
+    and empty log columns for incidents without logs. Rows are read through a
+    server-side cursor, so memory stays flat whatever the table size."""
+    stmt = (
+        select(
+            *(getattr(models.Incident, column) for column in INCIDENT_EXPORT_COLUMNS),
+            models.IncidentLog.id.label("log_id"),
+            models.IncidentLog.author.label("log_author"),
+            models.IncidentLog.text.label("log_text"),
+            models.IncidentLog.date.label("log_date"),
+        )
+        .outerjoin(models.IncidentLog, models.IncidentLog.incident_id == models.Incident.id)
+        .order_by(models.Incident.id, models.IncidentLog.date, models.IncidentLog.id)
+        .execution_options(yield_per=config.SAT_EXPORT_FETCH_SIZE)
+    )
+    if status:
+        stmt = stmt.where(models.Incident.status.in_(status))
+    if machine_id:
+        stmt = stmt.where(models.Incident.machine_id == machine_id)
+    if created_from:
+        stmt = stmt.where(models.Incident.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(models.Incident.created_at < created_to)
+
+    def rows():
+        # Own session: it has to outlive this function and stay open until the last row is sent
+        db = SessionLocal()
+        try:
+            yield from db.execute(stmt)
+        finally:
+            db.close()
+
+    body = _ndjson_incidents(_with_archived_logs(rows())) if format == "ndjson" else _csv_incidents(_with_archived_logs(rows()))
+    return StreamingResponse(
+        _chunked(body),
+        media_type="application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="incidents.{format}"'}
+    )
 
 @router.post("/incidents", response_model=schemas.Incident)
 def create_incident(incident: schemas.IncidentCreate, db: Session = Depends(get_db)):
@@ -336,77 +949,121 @@ def create_incident(incident: schemas.IncidentCreate, db: Session = Depends(get_
         text="Incidencia creada."
     )
     db.add(db_log)
+    db.flush()
+    analytics.apply(db, analytics.Delta().incident(db_incident).logs(db_incident.machine_id, [db_log.date]))
     
     db.commit()
     db.refresh(db_incident)
+    similarity.index_incident(db_incident)
     return db_incident
 
 @router.patch("/incidents/{incident_id}", response_model=schemas.Incident)
-async def update_incident(incident_id: str, updates: schemas.IncidentUpdate, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: Session = Depends(get_db)):
-    db_incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+async def update_incident(incident_id: str, updates: schemas.IncidentUpdate, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    # Logs, archived log text and machine are loaded up front: the response and the similarity index need them
+    db_incident = (await db.scalars(
+        select(models.Incident)
+        .options(
+            selectinload(models.Incident.logs),
+            joinedload(models.Incident.machine),
+            undefer(models.Incident.archived_log_text)
+        )
+        .where(models.Incident.id == incident_id)
+    )).first()
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
     old_status = db_incident.status
+    before = analytics.snapshot(db_incident)
     update_data = updates.dict(exclude_unset=True)
     
     for key, value in update_data.items():
         setattr(db_incident, key, value)
+    await analytics.apply_async(db, analytics.Delta().change(before, db_incident))
     
+    # Indexing is written to the outbox in the same transaction and done by the worker
+    queued = False
     if old_status != "resolved" and db_incident.status == "resolved":
-        m_id = await index_with_mattin(app_id, silo_id, db_incident)
-        if m_id:
-            db_incident.mattin_id = m_id
+        queued = outbox.enqueue_incident_index(db, db_incident.id, app_id, silo_id) is not None
     
-    db.commit()
-    db.refresh(db_incident)
+    await db.commit()
+    if queued:
+        outbox.wake()
+    if update_data.keys() & {"title", "description", "status"}:
+        similarity.index_incident(db_incident)
     return db_incident
 
 @router.delete("/incidents/{incident_id}")
-async def delete_incident(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: Session = Depends(get_db)):
-    db_incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+async def delete_incident(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    # Logs are loaded so the delete-orphan cascade does not lazy-load them
+    db_incident = (await db.scalars(
+        select(models.Incident)
+        .options(selectinload(models.Incident.logs))
+        .where(models.Incident.id == incident_id)
+    )).first()
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     
-    if db_incident.mattin_id:
-        await unindex_from_mattin(app_id, silo_id, db_incident.mattin_id)
-    
-    db.delete(db_incident)
-    db.commit()
+    mattin_id = db_incident.mattin_id
+    log_dates = [log.date for log in await log_archive.all_logs_async(db_incident)]
+    await analytics.apply_async(
+        db, analytics.Delta().incident(db_incident, -1).logs(db_incident.machine_id, log_dates, -1)
+    )
+    await db.delete(db_incident)
+    await db.commit()
+    # Unindexed after the commit, so the connection is back in the pool while Mattin answers
+    if mattin_id:
+        await unindex_from_mattin(app_id, silo_id, mattin_id)
+    similarity.remove_incident(incident_id)
+    log_archive.remove_archive(incident_id)
     return {"status": "success", "message": "Incident deleted"}
 
-@router.get("/incidents/{incident_id}/similar")
-async def get_similar_incidents(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: Session = Depends(get_db)):
-    db_incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not db_incident:
-        raise HTTPException(status_code=404, detail="Incident not found")
-        
+async def _get_incident_with_machine(incident_id: str) -> Optional[models.Incident]:
+    # Short session: callers go on to wait on Mattin, which must not hold a pooled connection
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(
+            select(models.Incident).options(joinedload(models.Incident.machine)).where(models.Incident.id == incident_id)
+        )).first()
+
+async def _similar_for(db_incident: models.Incident, app_id: Optional[int], silo_id: Optional[str]):
     query_text = f"{db_incident.title}\n{db_incident.description}"
     machine_type = db_incident.machine.type if db_incident.machine else None
     
-    similar_docs = await search_mattin_incidents(app_id, silo_id, query_text, machine_type)
+    mode = config.SIMILARITY_MODE
     
     similar_map = {}
-    for doc in similar_docs:
-        meta = doc.get("metadata", {})
-        inc_id = meta.get("incident_id")
-        if inc_id and inc_id != incident_id:
-            distance = meta.get("_score", 0)
-            similarity = max(0, min(1, 1 - distance)) if distance else 0
-            similar_map[inc_id] = similarity
+    if mode != "local":
+        similar_docs = await search_mattin_incidents(app_id, silo_id, query_text, machine_type)
+        for doc in similar_docs:
+            meta = doc.get("metadata", {})
+            inc_id = meta.get("incident_id")
+            if inc_id and inc_id != db_incident.id:
+                distance = meta.get("_score", 0)
+                similar_map[inc_id] = max(0, min(1, 1 - distance)) if distance else 0
+    
+    if mode == "local" or (mode == "fallback" and not similar_map):
+        similar_map = await asyncio.to_thread(similarity.search, query_text, 4, machine_type, db_incident.id)
+    elif mode == "hybrid":
+        local = await asyncio.to_thread(similarity.search, query_text, 8, machine_type, db_incident.id)
+        similar_map = similarity.combine(similar_map, local, 4)
             
     if not similar_map:
         return []
 
-    similar_db_incidents = db.query(models.Incident).filter(models.Incident.id.in_(similar_map.keys())).all()
+    async with AsyncSessionLocal() as db:
+        similar_db_incidents = (await db.scalars(
+            select(models.Incident)
+            .options(selectinload(models.Incident.logs), joinedload(models.Incident.machine))
+            .where(models.Incident.id.in_(similar_map.keys()))
+        )).all()
     
     results = []
     for inc in similar_db_incidents:
+        logs = await log_archive.all_logs_async(inc)
         results.append({
             "id": inc.id,
             "title": inc.title,
             "description": inc.description,
-            "logs": [{"author": log.author, "date": log.date, "text": log.text} for log in inc.logs],
+            "logs": [{"author": log.author, "date": log.date, "text": log.text} for log in logs],
             "similarity": similar_map.get(inc.id, 0),
             "metadata": {"modelo": inc.machine.model if inc.machine else "Desconocido"}
         })
@@ -415,12 +1072,7 @@ async def get_similar_incidents(incident_id: str, app_id: Optional[int] = None,
         
     return results
 
-@router.get("/incidents/{incident_id}/knowledge")
-async def get_incident_knowledge(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None, db: Session = Depends(get_db)):
-    db_incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
-    if not db_incident:
-        raise HTTPException(status_code=404, detail="Incident not found")
-        
+async def _knowledge_for(db_incident: models.Incident, app_id: Optional[int], silo_id: Optional[str]):
     query_text = f"{db_incident.title}\n{db_incident.description}"
     machine_type = db_incident.machine.type if db_incident.machine else None
     machine_model = db_incident.machine.model if db_incident.machine else None
@@ -443,23 +1095,151 @@ async def get_incident_knowledge(incident_id: str, app_id: Optional[int] = None,
         
     return results
 
-@router.post("/incidents/{incident_id}/logs", response_model=schemas.IncidentLog)
-def add_incident_log(incident_id: str, log: schemas.IncidentLogCreate, db: Session = Depends(get_db)):
-    db_incident = db.query(models.Incident).filter(models.Incident.id == incident_id).first()
+@router.get("/incidents/{incident_id}/similar")
+async def get_similar_incidents(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None):
+    db_incident = await _get_incident_with_machine(incident_id)
     if not db_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
-    
-    if db_incident.status == "open":
-        db_incident.status = "in_progress"
-        db_log_status = models.IncidentLog(
-            incident_id=incident_id,
-            author="Sistema",
-            text="Estado cambiado a: EN PROCESO"
-        )
-        db.add(db_log_status)
+        
+    return await _similar_for(db_incident, app_id, silo_id)
 
-    db_log = models.IncidentLog(incident_id=incident_id, **log.dict())
-    db.add(db_log)
+@router.get("/incidents/{incident_id}/knowledge")
+async def get_incident_knowledge(incident_id: str, app_id: Optional[int] = None, silo_id: Optional[str] = None):
+    db_incident = await _get_incident_with_machine(incident_id)
+    if not db_incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+        
+    return await _knowledge_for(db_incident, app_id, silo_id)
+
+@router.get("/incidents/{incident_id}/insights")
+async def get_incident_insights(
+    incident_id: str,
+    app_id: Optional[int] = None,
+    silo_id: Optional[str] = None,
+    docs_silo_id: Optional[str] = None,
+    timeout: float = Query(config.SAT_INSIGHTS_TIMEOUT, gt=0, le=60)
+):
+    """Similar incidents (silo_id) and manual excerpts (docs_silo_id) in one round trip.
+
+    The incident and its machine are loaded once and both branches run
+    concurrently. A branch that fails or exceeds `timeout` seconds is returned
+    empty and listed in `errors`, with `partial` set.
+    """
+    db_incident = await _get_incident_with_machine(incident_id)
+    if not db_incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    branches = {
+        "similar": _similar_for(db_incident, app_id, silo_id),
+        "knowledge": _knowledge_for(db_incident, app_id, docs_silo_id),
+    }
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(branch, timeout) for branch in branches.values()),
+        return_exceptions=True
+    )
+
+    payload = {"incident_id": incident_id, "partial": False, "errors": {}}
+    for name, outcome in zip(branches.keys(), outcomes):
+        if isinstance(outcome, BaseException):
+            reason = "timeout" if isinstance(outcome, asyncio.TimeoutError) else str(outcome)
+            print(f"DEBUG: insights branch '{name}' for {incident_id} failed: {reason}")
+            payload[name] = []
+            payload["errors"][name] = reason
+            payload["partial"] = True
+        else:
+            payload[name] = outcome
+    return payload
+
+@router.get("/incidents/{incident_id}", response_model=schemas.Incident)
+async def get_incident(incident_id: str, db: AsyncSession = Depends(get_async_db)):
+    """One incident with the logs still in the table; archived ones come from /logs."""
+    db_incident = (await db.scalars(
+        select(models.Incident).options(selectinload(models.Incident.logs)).where(models.Incident.id == incident_id)
+    )).first()
+    if not db_incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return db_incident
+
+@router.get("/incidents/{incident_id}/logs", response_model=List[schemas.IncidentLog])
+async def get_incident_logs(incident_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Every log of the incident by date, including those moved to cold storage,
+    which incident responses leave out (see logs_archived_at)."""
+    db_incident = (await db.scalars(
+        select(models.Incident).options(selectinload(models.Incident.logs)).where(models.Incident.id == incident_id)
+    )).first()
+    if not db_incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+    return await log_archive.all_logs_async(db_incident)
+
+def _append_logs(db: Session, entries: List[tuple]) -> List[schemas.IncidentLog]:
+    """Inserts (incident_id, IncidentLogCreate) entries in order and commits once.
+
+    An open incident moves to in_progress at its first new log, with the usual
+    system log in front of it. Returns every created row, status logs included.
+    """
+    ids = sorted({incident_id for incident_id, _ in entries})
+    # Locked in id order, so concurrent batches touching the same incidents cannot deadlock
+    incidents = {
+        inc.id: inc
+        for inc in db.query(models.Incident).filter(models.Incident.id.in_(ids)).order_by(models.Incident.id).with_for_update()
+    }
+    missing = [incident_id for incident_id in ids if incident_id not in incidents]
+    if missing:
+        raise HTTPException(status_code=404, detail="Incident not found" if len(ids) == 1 else f"Incidents not found: {', '.join(missing)}")
+
+    before = {incident_id: analytics.snapshot(inc) for incident_id, inc in incidents.items()}
+    new_logs = []
+    for incident_id, log in entries:
+        db_incident = incidents[incident_id]
+        if db_incident.status == "open":
+            db_incident.status = "in_progress"
+            new_logs.append(models.IncidentLog(
+                incident_id=incident_id,
+                author="Sistema",
+                text="Estado cambiado a: EN PROCESO"
+            ))
+        new_logs.append(models.IncidentLog(incident_id=incident_id, **log.dict()))
+    db.add_all(new_logs)
+    db.flush()
+
+    delta = analytics.Delta()
+    for incident_id, db_incident in incidents.items():
+        delta.change(before[incident_id], db_incident).logs(
+            db_incident.machine_id, [l.date for l in new_logs if l.incident_id == incident_id]
+        )
+    analytics.apply(db, delta)
+    # Serialized before commit: ids and dates came back with the flush
+    created = [schemas.IncidentLog.model_validate(l) for l in new_logs]
     db.commit()
-    db.refresh(db_log)
-    return db_log
+
+    for db_incident in (
+        db.query(models.Incident)
+        .options(selectinload(models.Incident.logs), joinedload(models.Incident.machine), undefer(models.Incident.archived_log_text))
+        .filter(models.Incident.id.in_(ids))
+    ):
+        similarity.index_incident(db_incident)
+    return created
+
+def _check_batch_size(logs: list):
+    if not logs:
+        raise HTTPException(status_code=400, detail="No logs to add")
+    if len(logs) > config.SAT_LOG_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {config.SAT_LOG_BATCH_MAX_SIZE} logs per batch")
+
+@router.post("/incidents/{incident_id}/logs", response_model=schemas.IncidentLog)
+def add_incident_log(incident_id: str, log: schemas.IncidentLogCreate, db: Session = Depends(get_db)):
+    return _append_logs(db, [(incident_id, log)])[-1]
+
+@router.post("/incidents/{incident_id}/logs:batch", response_model=List[schemas.IncidentLog])
+def add_incident_logs(incident_id: str, batch: schemas.IncidentLogBatch, db: Session = Depends(get_db)):
+    """Appends several logs to one incident in a single transaction, in the given
+    order, e.g. notes queued offline by a mobile client."""
+    _check_batch_size(batch.logs)
+    return _append_logs(db, [(incident_id, log) for log in batch.logs])
+
+@router.post("/incidents/logs:batch", response_model=List[schemas.IncidentLog])
+def add_logs_to_incidents(batch: schemas.IncidentLogMultiBatch, db: Session = Depends(get_db)):
+    """Like /incidents/{id}/logs:batch, for logs of any number of incidents. All or
+    nothing: an unknown incident id rejects the whole batch."""
+    _check_batch_size(batch.logs)
+    return _append_logs(db, [(log.incident_id, schemas.IncidentLogCreate(author=log.author, text=log.text)) for log in batch.logs])
@@ -0,0 +1,565 @@
+import re
+import asyncio
+import threading
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+
+from database import SessionLocal
+import models
+import config
+
+# Local lexical similarity over incidents (title + description + log text).
+#
+# Postings live in an immutable base segment (CSR arrays: per-term offsets into
+# int32 slots / uint16 term frequencies, built in bulk with NumPy) plus a small
+# append-only delta for incidents written since. Updating an incident appends it
+# under a new slot and tombstones the old one. A background thread merges the
+# delta and drops tombstones into a new base once either grows too large.
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = set("""
+a al algo como con de del desde donde el en entre es esta este esto ha hay la las le lo los mas me mi muy no o para pero
+por que se si sin sobre su sus te tu un una uno unos y ya ha han fue son ser al esta estan cuando tambien
+""".split())
+
+COMPACT_MIN_SLOTS = 1024
+COMPACT_DEAD_RATIO = 0.3 # tombstoned share of slots that triggers a merge
+COMPACT_MIN_DELTA = 50_000 # delta postings that trigger a merge (or a quarter of the base, if larger)
+COMPACT_CHUNK = 1 << 20 # base postings filtered per NumPy call while merging
+
+
+def _normalize(text: str) -> str:
+    # NFKD + ASCII drop strips accents ("ó" -> "o", "ñ" -> "n") in one C-level pass
+    return unicodedata.normalize("NFKD", (text or "").lower()).encode("ascii", "ignore").decode()
+
+
+def _fold(tok: str) -> Optional[str]:
+    if len(tok) < 2 or tok in _STOPWORDS:
+        return None
+    # Light plural folding so "fugas"/"fuga" and "motores"/"motor" match
+    if len(tok) > 4 and tok.endswith("es"):
+        return tok[:-2]
+    if len(tok) > 3 and tok.endswith("s"):
+        return tok[:-1]
+    return tok
+
+
+def tokenize(text: str) -> List[str]:
+    return [tok for tok in map(_fold, _TOKEN_RE.findall(_normalize(text))) if tok]
+
+
+class _Vocabulary(dict):
+    """Raw token -> term id (-1 for stopwords). Stopword and plural rules run once
+    per distinct token; new terms get the next id in `terms`."""
+
+    def __init__(self, terms: Dict[str, int]):
+        super().__init__()
+        self.terms = terms
+
+    def __missing__(self, tok: str) -> int:
+        term = _fold(tok)
+        term_id = -1 if term is None else self.terms.setdefault(term, len(self.terms))
+        self[tok] = term_id
+        return term_id
+
+
+def _csr(terms: np.ndarray, n_terms: int) -> np.ndarray:
+    offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+    return offsets
+
+
+class IncidentIndex:
+    """Writers (threadpool routes, the event loop, the startup build) hold `lock`
+    for the few microseconds an update takes. Searches hold it only to take
+    references to the arrays, then score without it: the base segment is never
+    modified in place, and per-slot arrays are replaced rather than resized."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.lock = threading.RLock()
+        self.k1 = k1
+        self.b = b
+        self.terms: Dict[str, int] = {}
+        self.vocab = _Vocabulary(self.terms)
+        self.base_offsets = np.zeros(1, dtype=np.int64)
+        self.base_slots = np.zeros(0, dtype=np.int32)
+        self.base_tfs = np.zeros(0, dtype=np.uint16)
+        self.delta_slots: Dict[int, array] = {}
+        self.delta_tfs: Dict[int, array] = {}
+        self.delta_postings = 0
+        self.n_slots = 0
+        self.slot_ids: List[Optional[str]] = []
+        self.slot_len = np.zeros(0, dtype=np.float32)
+        self.slot_alive = np.zeros(0, dtype=bool)
+        self.slot_type = np.zeros(0, dtype=np.int32)
+        self.slot_resolved = np.zeros(0, dtype=bool)
+        self.types: Dict[str, int] = {}
+        self.slot_of: Dict[str, int] = {}
+        self.total_len = 0
+        self.live = 0
+        self.compacting = False
+
+    # --- WRITES ---
+
+    def _reserve(self, n: int):
+        capacity = len(self.slot_len)
+        if n <= capacity:
+            return
+        capacity = max(n, 2 * capacity, COMPACT_MIN_SLOTS)
+        for name in ("slot_len", "slot_alive", "slot_type", "slot_resolved"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.n_slots] = old[:self.n_slots]
+            setattr(self, name, new)
+
+    def upsert(self, incident_id: str, text: str, machine_type: Optional[str] = None, resolved: bool = False):
+        raw = _TOKEN_RE.findall(_normalize(text))
+        with self.lock:
+            self._remove(incident_id)
+            term_ids = np.fromiter(map(self.vocab.__getitem__, raw), dtype=np.int32, count=len(raw))
+            term_ids = term_ids[term_ids >= 0]
+            terms, tfs = np.unique(term_ids, return_counts=True)
+
+            slot = self.n_slots
+            self._reserve(slot + 1)
+            self.slot_ids.append(incident_id)
+            self.slot_len[slot] = len(term_ids)
+            self.slot_alive[slot] = True
+            self.slot_type[slot] = self.types.setdefault(machine_type or "", len(self.types))
+            self.slot_resolved[slot] = resolved
+            self.n_slots += 1
+            self.slot_of[incident_id] = slot
+            self.total_len += len(term_ids)
+            self.live += 1
+
+            for term, tf in zip(terms.tolist(), np.minimum(tfs, 65535).tolist()):
+                if term not in self.delta_slots:
+                    self.delta_slots[term] = array("i")
+                    self.delta_tfs[term] = array("H")
+                self.delta_slots[term].append(slot)
+                self.delta_tfs[term].append(tf)
+            self.delta_postings += len(terms)
+        self._maybe_compact()
+
+    def _remove(self, incident_id: str):
+        slot = self.slot_of.pop(incident_id, None)
+        if slot is None:
+            return
+        self.slot_alive[slot] = False
+        self.total_len -= int(self.slot_len[slot])
+        self.live -= 1
+
+    def remove(self, incident_id: str):
+        with self.lock:
+            self._remove(incident_id)
+        self._maybe_compact()
+
+    def load(self, docs: Iterable[Tuple[str, str, Optional[str], bool]]):
+        """Bulk-loads (incident_id, text, machine_type, resolved) into an empty index,
+        straight into the base segment. Python only maps tokens to term ids; counting
+        and the CSR layout are done in NumPy."""
+        vocab = self.vocab.__getitem__
+        ids, types, resolved = [], array("i"), array("b")
+        lens, tokens = array("i"), array("i")
+        for incident_id, text, machine_type, is_resolved in docs:
+            raw = _TOKEN_RE.findall(_normalize(text))
+            tokens.extend(map(vocab, raw))
+            lens.append(len(raw))
+            ids.append(incident_id)
+            types.append(self.types.setdefault(machine_type or "", len(self.types)))
+            resolved.append(1 if is_resolved else 0)
+
+        n = len(ids)
+        tok = np.frombuffer(tokens, dtype=np.int32)
+        slot = np.repeat(np.arange(n, dtype=np.int64), np.frombuffer(lens, dtype=np.int32))
+        valid = tok >= 0
+        tok, slot = tok[valid], slot[valid]
+        doc_len = np.bincount(slot, minlength=n).astype(np.float32)
+        # One sort over (term, slot) keys yields term frequencies in CSR order
+        keys, tfs = np.unique(tok.astype(np.int64) * max(n, 1) + slot, return_counts=True)
+        del tok, slot, valid, tokens
+
+        with self.lock:
+            self.base_offsets = _csr(keys // max(n, 1), len(self.terms))
+            self.base_slots = (keys % max(n, 1)).astype(np.int32)
+            self.base_tfs = np.minimum(tfs, 65535).astype(np.uint16)
+            self.n_slots = 0
+            self._reserve(n)
+            self.slot_len[:n] = doc_len
+            self.slot_alive[:n] = True
+            self.slot_type[:n] = np.frombuffer(types, dtype=np.int32)
+            self.slot_resolved[:n] = np.frombuffer(resolved, dtype=np.int8).astype(bool)
+            self.slot_ids = ids
+            self.n_slots = n
+            self.slot_of = {incident_id: i for i, incident_id in enumerate(ids)}
+            self.total_len = int(doc_len.sum())
+            self.live = n
+        return self
+
+    # --- COMPACTION ---
+
+    def _maybe_compact(self):
+        with self.lock:
+            if self.compacting or self.n_slots < COMPACT_MIN_SLOTS:
+                return
+            dead = self.n_slots - self.live
+            if dead < COMPACT_DEAD_RATIO * self.n_slots and self.delta_postings < max(COMPACT_MIN_DELTA, len(self.base_slots) // 4):
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact, name="similarity-compact", daemon=True).start()
+
+    def compact(self):
+        """Merges the delta into a new base without tombstoned slots. The merge runs
+        on copies, without the lock; slots written or removed meanwhile are carried
+        over when the new arrays are swapped in."""
+        try:
+            with self.lock:
+                self.compacting = True
+                n = self.n_slots
+                alive = self.slot_alive[:n].copy()
+                slot_len = self.slot_len[:n].copy()
+                slot_type = self.slot_type[:n].copy()
+                slot_resolved = self.slot_resolved[:n].copy()
+                slot_ids = self.slot_ids[:n]
+                n_terms = len(self.terms)
+                base_offsets, base_slots, base_tfs = self.base_offsets, self.base_slots, self.base_tfs
+                delta = [
+                    (term, np.frombuffer(self.delta_slots[term], dtype=np.int32).copy(),
+                     np.frombuffer(self.delta_tfs[term], dtype=np.uint16).copy())
+                    for term in self.delta_slots
+                ]
+
+            offsets, slots, tfs = self._merge(alive, n_terms, base_offsets, base_slots, base_tfs, delta)
+            del delta
+
+            live_slots = np.flatnonzero(alive)
+            live_ids = [slot_ids[i] for i in live_slots.tolist()]
+            slot_of = {incident_id: i for i, incident_id in enumerate(live_ids)}
+
+            with self.lock:
+                self._swap(n, live_slots, live_ids, slot_of, offsets, slots, tfs,
+                           slot_len[live_slots], slot_type[live_slots], slot_resolved[live_slots])
+        finally:
+            with self.lock:
+                self.compacting = False
+
+    @staticmethod
+    def _merge(alive, n_terms, base_offsets, base_slots, base_tfs, delta):
+        """New CSR arrays without tombstoned slots, slots renumbered densely. Every
+        delta slot is newer than the base ones, so each term keeps its base postings
+        followed by its delta postings. The base is filtered in chunks: each NumPy
+        call is short, so the GIL keeps changing hands with request threads."""
+        remap = (np.cumsum(alive, dtype=np.int64) - 1).astype(np.int32)
+        n_base_terms = len(base_offsets) - 1
+        base_counts = np.zeros(n_terms, dtype=np.int64)
+        kept = []
+        for start in range(0, len(base_slots), COMPACT_CHUNK):
+            chunk = base_slots[start:start + COMPACT_CHUNK]
+            keep = alive[chunk]
+            positions = np.flatnonzero(keep) + start
+            chunk_terms = (np.searchsorted(base_offsets, positions, "right") - 1).astype(np.int32)
+            base_counts[:n_base_terms] += np.bincount(chunk_terms, minlength=n_base_terms)
+            kept.append((chunk_terms, remap[chunk[keep]], base_tfs[start:start + COMPACT_CHUNK][keep]))
+
+        delta_counts = np.zeros(n_terms, dtype=np.int64)
+        delta_kept = []
+        for term, term_slots, term_tfs in delta:
+            keep = alive[term_slots]
+            delta_counts[term] = np.count_nonzero(keep)
+            delta_kept.append((term, remap[term_slots[keep]], term_tfs[keep]))
+
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(base_counts + delta_counts, out=offsets[1:])
+        # A base posting moves down by the delta postings of the terms before its own
+        delta_before = np.zeros(n_terms, dtype=np.int64)
+        np.cumsum(delta_counts[:-1], out=delta_before[1:])
+        slots = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        done = 0
+        for chunk_terms, chunk_slots, chunk_tfs in kept:
+            target = np.arange(done, done + len(chunk_slots)) + delta_before[chunk_terms]
+            slots[target] = chunk_slots
+            tfs[target] = chunk_tfs
+            done += len(chunk_slots)
+        del kept
+        for term, term_slots, term_tfs in delta_kept:
+            start = offsets[term] + base_counts[term]
+            slots[start:offsets[term + 1]] = term_slots
+            tfs[start:offsets[term + 1]] = term_tfs
+        return offsets, slots, tfs
+
+    def _swap(self, n, live_slots, live_ids, slot_of, offsets, slots, tfs, slot_len, slot_type, slot_resolved):
+        nb = len(live_slots)
+        tail = self.n_slots - n
+        # Merged slots removed during the merge
+        alive = self.slot_alive[live_slots]
+        for i in np.flatnonzero(~alive).tolist():
+            if slot_of.get(live_ids[i]) == i:
+                del slot_of[live_ids[i]]
+        # Slots written during the merge move down after the merged ones
+        tail_ids = self.slot_ids[n:]
+        for i, incident_id in enumerate(tail_ids):
+            if self.slot_alive[n + i]:
+                slot_of[incident_id] = nb + i
+
+        capacity = max(nb + tail, COMPACT_MIN_SLOTS)
+        arrays = {}
+        for name, merged in (("slot_len", slot_len), ("slot_alive", alive),
+                             ("slot_type", slot_type), ("slot_resolved", slot_resolved)):
+            new = np.zeros(capacity, dtype=merged.dtype)
+            new[:nb] = merged
+            new[nb:nb + tail] = getattr(self, name)[n:self.n_slots]
+            arrays[name] = new
+
+        delta_slots, delta_tfs, delta_postings = {}, {}, 0
+        for term, term_slots in self.delta_slots.items():
+            term_slots = np.frombuffer(term_slots, dtype=np.int32)
+            newer = term_slots >= n
+            if newer.any():
+                delta_slots[term] = array("i", (term_slots[newer] - n + nb).astype(np.int32).tobytes())
+                delta_tfs[term] = array("H", np.frombuffer(self.delta_tfs[term], dtype=np.uint16)[newer].tobytes())
+                delta_postings += len(delta_slots[term])
+            del term_slots
+
+        self.base_offsets, self.base_slots, self.base_tfs = offsets, slots, tfs
+        self.delta_slots, self.delta_tfs, self.delta_postings = delta_slots, delta_tfs, delta_postings
+        for name, new in arrays.items():
+            setattr(self, name, new)
+        self.slot_ids = live_ids + tail_ids
+        self.slot_of = slot_of
+        self.n_slots = nb + tail
+
+    # --- READS ---
+
+    def search(self, query: str, k: int = 4, machine_type: Optional[str] = None,
+               resolved_only: bool = False, exclude_id: Optional[str] = None) -> Tuple[List[Tuple[str, float]], Optional[float]]:
+        """Top-k (incident_id, bm25) for `query`. Also returns the score of `exclude_id`
+        itself, which callers use to normalise scores into a 0..1 similarity."""
+        query_terms = set(tokenize(query))
+        with self.lock:
+            term_ids = [self.terms[t] for t in query_terms if t in self.terms]
+            if not self.live or not term_ids:
+                return [], None
+            n = self.n_slots
+            live = self.live
+            avgdl = max(self.total_len / self.live, 1e-6)
+            base_offsets, base_slots, base_tfs = self.base_offsets, self.base_slots, self.base_tfs
+            delta = [
+                (np.frombuffer(self.delta_slots[t], dtype=np.int32).copy(), np.frombuffer(self.delta_tfs[t], dtype=np.uint16).copy())
+                if t in self.delta_slots else None
+                for t in term_ids
+            ]
+            slot_len, slot_alive, slot_type, slot_resolved = self.slot_len, self.slot_alive, self.slot_type, self.slot_resolved
+            slot_ids = self.slot_ids
+            type_code = self.types.get(machine_type, -1) if machine_type is not None else None
+            exclude_slot = self.slot_of.get(exclude_id) if exclude_id else None
+
+        n_base_terms = len(base_offsets) - 1
+        postings = []
+        for term, extra in zip(term_ids, delta):
+            slots, tfs = base_slots[:0], base_tfs[:0]
+            if term < n_base_terms:
+                slots = base_slots[base_offsets[term]:base_offsets[term + 1]]
+                tfs = base_tfs[base_offsets[term]:base_offsets[term + 1]]
+            if extra is not None:
+                # Delta slots are all newer than base slots, so each list stays sorted
+                slots, tfs = np.concatenate([slots, extra[0]]), np.concatenate([tfs, extra[1]])
+            postings.append((slots, tfs))
+        df = np.array([len(slots) for slots, _ in postings]) * live / n  # tombstones inflate df; scale them out
+        idf = np.log1p((live - df + 0.5) / (df + 0.5))
+        # tf / (tf + norm) < 1, so no document gets more than idf * (k1 + 1) from a term
+        upper = idf * (self.k1 + 1)
+        order = np.argsort(-upper)
+        remaining = np.cumsum(upper[order][::-1])[::-1]
+
+        def weights(slots, tfs):
+            tfs = tfs.astype(np.float32)
+            norm = slot_len[slots] * np.float32(self.k1 * self.b / avgdl)
+            norm += np.float32(self.k1 * (1 - self.b))
+            norm += tfs
+            return tfs / norm
+
+        def eligible(slots):
+            mask = slot_alive[slots]
+            if type_code is not None:
+                mask &= slot_type[slots] == type_code
+            if resolved_only:
+                mask &= slot_resolved[slots]
+            if exclude_slot is not None:
+                mask &= slots != exclude_slot
+            return slots[mask]
+
+        # MaxScore: terms are scored over their whole posting list from the most to the
+        # least selective, until the terms left could not lift a document that has none
+        # of the scored terms to the current k-th best score. The remaining (long,
+        # low-idf) lists are only probed for candidates that can still make the top k.
+        scores = np.zeros(n)
+        seen = np.zeros(n, dtype=bool)
+        candidates = np.zeros(0, dtype=np.int32)
+        threshold = 0.0
+        probe_from = len(order)
+        for pos, i in enumerate(order.tolist()):
+            if remaining[pos] < threshold:
+                probe_from = pos
+                break
+            slots, tfs = postings[i]
+            scores[slots] += idf[i] * (self.k1 + 1) * weights(slots, tfs)  # slots are unique within a term
+            new = slots[~seen[slots]]
+            seen[new] = True
+            candidates = np.concatenate([candidates, eligible(new)])
+            if len(candidates) >= k:
+                threshold = float(np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k])
+
+        probe = candidates
+        for pos in range(probe_from, len(order)):
+            slots, tfs = postings[order[pos]]
+            probe = probe[scores[probe] + remaining[pos] >= threshold]
+            targets = probe if exclude_slot is None else np.append(probe, exclude_slot).astype(np.int32)
+            if not len(slots) or not len(targets):
+                continue
+            contribution = idf[order[pos]] * (self.k1 + 1)
+            if len(targets) * 16 >= len(slots):
+                scores[slots] += contribution * weights(slots, tfs)
+                continue
+            at = np.minimum(np.searchsorted(slots, targets), len(slots) - 1)
+            hit = slots[at] == targets
+            scores[targets[hit]] += contribution * weights(targets[hit], tfs[at[hit]])
+
+        reference = None
+        if exclude_slot is not None and exclude_slot < n and scores[exclude_slot] > 0:
+            reference = float(scores[exclude_slot])
+        if not len(candidates):
+            return [], reference
+        totals = scores[candidates]
+        top = np.argpartition(-totals, min(k, len(totals)) - 1)[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(slot_ids[candidates[i]], float(totals[i])) for i in top], reference
+
+    def stats(self) -> dict:
+        with self.lock:
+            postings = len(self.base_slots) + self.delta_postings
+            return {
+                "incidents": self.live,
+                "slots": self.n_slots,
+                "terms": len(self.terms),
+                "postings": postings,
+                "delta_postings": self.delta_postings,
+                "compacting": self.compacting,
+                "approx_bytes": postings * 6 + self.n_slots * 10,
+            }
+
+
+index = IncidentIndex()
+_building = False
+# Writes made while a rebuild runs, replayed into the new index before the swap:
+# incident_id -> (text, machine_type, resolved), or None for a removal
+_dirty: Dict[str, Optional[tuple]] = {}
+# Held by writers around their update and by the swap, so no write can land in
+# the old index once the new one is in place
+_swap_lock = threading.Lock()
+
+
+def incident_text(title: Optional[str], description: Optional[str], log_texts: Iterable[str]) -> str:
+    return "\n".join([title or "", description or "", *[t or "" for t in log_texts]])
+
+
+def index_incident(incident: models.Incident):
+    """Re-indexes one incident from its ORM object (title, description, logs, machine).
+    Archived incidents also need archived_log_text loaded (it is deferred)."""
+    machine_type = incident.machine.type if incident.machine else None
+    archived = [incident.archived_log_text] if incident.logs_archived_at else []
+    text = incident_text(incident.title, incident.description, [*archived, *(log.text for log in incident.logs)])
+    doc = (text, machine_type, incident.status == "resolved")
+    with _swap_lock:
+        if _building:
+            _dirty[incident.id] = doc
+        index.upsert(incident.id, *doc)
+
+
+def remove_incident(incident_id: str):
+    with _swap_lock:
+        if _building:
+            _dirty[incident_id] = None
+        index.remove(incident_id)
+
+
+def _load_from_db() -> IncidentIndex:
+    """Builds a new index straight from SQL, aggregating log text per incident (no ORM N+1)."""
+    db = SessionLocal()
+    try:
+        logs = (
+            db.query(models.IncidentLog.incident_id, func.string_agg(models.IncidentLog.text, "\n").label("text"))
+            .group_by(models.IncidentLog.incident_id)
+            .subquery()
+        )
+        query = (
+            db.query(
+                models.Incident.id, models.Incident.title, models.Incident.description,
+                models.Incident.status, models.Machine.type, models.Incident.archived_log_text, logs.c.text
+            )
+            .outerjoin(models.Machine, models.Machine.id == models.Incident.machine_id)
+            .outerjoin(logs, logs.c.incident_id == models.Incident.id)
+        )
+        return IncidentIndex().load(
+            (inc_id, incident_text(title, description, [archived_text, log_text] if archived_text else [log_text]),
+             machine_type, status == "resolved")
+            for inc_id, title, description, status, machine_type, archived_text, log_text in query.yield_per(5000)
+        )
+    finally:
+        db.close()
+
+
+def _swap_in(fresh: IncidentIndex):
+    global index, _building
+    with _swap_lock:
+        for incident_id, doc in _dirty.items():
+            if doc is None:
+                fresh.remove(incident_id)
+            else:
+                fresh.upsert(incident_id, *doc)
+        _dirty.clear()
+        index = fresh
+        _building = False
+
+
+async def rebuild():
+    """Builds a new index from the database in a worker thread and swaps it in.
+    Writes made during the build are replayed into it under the swap lock."""
+    global _building
+    with _swap_lock:
+        _building = True
+        _dirty.clear()
+    try:
+        fresh = await asyncio.to_thread(_load_from_db)
+        await asyncio.to_thread(_swap_in, fresh)
+        print(f"DEBUG: Local similarity index ready: {index.stats()}")
+    except Exception as e:
+        print(f"ERROR BUILDING SIMILARITY INDEX: {str(e)}")
+    finally:
+        with _swap_lock:
+            _building = False
+            _dirty.clear()
+
+
+def search(query: str, k: int, machine_type: Optional[str], exclude_id: Optional[str]) -> Dict[str, float]:
+    """Local similar resolved incidents as {incident_id: similarity 0..1}, the same
+    population Mattin holds (only resolved incidents are indexed there)."""
+    hits, reference = index.search(query, k=k, machine_type=machine_type, resolved_only=True, exclude_id=exclude_id)
+    if not hits:
+        return {}
+    top = reference or hits[0][1]
+    return {inc_id: round(min(1.0, score / top), 4) for inc_id, score in hits}
+
+
+def combine(mattin: Dict[str, float], local: Dict[str, float], k: int) -> Dict[str, float]:
+    """Hybrid re-ranking: weighted blend of Mattin and local similarities."""
+    alpha = config.SIMILARITY_HYBRID_ALPHA
+    merged = {
+        inc_id: alpha * mattin.get(inc_id, 0) + (1 - alpha) * local.get(inc_id, 0)
+        for inc_id in set(mattin) | set(local)
+    }
+    best = sorted(merged.items(), key=lambda x: x[1], reverse=True)[:k]
+    return {inc_id: round(score, 4) for inc_id, score in best}
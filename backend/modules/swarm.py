@@ -4,21 +4,17 @@ import re
 import httpx
 from typing import List, Dict, Any
 from fastapi import APIRouter, HTTPException, Request
-import config
+from mattin import client as mattin_client
 
 router = APIRouter(prefix="/api/swarm", tags=["swarm"])
 
-MATTIN_URL = config.MATTIN_URL
-API_KEY = config.API_KEY
-
 
 # ─── Helper: call a Mattin agent ───
-async def _call_mattin_agent(client: httpx.AsyncClient, app_id: int, agent_id: int, message: str) -> str:
+async def _call_mattin_agent(app_id: int, agent_id: int, message: str, profile: str = "chat") -> str:
     """Call a Mattin agent and return the raw response text."""
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent_id}/call"
-    headers = {"X-API-KEY": API_KEY}
+    url = f"/public/v1/app/{app_id}/chat/{agent_id}/call"
     print(f"DEBUG: _call_mattin_agent agent {agent_id} at {url}")
-    response = await client.post(url, headers=headers, data={"message": message})
+    response = await mattin_client.request("POST", url, profile=profile, data={"message": message})
     response.raise_for_status()
     res_data = response.json()
     return res_data.get("response", "")
@@ -100,21 +96,22 @@ async def process_turn(request: Request):
             f"IMPORTANTE: Sé conciso. Máximo 150 palabras."
         )
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response_text = await _call_mattin_agent(client, app_id, agent["agentId"], final_prompt)
-            return {
-                "agentId": agent["agentId"],
-                "name": agent["name"],
-                "response": response_text,
-                "deltaContextUsed": context_str
-            }
-        except httpx.HTTPStatusError as e:
-            print(f"DEBUG: process_turn HTTP Error: {e.response.status_code} - {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=str(e))
-        except Exception as e:
-            print(f"DEBUG: process_turn General Error: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        response_text = await _call_mattin_agent(app_id, agent["agentId"], final_prompt)
+        return {
+            "agentId": agent["agentId"],
+            "name": agent["name"],
+            "response": response_text,
+            "deltaContextUsed": context_str
+        }
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        print(f"DEBUG: process_turn HTTP Error: {e.response.status_code} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        print(f"DEBUG: process_turn General Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/decide_next")
@@ -202,40 +199,34 @@ async def decide_next(request: Request):
             f"Basado en el contexto, ¿quién debería hablar ahora? Responde SOLO con el JSON: {{\"next\": \"id_del_agente\"}} o {{\"next\": \"fin\"}}."
         )
 
-    url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{mod_id}/call"
-    headers = {"X-API-KEY": API_KEY}
-
-    print(f"DEBUG: Calling Moderator at {url} (mode={mode})")
+    print(f"DEBUG: Calling Moderator {mod_id} (mode={mode})")
     print(f"DEBUG: Prompt length: {len(prompt)}")
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.post(url, headers=headers, data={"message": prompt})
-            response.raise_for_status()
-            res_data = response.json()
-            
-            raw_res = res_data.get("response", "")
-            print(f"DEBUG: Moderator Raw Response: {raw_res}")
-
-            decision = _parse_moderator_decision(raw_res)
-
-            # In discussion mode, convert "you" to a valid agent pick (skip user turn)
-            if mode == "discussion" and decision.get("next") == "you":
-                # If moderator tries to hand off to user in discussion mode,
-                # just pick the first available agent that hasn't spoken recently
-                if available:
-                    decision = {"next": available[0]["id"]}
-                else:
-                    decision = {"next": "fin"}
-
-            return decision
-
-        except httpx.HTTPStatusError as e:
-            print(f"DEBUG: HTTP Status Error: {e.response.status_code} - {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=str(e))
-        except Exception as e:
-            print(f"DEBUG: General Error in decide_next: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        raw_res = await _call_mattin_agent(app_id, mod_id, prompt)
+        print(f"DEBUG: Moderator Raw Response: {raw_res}")
+
+        decision = _parse_moderator_decision(raw_res)
+
+        # In discussion mode, convert "you" to a valid agent pick (skip user turn)
+        if mode == "discussion" and decision.get("next") == "you":
+            # If moderator tries to hand off to user in discussion mode,
+            # just pick the first available agent that hasn't spoken recently
+            if available:
+                decision = {"next": available[0]["id"]}
+            else:
+                decision = {"next": "fin"}
+
+        return decision
+
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        print(f"DEBUG: HTTP Status Error: {e.response.status_code} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        print(f"DEBUG: General Error in decide_next: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/discussion_summarize")
@@ -289,16 +280,17 @@ async def discussion_summarize(request: Request):
         f"- Incluye TODOS los expertos que participaron en la tabla"
     )
 
-    async with httpx.AsyncClient(timeout=90.0) as client:
-        try:
-            response_text = await _call_mattin_agent(client, app_id, mod_id, prompt)
-            return {"summary": response_text}
-        except httpx.HTTPStatusError as e:
-            print(f"DEBUG: discussion_summarize HTTP Error: {e.response.status_code} - {e.response.text}")
-            raise HTTPException(status_code=e.response.status_code, detail=str(e))
-        except Exception as e:
-            print(f"DEBUG: discussion_summarize General Error: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+    try:
+        response_text = await _call_mattin_agent(app_id, mod_id, prompt, profile="summary")
+        return {"summary": response_text}
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        print(f"DEBUG: discussion_summarize HTTP Error: {e.response.status_code} - {e.response.text}")
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    except Exception as e:
+        print(f"DEBUG: discussion_summarize General Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/reset_session")
@@ -313,19 +305,16 @@ async def reset_session(request: Request):
     if not app_id or not agents:
         raise HTTPException(status_code=400, detail="Missing appId or agents list")
 
-    headers = {"X-API-KEY": API_KEY}
-    
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        results = []
-        for agent in agents:
-            if not agent.get("agentId"): continue
-            
-            url = f"{MATTIN_URL}/public/v1/app/{app_id}/chat/{agent['agentId']}/reset"
-            try:
-                resp = await client.post(url, headers=headers)
-                results.append({"agentId": agent['agentId'], "status": resp.status_code})
-            except Exception as e:
-                print(f"DEBUG: reset_session error for agent {agent['agentId']}: {str(e)}")
-                results.append({"agentId": agent['agentId'], "error": str(e)})
+    results = []
+    for agent in agents:
+        if not agent.get("agentId"): continue
         
-        return {"results": results}
+        url = f"/public/v1/app/{app_id}/chat/{agent['agentId']}/reset"
+        try:
+            resp = await mattin_client.request("POST", url, profile="reset")
+            results.append({"agentId": agent['agentId'], "status": resp.status_code})
+        except Exception as e:
+            print(f"DEBUG: reset_session error for agent {agent['agentId']}: {str(e)}")
+            results.append({"agentId": agent['agentId'], "error": str(e)})
+    
+    return {"results": results}
@@ -0,0 +1,40 @@
+import asyncio
+import argparse
+
+from database import AsyncSessionLocal, async_engine
+from modules import reindex
+from mattin import client as mattin_client
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        if args.resume:
+            run_id = args.resume
+        else:
+            run = None if args.new else await reindex.find_resumable(db, args.app_id, args.incident_silo, args.docs_silo)
+            if run:
+                print(f"Resuming reindex run {run.id} ({run.done}/{run.total} done before)")
+            else:
+                run = await reindex.create_run(db, args.app_id, args.incident_silo, args.docs_silo)
+                print(f"Starting reindex run {run.id}")
+            run_id = run.id
+
+    try:
+        await reindex.run_reindex(run_id, concurrency=args.concurrency)
+    finally:
+        await mattin_client.shutdown()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the Mattin index for resolved incidents and machine manuals")
+    parser.add_argument("--app-id", type=int, required=True)
+    parser.add_argument("--incident-silo", help="Silo for resolved incidents")
+    parser.add_argument("--docs-silo", help="Silo for PDFs under uploads/electrodomesticos")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--resume", type=int, metavar="RUN_ID", help="Resume a specific run")
+    parser.add_argument("--new", action="store_true", help="Start a fresh run instead of resuming the latest unfinished one")
+    args = parser.parse_args()
+    if not args.resume and not args.incident_silo and not args.docs_silo:
+        parser.error("pass --incident-silo and/or --docs-silo")
+    asyncio.run(main(args))
@@ -17,6 +17,15 @@ class IncidentLog(IncidentLogBase):
     class Config:
         from_attributes = True
 
+class IncidentLogBatch(BaseModel):
+    logs: List[IncidentLogCreate]
+
+class IncidentLogBatchItem(IncidentLogCreate):
+    incident_id: str
+
+class IncidentLogMultiBatch(BaseModel):
+    logs: List[IncidentLogBatchItem]
+
 class IncidentBase(BaseModel):
     id: Optional[str] = None
     machine_id: str
@@ -41,11 +50,41 @@ class Incident(IncidentBase):
     created_at: datetime
     closed_at: Optional[datetime] = None
     mattin_id: Optional[str] = None
+    # Archived logs are not in `logs`; GET /incidents/{id}/logs returns them all
+    logs_archived_at: Optional[datetime] = None
+    archived_log_count: int = 0
     logs: List[IncidentLog] = []
 
     class Config:
         from_attributes = True
 
+class IncidentSummary(IncidentBase):
+    """List-view projection: no logs, just how many there are and when the last one was written."""
+    created_at: datetime
+    closed_at: Optional[datetime] = None
+    mattin_id: Optional[str] = None
+    log_count: int = 0 # archived logs included
+    last_activity_at: Optional[datetime] = None
+    logs_archived_at: Optional[datetime] = None
+
+class IncidentPage(BaseModel):
+    items: List[IncidentSummary]
+    next_cursor: Optional[str] = None
+    limit: int
+
+class IncidentSearchHit(IncidentBase):
+    created_at: datetime
+    closed_at: Optional[datetime] = None
+    rank: float = 0
+    title_highlight: Optional[str] = None
+    snippet: Optional[str] = None
+
+class IncidentSearchPage(BaseModel):
+    items: List[IncidentSearchHit]
+    offset: int
+    limit: int
+    has_more: bool
+
 class MachineBase(BaseModel):
     id: str
     type: str
@@ -70,6 +109,20 @@ class Machine(MachineBase):
     class Config:
         from_attributes = True
 
+class MachineImportError(BaseModel):
+    row: int # 1-based record number in the file (CSV header excluded)
+    id: Optional[str] = None
+    error: str
+
+class MachineImportReport(BaseModel):
+    format: str
+    mode: str # insert | upsert
+    received: int
+    imported: int
+    failed: int
+    errors: List[MachineImportError] = []
+    errors_truncated: bool = False
+
 # --- AUDIO MODULE SCHEMAS ---
 
 class TranscriptionBase(BaseModel):
@@ -1,6 +1,7 @@
 from database import SessionLocal
 from models import Machine, Incident, IncidentLog
 from datetime import datetime
+from modules import analytics
 
 def seed():
     db = SessionLocal()
@@ -68,7 +69,10 @@ def seed():
         IncidentLog(incident_id='INC-003', author='Téc. Maria', text='Desagüe desatascado.', date=datetime(2024, 5, 9, 11, 0))
     ]
     db.add_all(logs)
+    db.flush()
 
+    # Seeded rows bypass the API, so the dashboard counters are recomputed
+    analytics.rebuild(db)
     db.commit()
     db.close()
     print("Seeding completed.")
@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import config
+from mattin import governor
+
+CHAT = "/app/7/chat/process_turn"
+INDEX = "/app/7/silo/1/docs/add"
+
+
+class SharedGateTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        limits = {cls: {"concurrency": 8, "rate": 0, "burst": 1} for cls in ("chat", "find", "index")}
+        patches = [
+            mock.patch.object(config, "MATTIN_GOVERNOR", limits),
+            mock.patch.object(config, "MATTIN_CONCURRENCY_APP", 2),
+            mock.patch.object(config, "MATTIN_QUEUE_TIMEOUT", 5),
+            mock.patch.dict(governor._gates, clear=True),
+            mock.patch.dict(governor._app_gates, clear=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_interactive_chat_is_admitted_before_queued_background_index_calls(self):
+        admitted = []
+        release = asyncio.Event()
+
+        async def call(name, path, priority):
+            async with governor.slot(path, priority):
+                admitted.append(name)
+                await release.wait()
+
+        # Two background index calls take the app's whole shared capacity, two more queue behind them
+        tasks = [asyncio.create_task(call(f"index-{i}", INDEX, governor.BACKGROUND)) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("chat", CHAT, governor.INTERACTIVE)))
+        await asyncio.sleep(0)
+        self.assertEqual(admitted, ["index-0", "index-1"])
+        self.assertEqual(governor.stats()["7:shared"]["waiting"], 3)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(admitted[2], "chat")
+
+    async def test_class_slot_is_released_when_the_shared_gate_times_out(self):
+        config.MATTIN_QUEUE_TIMEOUT = 0.05
+        release = asyncio.Event()
+
+        async def hold():
+            async with governor.slot(INDEX, governor.BACKGROUND):
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with self.assertRaises(governor.MattinBusy):
+            async with governor.slot(CHAT):
+                pass
+        self.assertEqual(governor.stats()["7:chat"]["active"], 0)
+
+        release.set()
+        await asyncio.gather(*holders)
+
+
+if __name__ == "__main__":
+    unittest.main()
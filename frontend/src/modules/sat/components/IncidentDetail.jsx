@@ -17,8 +17,10 @@ const IncidentDetail = ({ incidentId, onBack }) => {
 
     const loadIncident = () => {
         setLoading(true);
-        satService.getIncidents().then(incidents => {
-            const found = incidents.find(i => i.id === incidentId);
+        satService.getIncident(incidentId).then(async found => {
+            if (found.logs_archived_at) {
+                found.logs = await satService.getIncidentLogs(found.id);
+            }
             setIncident(found);
             setLoading(false);
         }).catch(err => {
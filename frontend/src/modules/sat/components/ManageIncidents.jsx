@@ -8,21 +8,27 @@ const ManageIncidents = ({ onBack, onSelectIncident }) => {
     const [incidents, setIncidents] = useState([]);
     const [machinesMap, setMachinesMap] = useState({});
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
     const [filterStatus, setFilterStatus] = useState('all');
     const [searchTerm, setSearchTerm] = useState('');
 
     useEffect(() => {
         loadData();
-    }, []);
+    }, [filterStatus]);
+
+    // Pages come from the server (newest first, status filtered there); the search box filters the loaded ones
+    const statusParam = () => (filterStatus === 'all' ? null : filterStatus);
 
     const loadData = async () => {
         setLoading(true);
         try {
-            const [incidentsData, machinesData] = await Promise.all([
-                satService.getIncidents(),
+            const [page, machinesData] = await Promise.all([
+                satService.getIncidents({ status: statusParam() }),
                 satService.getMachines()
             ]);
-            setIncidents(incidentsData);
+            setIncidents(page.items);
+            setNextCursor(page.next_cursor);
 
             const mMap = {};
             machinesData.forEach(m => mMap[m.id] = m);
@@ -34,6 +40,19 @@ const ManageIncidents = ({ onBack, onSelectIncident }) => {
         }
     };
 
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const page = await satService.getIncidents({ cursor: nextCursor, status: statusParam() });
+            setIncidents(prev => [...prev, ...page.items]);
+            setNextCursor(page.next_cursor);
+        } catch (error) {
+            console.error("Error loading incidents:", error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleDelete = async (e, id) => {
         e.stopPropagation();
         if (!window.confirm('¿Desea eliminar esta incidencia permanentemente?')) return;
@@ -68,7 +87,6 @@ const ManageIncidents = ({ onBack, onSelectIncident }) => {
     };
 
     const filteredIncidents = incidents.filter(inc => {
-        const matchesStatus = filterStatus === 'all' || inc.status === filterStatus;
         const machine = machinesMap[inc.machine_id];
         const machineType = machine ? machine.type : '';
 
@@ -77,7 +95,7 @@ const ManageIncidents = ({ onBack, onSelectIncident }) => {
             (inc.machine_id?.toLowerCase() || '').includes(searchTerm.toLowerCase()) ||
             (machineType.toLowerCase().includes(searchTerm.toLowerCase()));
 
-        return matchesStatus && matchesSearch;
+        return matchesSearch;
     });
 
     if (loading) return <div style={{ color: 'var(--text-main)', padding: '2rem', textAlign: 'center' }}>Cargando incidencias...</div>;
@@ -221,6 +239,19 @@ const ManageIncidents = ({ onBack, onSelectIncident }) => {
                     }))
                 }
             </div>
+
+            {nextCursor && (
+                <div style={{ marginTop: '1.5rem', textAlign: 'center' }}>
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="btn"
+                        style={{ background: 'var(--accent)', color: 'white', border: 'none', padding: '0.5rem 1.5rem', cursor: 'pointer' }}
+                    >
+                        {loadingMore ? 'Cargando...' : 'Cargar más'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -19,21 +19,12 @@ const SimilarIncidents = ({ incidentId, machineType }) => {
     const loadData = async () => {
         setLoading(true);
         try {
-            const promises = [];
-
-            if (satConfig.siloId) {
-                promises.push(satService.getSimilarIncidents(incidentId, globalAppId, satConfig.siloId)
-                    .then(data => setSimilar(data))
-                    .catch(e => console.error("Error similar:", e)));
-            }
-
-            if (satConfig.docsSiloId) {
-                promises.push(satService.getKnowledgeBase(incidentId, globalAppId, satConfig.docsSiloId)
-                    .then(data => setKnowledge(data))
-                    .catch(e => console.error("Error knowledge:", e)));
+            if (satConfig.siloId || satConfig.docsSiloId) {
+                const insights = await satService.getIncidentInsights(incidentId, globalAppId, satConfig.siloId, satConfig.docsSiloId);
+                if (insights.partial) console.warn("Partial insights:", insights.errors);
+                setSimilar(insights.similar);
+                setKnowledge(insights.knowledge);
             }
-
-            await Promise.all(promises);
         } catch (error) {
             console.error("Error fetching data:", error);
         } finally {
@@ -81,12 +81,23 @@ export const satService = {
         return response.json();
     },
 
-    getIncidents: async () => {
-        const response = await fetch(`${API_BASE_URL}/incidents`);
+    getIncidents: async ({ cursor = null, status = null, limit = 50 } = {}) => {
+        // One page, newest first, without logs: { items, next_cursor, limit }
+        const params = new URLSearchParams();
+        params.append('limit', limit);
+        if (cursor) params.append('cursor', cursor);
+        if (status) params.append('status', status);
+        const response = await fetch(`${API_BASE_URL}/incidents?${params.toString()}`);
         if (!response.ok) throw new Error('Failed to fetch incidents');
         return response.json();
     },
 
+    getIncident: async (id) => {
+        const response = await fetch(`${API_BASE_URL}/incidents/${id}`);
+        if (!response.ok) throw new Error('Failed to fetch incident');
+        return response.json();
+    },
+
     createIncident: async (incidentData) => {
         const response = await fetch(`${API_BASE_URL}/incidents`, {
             method: 'POST',
@@ -127,6 +138,13 @@ export const satService = {
         return response.json();
     },
 
+    getIncidentLogs: async (incidentId) => {
+        // Includes logs moved to cold storage, which the incident payload leaves out
+        const response = await fetch(`${API_BASE_URL}/incidents/${incidentId}/logs`);
+        if (!response.ok) throw new Error('Failed to fetch incident logs');
+        return response.json();
+    },
+
     addLog: async (incidentId, logData) => {
         const response = await fetch(`${API_BASE_URL}/incidents/${incidentId}/logs`, {
             method: 'POST',
@@ -137,6 +155,17 @@ export const satService = {
         return response.json();
     },
 
+    addLogs: async (incidentId, logs) => {
+        // One request and one transaction for many logs, e.g. notes queued while offline
+        const response = await fetch(`${API_BASE_URL}/incidents/${incidentId}/logs:batch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ logs }),
+        });
+        if (!response.ok) throw new Error('Failed to add logs');
+        return response.json();
+    },
+
     getSimilarIncidents: async (incidentId, appId = null, siloId = null) => {
         let url = `${API_BASE_URL}/incidents/${incidentId}/similar`;
         const params = new URLSearchParams();
@@ -159,5 +188,18 @@ export const satService = {
         const response = await fetch(url);
         if (!response.ok) throw new Error('Failed to fetch knowledge base');
         return response.json();
+    },
+
+    getIncidentInsights: async (incidentId, appId = null, siloId = null, docsSiloId = null) => {
+        let url = `${API_BASE_URL}/incidents/${incidentId}/insights`;
+        const params = new URLSearchParams();
+        if (appId) params.append('app_id', appId);
+        if (siloId) params.append('silo_id', siloId);
+        if (docsSiloId) params.append('docs_silo_id', docsSiloId);
+        if (params.toString()) url += `?${params.toString()}`;
+
+        const response = await fetch(url);
+        if (!response.ok) throw new Error('Failed to fetch incident insights');
+        return response.json();
     }
 };